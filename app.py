@@ -1,10 +1,43 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+import os
+
+# Realtime serving mode: 'threading' (default) or 'gevent' for high connection counts.
+# Green-thread mode has to patch the standard library before anything else is imported.
+ASYNC_MODE = os.environ.get('ASYNC_MODE', 'threading')
+if ASYNC_MODE == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
+from flask import Flask, render_template, request, jsonify, redirect, url_for, Response, send_from_directory
 from flask_cors import CORS
+from markupsafe import escape
 from flask_socketio import SocketIO, emit, join_room, leave_room
+import socketio as socketio_server
 import uuid
+import bisect
+import glob
+import hashlib
+import mimetypes
+import heapq
+import shutil
+import socket
+import pickle
+import contextlib
+import copy
+import base64
+import mmap
+import multiprocessing
+import sqlite3
 import json
+import struct
+import atexit
+import fcntl
+import threading
+import time
+from collections import deque, OrderedDict
+from collections.abc import MutableMapping
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
 from datetime import datetime
-import os
+from sharding import HashRing, parse_shards, post_json
 
 app = Flask(__name__)
 
@@ -24,8 +57,9 @@ else:
 CORS(app, origins=['*'], supports_credentials=True)
 
 # SocketIO configuration for production
-# Use threading mode for maximum compatibility across platforms
-async_mode = 'threading'
+# Threading mode is the default for maximum compatibility across platforms;
+# ASYNC_MODE=gevent serves every connection from a green thread instead
+async_mode = ASYNC_MODE
 
 socketio_kwargs = {
     'cors_allowed_origins': socketio_cors_origins,
@@ -39,11 +73,554 @@ if os.environ.get('FLASK_ENV') == 'development':
     socketio_kwargs['logger'] = True
     socketio_kwargs['engineio_logger'] = True
 
+# Socket.IO event bus
+# With several workers (LOBBY_STORE=sqlite) broadcasts go through a message queue so they
+# reach clients connected to any worker. 'local' uses the built-in broker on a Unix socket;
+# a redis:// or amqp:// URL uses that service instead; an empty value disables the bus.
+SOCKETIO_MESSAGE_QUEUE = os.environ.get(
+    'SOCKETIO_MESSAGE_QUEUE', 'local' if os.environ.get('LOBBY_STORE') == 'sqlite' else '')
+SOCKETIO_BUS_PATH = os.environ.get('SOCKETIO_BUS_PATH', '/tmp/sava-socketio.sock')
+BUS_FRAME_HEADER = struct.Struct('<I')
+BUS_LATENCY_SAMPLES = 1000
+
+def _bus_read_frame(reader):
+    """Read one length-prefixed frame from a bus connection, or None once it closes."""
+    header = reader.read(BUS_FRAME_HEADER.size)
+    if len(header) < BUS_FRAME_HEADER.size:
+        return None
+    frame = reader.read(BUS_FRAME_HEADER.unpack(header)[0])
+    return frame if len(frame) == BUS_FRAME_HEADER.unpack(header)[0] else None
+
+class LocalBroker:
+    """Relays every published frame to all subscribed workers, the publisher included."""
+    def __init__(self, listener):
+        self.listener = listener
+        self.subscribers = []
+        self.lock = threading.Lock()
+
+    def serve(self):
+        while True:
+            conn, _ = self.listener.accept()
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        reader = conn.makefile('rb')
+        try:
+            role = reader.read(1)
+            if role == b'S':
+                with self.lock:
+                    self.subscribers.append(conn)
+                # Subscribers only read; wait for them to go away
+                reader.read()
+                return
+            while True:
+                frame = _bus_read_frame(reader)
+                if frame is None:
+                    return
+                frame = BUS_FRAME_HEADER.pack(len(frame)) + frame
+                # One frame at a time, so frames are never interleaved on a subscriber
+                with self.lock:
+                    for subscriber in list(self.subscribers):
+                        try:
+                            subscriber.sendall(frame)
+                        except OSError:
+                            self.subscribers.remove(subscriber)
+        except OSError:
+            pass
+        finally:
+            with self.lock:
+                if conn in self.subscribers:
+                    self.subscribers.remove(conn)
+            conn.close()
+
+class LocalBusManager(socketio_server.PubSubManager):
+    """Socket.IO client manager that fans broadcasts out to every worker via a local broker.
+
+    The first worker to take the lock next to the socket path hosts the broker; the others
+    connect to it, and take over if that worker exits.
+    """
+    name = 'localbus'
+
+    def __init__(self, path, channel='socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.path = path
+        self._publisher = None
+        self._publish_lock = threading.Lock()
+        self._broker_lock = None
+        # Seconds from publish to delivery in this worker, for this worker's own broadcasts
+        self.latencies = deque(maxlen=BUS_LATENCY_SAMPLES)
+        self.delivered = 0
+
+    def initialize(self):
+        # The manager is created before gunicorn forks; give each worker its own identity
+        self.host_id = uuid.uuid4().hex
+        super().initialize()
+
+    def _connect(self, role):
+        """Connect to the broker, hosting it in this process if no other worker does."""
+        while True:
+            if self._broker_lock is None:
+                lock_file = open(self.path + '.lock', 'a')
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    lock_file.close()
+                else:
+                    # Held until this process exits, which hands the broker to another worker
+                    self._broker_lock = lock_file
+                    if os.path.exists(self.path):
+                        os.unlink(self.path)
+                    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    listener.bind(self.path)
+                    listener.listen(128)
+                    threading.Thread(target=LocalBroker(listener).serve, name='socketio-broker', daemon=True).start()
+                    print(f"Hosting the Socket.IO event bus on {self.path}")
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.path)
+                sock.sendall(role)
+                return sock
+            except OSError:
+                # The broker is starting up, or its worker just exited
+                sock.close()
+                time.sleep(0.05)
+
+    def _publish(self, data):
+        data['published_at'] = time.monotonic()
+        data['publisher_pid'] = os.getpid()
+        frame = pickle.dumps(data)
+        frame = BUS_FRAME_HEADER.pack(len(frame)) + frame
+        with self._publish_lock:
+            for attempt in range(2):
+                if self._publisher is None:
+                    self._publisher = self._connect(b'P')
+                try:
+                    self._publisher.sendall(frame)
+                    return
+                except OSError:
+                    self._publisher.close()
+                    self._publisher = None
+
+    def _listen(self):
+        while True:
+            sock = self._connect(b'S')
+            reader = sock.makefile('rb')
+            while True:
+                frame = _bus_read_frame(reader)
+                if frame is None:
+                    break
+                message = pickle.loads(frame)
+                published_at = message.pop('published_at', None)
+                if message.pop('publisher_pid', None) == os.getpid() and published_at is not None:
+                    # CLOCK_MONOTONIC is shared by all processes on the host
+                    self.latencies.append(time.monotonic() - published_at)
+                self.delivered += 1
+                yield message
+            sock.close()
+
+    def latency_stats(self):
+        """Publish-to-delivery latency of this worker's recent broadcasts, in milliseconds."""
+        samples = sorted(self.latencies)
+        if not samples:
+            return {'samples': 0}
+        return {
+            'samples': len(samples),
+            'p50_ms': round(samples[len(samples) // 2] * 1000, 3),
+            'p99_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 3),
+            'max_ms': round(samples[-1] * 1000, 3),
+        }
+
+if SOCKETIO_MESSAGE_QUEUE == 'local':
+    socketio_kwargs['client_manager'] = LocalBusManager(SOCKETIO_BUS_PATH)
+elif SOCKETIO_MESSAGE_QUEUE:
+    socketio_kwargs['message_queue'] = SOCKETIO_MESSAGE_QUEUE
+
 socketio = SocketIO(app, **socketio_kwargs)
 
-# In-memory storage for lobbies and game states
-lobbies = {}
-game_states = {}
+# Lobby storage
+# LOBBY_STORE=memory keeps lobbies in this process (one gunicorn worker); LOBBY_STORE=sqlite
+# shares them between all workers through a SQLite database, by default on /dev/shm.
+LOBBY_STORE = os.environ.get('LOBBY_STORE', 'memory')
+LOBBY_STORE_PATH = os.environ.get(
+    'LOBBY_STORE_PATH', '/dev/shm/sava-lobbies.db' if os.path.isdir('/dev/shm') else '/tmp/sava-lobbies.db')
+
+# Lobby lifetime: a background reaper deletes lobbies idle (no commands and nobody connected)
+# for longer than the TTL of their state, spills in-progress games idle for LOBBY_SPILL_AFTER
+# seconds to LOBBY_SPILL_DIR (they are paged back in on access), and keeps at most
+# LOBBY_MAX_HOT lobbies in memory by spilling the least recently used ones.
+LOBBY_TTLS = {
+    'waiting': int(os.environ.get('LOBBY_TTL_WAITING', 30 * 60)),
+    'active': int(os.environ.get('LOBBY_TTL_ACTIVE', 24 * 60 * 60)),
+    'finished': int(os.environ.get('LOBBY_TTL_FINISHED', 10 * 60)),
+}
+LOBBY_SPILL_AFTER = int(os.environ.get('LOBBY_SPILL_AFTER', 5 * 60))
+LOBBY_MAX_HOT = int(os.environ.get('LOBBY_MAX_HOT', 5000))
+LOBBY_REAP_INTERVAL = float(os.environ.get('LOBBY_REAP_INTERVAL', 30))
+LOBBY_SPILL_DIR = os.environ.get('LOBBY_SPILL_DIR', '/tmp/sava-spill')
+
+def _spill_dir():
+    """This process's spill directory (workers fork from a preloaded master)."""
+    return os.path.join(LOBBY_SPILL_DIR, str(os.getpid()))
+
+# Spilled lobbies are handed off with the rest at exit; the files themselves are per process
+atexit.register(lambda: shutil.rmtree(_spill_dir(), ignore_errors=True))
+
+# Lobbies handed off by a previous worker are kept serialized until first access
+LOBBY_HANDOFF_PATH = os.environ.get('LOBBY_HANDOFF_PATH', '/tmp/sava-lobbies.handoff')
+LOBBY_HANDOFF_MAGIC = b'SAVALOBBY2'
+# Files written before entries carried metadata
+LOBBY_HANDOFF_MAGIC_V1 = b'SAVALOBBY1'
+
+def lifecycle_state(game_state):
+    """'waiting', 'active' or 'finished' for a lobby's game state."""
+    if game_state.get('game_over'):
+        return 'finished'
+    return 'active' if game_state['game_started'] else 'waiting'
+
+class LobbyStore(MutableMapping):
+    """lobby_id -> Lobby mapping that every route and Socket.IO handler goes through.
+
+    Stores shared between processes set shared = True. Their command_scope() must give the
+    lobby the latest committed state before a command runs and persist it afterwards.
+    """
+    shared = False
+
+    def command_scope(self, lobby):
+        """Context wrapped around every command applied to a lobby."""
+        return contextlib.nullcontext()
+
+    def add_cold(self, lobby_id, cold):
+        """Register a ColdLobby that is not in the store yet."""
+        if lobby_id not in self:
+            lobby = self[lobby_id] = cold()
+            turn_clock.update(lobby)
+
+    def hot_lobbies(self):
+        """(lobby_id, Lobby) pairs held in memory, least recently used first."""
+        return list(self.items())
+
+    def cold_lobbies(self):
+        """(lobby_id, ColdLobby) pairs that are not decoded in memory."""
+        return []
+
+    def evict(self, lobby_id):
+        """Drop a lobby from memory without losing it; False if it is busy."""
+        return False
+
+    def summaries(self):
+        """Lobby list entries for every lobby."""
+        return [lobby_summary(lobby.snapshot) for _, lobby in list(self.items())]
+
+    def records(self):
+        """Yield (lobby_id, lifecycle state, load) for every lobby; load() returns its to_record()
+        data without bringing a cold lobby back into memory."""
+        for lobby_id, lobby in list(self.items()):
+            yield lobby_id, lobby.lifecycle_state(), lobby.to_record
+
+def cold_metadata(lobby):
+    """What the reaper, the turn clock and the lobby list need to know about a lobby kept out of memory."""
+    return {
+        'last_active': lobby.last_active,
+        'state': lobby.lifecycle_state(),
+        'summary': lobby_summary(lobby.snapshot),
+        'deadline': turn_deadline(lobby.game_state)
+    }
+
+class ColdLobby:
+    """Loader for a lobby that is not decoded in memory, with its cold_metadata().
+
+    Subclasses provide read(), the lobby's to_record() as JSON bytes.
+    """
+    def __init__(self, metadata):
+        self.metadata = metadata
+        self.last_active = metadata['last_active']
+        self.state = metadata['state']
+        self.summary = metadata['summary']
+        deadline = metadata.get('deadline')
+        self.deadline = tuple(deadline) if deadline else None
+
+    def __call__(self):
+        return Lobby.from_record(json.loads(self.read()))
+
+    def discard(self):
+        """Remove whatever this copy keeps on disk once the lobby is loaded or deleted."""
+
+class SpilledLobby(ColdLobby):
+    """A lobby spilled to disk by the reaper."""
+    def __init__(self, path, lobby):
+        super().__init__(cold_metadata(lobby))
+        self.path = path
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def __call__(self):
+        lobby = super().__call__()
+        self.discard()
+        return lobby
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+class HandedOffLobby(ColdLobby):
+    """A lobby handed off by the previous worker; record is a view into the handoff file."""
+    def __init__(self, record, metadata):
+        super().__init__(metadata)
+        self.record = record
+
+    def read(self):
+        return bytes(self.record)
+
+class JournaledLobby(ColdLobby):
+    """A lobby recovered from the move journal, replayed again on first access."""
+    def __init__(self, lobby):
+        super().__init__(cold_metadata(lobby))
+        self.lobby_id = lobby.lobby_id
+
+    def read(self):
+        return json.dumps(self().to_record(), default=str).encode('utf-8')
+
+    def __call__(self):
+        return move_journal.load(self.lobby_id)
+
+class InProcessLobbyStore(LobbyStore):
+    """Lobbies held in this process; handed-off and spilled lobbies are restored lazily on access."""
+    def __init__(self):
+        self._lobbies = OrderedDict()  # in LRU order
+        self._cold = {}  # lobby_id -> ColdLobby
+        self._restore_lock = threading.Lock()
+
+    def __getitem__(self, lobby_id):
+        lobby = self._lobbies.get(lobby_id)
+        if lobby is not None:
+            try:
+                self._lobbies.move_to_end(lobby_id)
+            except KeyError:
+                pass  # evicted or deleted meanwhile; the caller still gets a usable lobby
+            return lobby
+        lobby_reaper.ensure_running()
+        with self._restore_lock:
+            lobby = self._lobbies.get(lobby_id)
+            if lobby is None:
+                lobby = self._lobbies[lobby_id] = self._cold.pop(lobby_id)()
+                turn_clock.update(lobby)
+        return lobby
+
+    def __setitem__(self, lobby_id, lobby):
+        lobby_reaper.ensure_running()
+        self._cold.pop(lobby_id, None)
+        self._lobbies[lobby_id] = lobby
+        lobby_directory.update(lobby.snapshot)
+
+    def __delitem__(self, lobby_id):
+        hot = self._lobbies.pop(lobby_id, None)
+        cold = self._cold.pop(lobby_id, None)
+        if hot is None and cold is None:
+            raise KeyError(lobby_id)
+        if cold is not None:
+            cold.discard()
+        move_journal.discard(lobby_id)
+        lobby_directory.remove(lobby_id)
+
+    def __contains__(self, lobby_id):
+        return lobby_id in self._lobbies or lobby_id in self._cold
+
+    def __iter__(self):
+        return iter(list(self._lobbies) + list(self._cold))
+
+    def __len__(self):
+        return len(self._lobbies) + len(self._cold)
+
+    def serialized_records(self):
+        """Yield (lobby_id, cold_metadata(), record bytes); cold lobbies are passed through without decoding."""
+        for lobby_id, lobby in list(self._lobbies.items()):
+            yield lobby_id, cold_metadata(lobby), json.dumps(lobby.to_record(), default=str).encode('utf-8')
+        for lobby_id, cold in list(self._cold.items()):
+            yield lobby_id, cold.metadata, cold.read()
+
+    def add_cold(self, lobby_id, cold):
+        """Register a ColdLobby that is decoded on first access; its turn clock runs meanwhile."""
+        if lobby_id not in self:
+            self._cold[lobby_id] = cold
+            turn_clock.schedule(lobby_id, cold.deadline)
+
+    def release(self, lobby_id):
+        """Forget a lobby that now lives elsewhere, keeping its journal."""
+        self._lobbies.pop(lobby_id, None)
+        cold = self._cold.pop(lobby_id, None)
+        if cold is not None:
+            cold.discard()
+        lobby_directory.remove(lobby_id)
+
+    def hot_lobbies(self):
+        return list(self._lobbies.items())
+
+    def cold_lobbies(self):
+        return list(self._cold.items())
+
+    def evict(self, lobby_id):
+        """Spill a lobby to LOBBY_SPILL_DIR; it is paged back in on the next access."""
+        lobby = self._lobbies.get(lobby_id)
+        if lobby is None or not lobby._writer.acquire(blocking=False):
+            return False
+        try:
+            os.makedirs(_spill_dir(), exist_ok=True)
+            path = os.path.join(_spill_dir(), f'{lobby_id}.lobby')
+            with open(path + '.tmp', 'w') as f:
+                json.dump(lobby.to_record(), f, default=str)
+            os.replace(path + '.tmp', path)
+            # Registered cold before it leaves the hot map, so the lobby never looks missing
+            self._cold[lobby_id] = SpilledLobby(path, lobby)
+            self._lobbies.pop(lobby_id, None)
+            lobby.evicted = True
+        finally:
+            lobby._writer.release()
+        # Commands queued while we held the writer slot go to the paged-in lobby
+        lobby._drain_commands()
+        return True
+
+    def summaries(self):
+        # Cold lobbies are listed from their metadata, never decoded here
+        return ([lobby_summary(lobby.snapshot) for _, lobby in list(self._lobbies.items())]
+                + [cold.summary for _, cold in list(self._cold.items())])
+
+    def records(self):
+        for lobby_id, lobby in list(self._lobbies.items()):
+            yield lobby_id, lobby.lifecycle_state(), lobby.to_record
+        for lobby_id, cold in list(self._cold.items()):
+            yield lobby_id, cold.state, lambda cold=cold: json.loads(cold.read())
+
+class SQLiteLobbyStore(LobbyStore):
+    """Lobbies shared by all worker processes through one SQLite database (WAL mode).
+
+    Each process caches decoded lobbies and reloads one only when the stored version is newer.
+    A command holds a record lock on its lobby's byte in <path>.locks while it runs, so commands
+    for one lobby are applied one at a time across all workers while other lobbies proceed; the
+    database write lock is only taken for the row update.
+    """
+    shared = True
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        self._lock_file = None
+        self._lock_file_pid = None
+
+    def _db(self):
+        """Per-thread connection in autocommit mode (transactions are explicit)."""
+        db = getattr(self._local, 'db', None)
+        # A connection inherited through fork (preloaded app) must not be used by the worker
+        if db is None or self._local.pid != os.getpid():
+            self._local.pid = os.getpid()
+            db = self._local.db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute('CREATE TABLE IF NOT EXISTS lobbies (lobby_id TEXT PRIMARY KEY, version INTEGER, record TEXT)')
+        return db
+
+    def _load(self, lobby_id):
+        row = self._db().execute('SELECT record FROM lobbies WHERE lobby_id = ?', (lobby_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def __getitem__(self, lobby_id):
+        row = self._db().execute('SELECT version FROM lobbies WHERE lobby_id = ?', (lobby_id,)).fetchone()
+        if row is None:
+            self._cache.pop(lobby_id, None)
+            raise KeyError(lobby_id)
+        lobby = self._cache.get(lobby_id)
+        if lobby is not None and lobby.version >= row[0]:
+            return lobby
+        record = self._load(lobby_id)
+        if record is None:
+            raise KeyError(lobby_id)
+        if lobby is None:
+            lobby_reaper.ensure_running()
+            with self._cache_lock:
+                lobby = self._cache.get(lobby_id)
+                if lobby is None:
+                    lobby = self._cache[lobby_id] = Lobby.from_record(record)
+                    turn_clock.update(lobby)
+                    return lobby
+        # Another worker committed a newer state
+        lobby.refresh(record)
+        turn_clock.update(lobby)
+        return lobby
+
+    def __setitem__(self, lobby_id, lobby):
+        lobby_reaper.ensure_running()
+        self._db().execute('INSERT OR REPLACE INTO lobbies (lobby_id, version, record) VALUES (?, ?, ?)',
+                           (lobby_id, lobby.version, json.dumps(lobby.to_record(), default=str)))
+        self._cache[lobby_id] = lobby
+        lobby_directory.update(lobby.snapshot)
+
+    def __delitem__(self, lobby_id):
+        deleted = self._db().execute('DELETE FROM lobbies WHERE lobby_id = ?', (lobby_id,)).rowcount
+        self._cache.pop(lobby_id, None)
+        if not deleted:
+            raise KeyError(lobby_id)
+        move_journal.discard(lobby_id)
+        lobby_directory.remove(lobby_id)
+
+    def __contains__(self, lobby_id):
+        return self._db().execute('SELECT 1 FROM lobbies WHERE lobby_id = ?', (lobby_id,)).fetchone() is not None
+
+    def __iter__(self):
+        return iter([row[0] for row in self._db().execute('SELECT lobby_id FROM lobbies')])
+
+    def __len__(self):
+        return self._db().execute('SELECT COUNT(*) FROM lobbies').fetchone()[0]
+
+    def hot_lobbies(self):
+        return sorted(self._cache.items(), key=lambda item: item[1].last_active)
+
+    def records(self):
+        # Straight from the database, without filling this worker's cache
+        for lobby_id, record in self._db().execute('SELECT lobby_id, record FROM lobbies').fetchall():
+            record = json.loads(record)
+            yield lobby_id, lifecycle_state(record['game_state']), lambda record=record: record
+
+    def evict(self, lobby_id):
+        """Drop the cached copy; every committed state is already in the database."""
+        return self._cache.pop(lobby_id, None) is not None
+
+    def _locks(self):
+        """This process's descriptor of the lock file (record locks belong to the process)."""
+        with self._cache_lock:
+            if self._lock_file_pid != os.getpid():
+                self._lock_file_pid = os.getpid()
+                self._lock_file = open(self.path + '.locks', 'a+b')
+            return self._lock_file
+
+    @contextlib.contextmanager
+    def command_scope(self, lobby):
+        # Within a process the lobby's writer slot already serializes its commands
+        offset = int.from_bytes(hashlib.blake2b(lobby.lobby_id.encode('utf-8'), digest_size=7).digest(), 'little')
+        locks = self._locks()
+        fcntl.lockf(locks, fcntl.LOCK_EX, 1, offset)
+        try:
+            db = self._db()
+            row = db.execute('SELECT version, record FROM lobbies WHERE lobby_id = ?', (lobby.lobby_id,)).fetchone()
+            # A different version is newer work from another worker, or a commit of ours that failed
+            if row is not None and row[0] != lobby.version:
+                lobby.restore(json.loads(row[1]))
+            yield
+            # Rejected commands leave the version, and so the row, as it was
+            if row is not None and lobby.version != row[0]:
+                db.execute('UPDATE lobbies SET version = ?, record = ? WHERE lobby_id = ?',
+                           (lobby.version, json.dumps(lobby.to_record(), default=str), lobby.lobby_id))
+        finally:
+            fcntl.lockf(locks, fcntl.LOCK_UN, 1, offset)
+
+if LOBBY_STORE == 'sqlite':
+    lobbies = SQLiteLobbyStore(LOBBY_STORE_PATH)
+else:
+    lobbies = InProcessLobbyStore()
 
 # Load game configuration from JSON file
 def load_game_config():
@@ -73,6 +650,28 @@ SPIDER_DICE_MIN_TURN = GAME_CONFIG["game_rules"]["spider_dice_min_turn"]
 TURN_TIME_LIMIT = GAME_CONFIG["game_rules"]["turn_time_limit_seconds"]
 RESURRECTION_ZONES = GAME_CONFIG["resurrection_zones"]
 
+# Event stream configuration
+# Number of recent events each lobby keeps for resuming streams
+EVENT_LOG_SIZE = int(os.environ.get('EVENT_LOG_SIZE', 256))
+# Spectator SSE streams send a keep-alive comment at this interval and are closed after
+# SSE_MAX_STREAM_SECONDS so a threaded worker is never held indefinitely (EventSource reconnects
+# automatically and resumes from Last-Event-ID)
+SSE_HEARTBEAT_SECONDS = 15
+SSE_MAX_STREAM_SECONDS = int(os.environ.get('SSE_MAX_STREAM_SECONDS', 300))
+
+# Batched commands
+# Most actions one batch may apply
+BATCH_MAX_ACTIONS = int(os.environ.get('BATCH_MAX_ACTIONS', 8))
+# Action name -> (Lobby command, arguments taken from the action; player_id is the sender)
+BATCH_ACTIONS = {
+    'move': ('execute_move', ('from_node', 'to_node', 'player_id')),
+    'roll_spider_dice': ('roll_spider_dice', ('player_id',)),
+    'sacrifice_piece': ('sacrifice_piece', ('node_id', 'player_id')),
+    'control_enemy_piece': ('control_enemy_piece', ('node_id', 'player_id')),
+    'move_controlled_piece': ('execute_controlled_move', ('from_node', 'to_node', 'player_id')),
+    'promote_orc': ('promote_orc', ('player_id', 'selected_piece'))
+}
+
 # Board connectivity - defines which nodes are connected
 # This is now loaded from the shared game-config.json file
 BOARD_CONNECTIONS = GAME_CONFIG["board_connections"]
@@ -83,6 +682,11 @@ def get_strand_nodes():
 
 def get_neighboring_nodes(node_id):
     """Get all neighboring nodes for a given node."""
+    neighbors = NEIGHBOR_TABLE.get(node_id)
+    return neighbors if neighbors is not None else _find_neighboring_nodes(node_id)
+
+def _find_neighboring_nodes(node_id):
+    """Work out a node's neighbors from the ring, center and strand definitions."""
     neighbors = set()
     
     # Add ring neighbors (adjacent nodes in the same ring)
@@ -129,6 +733,13 @@ def get_neighboring_nodes(node_id):
     
     return neighbors
 
+# Every board node's neighbors, computed once at import: rule evaluation calls
+# get_neighboring_nodes in its innermost loops (and forked analysis workers share the table)
+NEIGHBOR_TABLE = {
+    node_id: frozenset(_find_neighboring_nodes(node_id))
+    for node_id in [f'{ring}N{i}' for ring in sorted(BOARD_CONNECTIONS['rings']) for i in range(16)] + GAME_CONFIG['center_nodes']
+}
+
 def is_enemy_piece(piece_name, current_color):
     """Check if a piece belongs to the enemy."""
     if not piece_name:
@@ -404,6 +1015,18 @@ def get_legal_moves(piece_name, node_id, board_state, current_color, spider_cont
                 legal_moves.append(neighbor_id)
         return legal_moves
 
+def find_threat(board_state, target_node, enemy_color):
+    """Return (node_id, piece_name) of the first enemy piece that can capture target_node, or None."""
+    for node_id, piece_name in board_state.items():
+        if piece_name.startswith(enemy_color + '_'):
+            # Get all possible moves for this enemy piece
+            legal_moves = get_legal_moves(piece_name, node_id, board_state, enemy_color)
+            
+            # Check if any of these moves would capture the target
+            if target_node in legal_moves:
+                return node_id, piece_name
+    return None
+
 def can_orc_promote(piece_name, destination_node, player_color):
     """Check if an orc can be promoted at the destination node."""
     if 'orc' not in piece_name:
@@ -413,6 +1036,17 @@ def can_orc_promote(piece_name, destination_node, player_color):
     resurrection_nodes = RESURRECTION_ZONES.get(player_color, [])
     return destination_node in resurrection_nodes
 
+def run_rules(func, *args, **kwargs):
+    """Run CPU-heavy rule evaluation (or other blocking work) without blocking the event loop.
+
+    In gevent mode the call is handed to the hub's native thread pool so other
+    connections keep being served; in threading mode it simply runs inline.
+    """
+    if ASYNC_MODE == 'gevent':
+        import gevent
+        return gevent.get_hub().threadpool.apply(func, args, kwargs)
+    return func(*args, **kwargs)
+
 def get_promotable_pieces(captured_pieces):
     """Get list of non-orc pieces that can be used for promotion."""
     promotable = []
@@ -421,17 +1055,197 @@ def get_promotable_pieces(captured_pieces):
             promotable.append(piece)
     return promotable
 
+# Compact binary wire format
+# Clients that join with wire_format='binary' receive 'lobby_update_bin' frames instead of
+# JSON 'lobby_update' events. Frames are MessagePack-encoded; boards are packed as one
+# 4-bit cell per node and node IDs inside moves are sent as indexes into WIRE_NODE_IDS.
+WIRE_FORMAT_JSON = 'json'
+WIRE_FORMAT_BINARY = 'binary'
+
+# Node index table shared with the client decoder (52 nodes: 3 rings of 16 plus the center)
+WIRE_NODE_IDS = [f'{ring}N{i}' for ring in sorted(BOARD_CONNECTIONS['rings']) for i in range(16)] + GAME_CONFIG['center_nodes']
+WIRE_NODE_INDEX = {node_id: i for i, node_id in enumerate(WIRE_NODE_IDS)}
+
+# Piece codes: 0 = empty, 1-5 = red pieces, 6-10 = blue pieces
+WIRE_PIECE_TYPES = ['matron mother', 'wizard', 'priestess', 'weaponmaster', 'orc']
+WIRE_COLORS = ['red', 'blue']
+
+# last_move fields that hold node IDs and are sent as node indexes
+WIRE_MOVE_NODE_KEYS = ('from', 'to', 'node', 'intermediate_node', 'controlled_node', 'promotion_node')
+
+def binary_room(lobby_id):
+    """Socket.IO room for connections that negotiated the binary wire format."""
+    return f'{lobby_id}:bin'
+
+def encode_piece(piece_name):
+    """Encode a piece name as (4-bit code, orc ordinal or None)."""
+    color, _, piece_type = piece_name.partition('_')
+    ordinal = None
+    if piece_type.startswith('orc'):
+        ordinal = int(piece_type[4:]) if piece_type[4:].isdigit() else 0
+        piece_type = 'orc'
+    code = 1 + WIRE_COLORS.index(color) * len(WIRE_PIECE_TYPES) + WIRE_PIECE_TYPES.index(piece_type)
+    return code, ordinal
+
+def is_wire_piece(piece_name):
+    """True if encode_piece() and pack_board() can encode piece_name."""
+    try:
+        _, ordinal = encode_piece(piece_name)
+    except (AttributeError, ValueError):
+        return False
+    return ordinal is None or ordinal < 0x100
+
+def pack_board(board):
+    """Pack a board dict into 26 bytes of 4-bit cells followed by one byte per orc ordinal."""
+    cells = bytearray(len(WIRE_NODE_IDS) // 2)
+    ordinals = bytearray()
+    for index, node_id in enumerate(WIRE_NODE_IDS):
+        piece_name = board.get(node_id)
+        if not piece_name:
+            continue
+        code, ordinal = encode_piece(piece_name)
+        cells[index >> 1] |= code << (4 if index & 1 == 0 else 0)
+        if ordinal is not None:
+            ordinals.append(ordinal)
+    return bytes(cells + ordinals)
+
+def unpack_board(packed):
+    """Inverse of pack_board."""
+    board = {}
+    ordinals = iter(packed[len(WIRE_NODE_IDS) // 2:])
+    for index, node_id in enumerate(WIRE_NODE_IDS):
+        code = (packed[index >> 1] >> (4 if index & 1 == 0 else 0)) & 0x0F
+        if not code:
+            continue
+        color = WIRE_COLORS[(code - 1) // len(WIRE_PIECE_TYPES)]
+        piece_type = WIRE_PIECE_TYPES[(code - 1) % len(WIRE_PIECE_TYPES)]
+        if piece_type == 'orc':
+            piece_type = f'orc_{next(ordinals)}'
+        board[node_id] = f'{color}_{piece_type}'
+    return board
+
+def _compact_move(move):
+    """Replace node IDs in a last_move record with node indexes."""
+    compact = dict(move)
+    for key in WIRE_MOVE_NODE_KEYS:
+        if compact.get(key) in WIRE_NODE_INDEX:
+            compact[key] = WIRE_NODE_INDEX[compact[key]]
+    if compact.get('intermediate_nodes'):
+        compact['intermediate_nodes'] = [WIRE_NODE_INDEX.get(n, n) for n in compact['intermediate_nodes']]
+    return compact
+
+def _compact_game_state(state):
+    """Return a copy of a game state dict with the board packed and moves indexed."""
+    compact = dict(state)
+    if isinstance(compact.get('board'), dict):
+        compact['board'] = pack_board(compact['board'])
+    if isinstance(compact.get('final_board'), dict):
+        compact['final_board'] = pack_board(compact['final_board'])
+    if isinstance(compact.get('last_move'), dict):
+        compact['last_move'] = _compact_move(compact['last_move'])
+    return compact
+
+def _msgpack(obj, out):
+    """Append the MessagePack encoding of obj to the bytearray out (subset used by the wire format)."""
+    if obj is None:
+        out.append(0xc0)
+    elif obj is True or obj is False:
+        out.append(0xc3 if obj else 0xc2)
+    elif isinstance(obj, int):
+        if 0 <= obj < 0x80:
+            out.append(obj)
+        elif -32 <= obj < 0:
+            out.append(obj & 0xff)
+        elif -2**31 <= obj < 2**31:
+            out += struct.pack('>Bi', 0xd2, obj)
+        else:
+            out += struct.pack('>Bq', 0xd3, obj)
+    elif isinstance(obj, float):
+        out += struct.pack('>Bd', 0xcb, obj)
+    elif isinstance(obj, (bytes, bytearray)):
+        if len(obj) < 0x100:
+            out += struct.pack('>BB', 0xc4, len(obj))
+        else:
+            out += struct.pack('>BI', 0xc6, len(obj))
+        out += obj
+    elif isinstance(obj, str):
+        data = obj.encode('utf-8')
+        if len(data) < 32:
+            out.append(0xa0 | len(data))
+        elif len(data) < 0x100:
+            out += struct.pack('>BB', 0xd9, len(data))
+        else:
+            out += struct.pack('>BI', 0xdb, len(data))
+        out += data
+    elif isinstance(obj, (list, tuple)):
+        if len(obj) < 16:
+            out.append(0x90 | len(obj))
+        else:
+            out += struct.pack('>BI', 0xdd, len(obj))
+        for item in obj:
+            _msgpack(item, out)
+    elif isinstance(obj, dict):
+        if len(obj) < 16:
+            out.append(0x80 | len(obj))
+        else:
+            out += struct.pack('>BI', 0xdf, len(obj))
+        for key, value in obj.items():
+            _msgpack(str(key), out)
+            _msgpack(value, out)
+    else:
+        # Same fallback as the JSON path (datetime objects etc.)
+        _msgpack(str(obj), out)
+    return out
+
+def encode_binary_notification(notification):
+    """Encode a lobby_update notification as a binary wire frame."""
+    lobby_info = dict(notification['lobby_info'])
+    lobby_info['game_state'] = _compact_game_state(lobby_info['game_state'])
+    data = notification.get('data')
+    if isinstance(data, dict) and ('board' in data or 'final_board' in data):
+        data = _compact_game_state(data)
+    frame = dict(notification, lobby_info=lobby_info, data=data)
+    return bytes(_msgpack(frame, bytearray()))
+
+def _room_connected(room):
+    """Check whether any connection in this process is in the given room."""
+    try:
+        return next(socketio.server.manager.get_participants('/', room), None) is not None
+    except KeyError:
+        return False
+
+def _room_has_participants(room):
+    """Check whether the given room may have connections in any worker."""
+    if SOCKETIO_MESSAGE_QUEUE:
+        # Participants may be connected to another worker
+        return True
+    return _room_connected(room)
+
 def notify_lobby_update(lobby_id, event_type, data=None):
     """Send WebSocket notification to all players in a lobby."""
     if lobby_id in lobbies:
         lobby = lobbies[lobby_id]
-        notification = {
-            'event_type': event_type,
-            'lobby_info': lobby.get_lobby_info(),
-            'data': data
-        }
-        # Convert datetime objects to strings for JSON serialization
-        notification = json.loads(json.dumps(notification, default=str))
+        # Notifications raised while a command is being applied go out after it commits,
+        # in command order, so they never carry a half-applied state
+        if lobby.in_command():
+            lobby.pending_notifications.append((event_type, data))
+            return
+        snapshot = lobby.snapshot
+        # Convert datetime objects to strings for JSON serialization (the snapshot's
+        # lobby info is serialized once and shared by every event of the same version)
+        payload = '{"event_type": %s, "lobby_info": %s, "data": %s}' % (
+            json.dumps(event_type), snapshot.lobby_info_json(), json.dumps(data, default=str))
+        # Every event carries its sequence number so reconnecting clients can resume after it
+        payload = lobby.record_event(payload)
+        notification = json.loads(payload)
+        # Only pay for the binary encoding when a binary client is listening
+        if _room_has_participants(binary_room(lobby_id)):
+            socketio.emit('lobby_update_bin', encode_binary_notification({
+                'seq': notification['seq'],
+                'event_type': event_type,
+                'lobby_info': snapshot.get_lobby_info(),
+                'data': data
+            }), room=binary_room(lobby_id))
         socketio.emit('lobby_update', notification, room=lobby_id)
 
 class Lobby:
@@ -439,6 +1253,7 @@ class Lobby:
         self.lobby_id = lobby_id
         self.players = []
         self.spectators = []
+        self.members = {}  # player id -> player or spectator record
         self.created_at = datetime.now()
         # Turn timer configuration (in seconds)
         self.turn_time_limit = time_limit if time_limit is not None else TURN_TIME_LIMIT
@@ -469,7 +1284,43 @@ class Lobby:
         'promotion_orc': None  # Name of the orc being promoted
         }
 
+        # Recent lobby events as (seq, serialized notification) for resumable streams
+        self.event_seq = 0
+        self.recent_events = deque(maxlen=EVENT_LOG_SIZE)
+        self.event_condition = threading.Condition()
+
+        # Single-writer command queue: every state change goes through submit(), and
+        # whichever thread holds the writer slot applies queued commands in order
+        self._commands = deque()
+        self._writer = threading.Lock()
+        self._writer_thread = None
+        self.pending_notifications = []
+        self.version = 0
+        # Versions are only unique within an epoch: a lobby rebuilt from its journal counts them
+        # again from its last snapshot, so it starts a new epoch and old ETags never match
+        self.epoch = uuid.uuid4().hex[:8]
+        # Wall-clock time of the last command, and set once this copy stopped being the live
+        # lobby (spilled to disk or handed to another shard)
+        self.last_active = time.time()
+        self.evicted = False
+
+        # Move journal: journaled lobbies append every committed command to their journal file
+        # and keep the same records in history (the game's compact move list, used by the archive).
+        # While replaying, commands run at their recorded time and dice without re-validation.
+        self.journaled = False
+        self.history = bytearray()
+        self.journal_segment = 0
+        self._journaled_since_snapshot = 0
+        self.replaying = False
+        self.clock = None
+        self.replay_dice = None
+        self.snapshot = LobbySnapshot(self)
+
     def add_player(self, player_id, player_name):
+        member = self.members.get(player_id)
+        if member is not None:
+            # Already here, e.g. seated by matchmaking or rejoining after a reload
+            return 'player' if 'color' in member else 'spectator'
         if len(self.players) < 2:
             # Check which color slots are available
             red_slot_occupied = any(p['color'] == 'red' for p in self.players)
@@ -490,45 +1341,353 @@ class Lobby:
                 'id': player_id,
                 'name': player_name,
                 'color': assigned_color,
-                'joined_at': datetime.now()
+                'joined_at': datetime.fromtimestamp(self.now())
             })
+            self.members[player_id] = self.players[-1]
             
             return 'player'
         else:
             self.spectators.append({
                 'id': player_id,
                 'name': player_name,
-                'joined_at': datetime.now()
+                'joined_at': datetime.fromtimestamp(self.now())
             })
+            self.members[player_id] = self.spectators[-1]
             return 'spectator'
 
     def remove_player(self, player_id):
-        # Remove from players
-        self.players = [p for p in self.players if p['id'] != player_id]
-        # Remove from spectators
-        self.spectators = [s for s in self.spectators if s['id'] != player_id]
+        member = self.members.pop(player_id, None)
+        if member is not None and 'color' in member:
+            # Remove from players
+            self.players = [p for p in self.players if p['id'] != player_id]
+        elif member is not None:
+            # Remove from spectators
+            self.spectators = [s for s in self.spectators if s['id'] != player_id]
         
         # If no players left, mark lobby for cleanup
         if len(self.players) == 0 and len(self.spectators) == 0:
             return True
         return False
 
+    def find_player(self, player_id):
+        """Seated player record for player_id, or None (spectators have no seat)."""
+        member = self.members.get(player_id)
+        return member if member is not None and 'color' in member else None
+
+    def submit(self, command, *args):
+        """Apply a command through the lobby's single-writer queue and return its result.
+
+        Commands for one lobby run strictly one at a time in submission order; commands
+        for different lobbies never wait on each other.
+        """
+        if self.in_command():
+            # Nested call from a running command (e.g. a move issued by a controlled move)
+            return command(*args)
+        future = Future()
+        self._commands.append((command, args, future))
+        self._drain_commands()
+        result = future.result()
+        if self.journaled and JOURNAL_SYNC_COMMIT:
+            # Group commit: wait for the batch holding this command's journal records to be fsynced
+            move_journal.sync()
+        return result
+
+    def _redirect_commands(self):
+        """Apply commands queued on a spilled copy to the lobby paged back in from disk.
+
+        A lobby handed to another shard is no longer in the store, so its commands fail with KeyError.
+        """
+        while self._commands:
+            command, args, future = self._commands.popleft()
+            try:
+                # Only this lobby's own methods can be re-bound to the live copy
+                name = getattr(command, '__name__', None)
+                if getattr(command, '__self__', None) is not self or not callable(getattr(Lobby, name, None)):
+                    raise TypeError(f"Cannot redirect {command!r} to the live lobby")
+                live = lobbies[self.lobby_id]
+                future.set_result(live.submit(getattr(live, name), *args))
+            except Exception as e:
+                future.set_exception(e)
+
+    def lifecycle_state(self):
+        """'waiting', 'active' or 'finished', which picks the lobby's idle TTL."""
+        return lifecycle_state(self.game_state)
+
+    def in_command(self):
+        """True when called from the thread currently applying this lobby's commands."""
+        return self._writer_thread == threading.get_ident()
+
+    def _drain_commands(self):
+        """Become the writer if the slot is free and apply queued commands until empty."""
+        while self._commands:
+            if not self._writer.acquire(blocking=False):
+                # Another thread is the writer and will apply our command
+                return
+            if self.evicted:
+                self._writer.release()
+                self._redirect_commands()
+                return
+            self._writer_thread = threading.get_ident()
+            try:
+                while self._commands:
+                    command, args, future = self._commands.popleft()
+                    # The future is always resolved, even when the store, the journal or a
+                    # notification fails, so its submitter never waits forever
+                    try:
+                        result = self._apply_command(command, args)
+                    except BaseException as e:
+                        future.set_exception(e)
+                        if not isinstance(e, Exception):
+                            raise
+                    else:
+                        future.set_result(result)
+            finally:
+                self._writer_thread = None
+                self._writer.release()
+
+    def _apply_command(self, command, args):
+        """Apply one command and publish it.
+
+        A command that raises is rolled back unpublished; one that returns (False, message)
+        is rejected and leaves the version, and so the ETag, unchanged.
+        """
+        self.last_active = time.time()
+        # Shared stores lock the lobby and load newer state from other workers here
+        with lobbies.command_scope(self):
+            was_started = self.game_state['game_started']
+            was_over = self.game_state.get('game_over')
+            history_length = len(self.history)
+            # The whole command sees one timestamp, which is the one journaled for replay
+            self.clock = time.time()
+            try:
+                result = command(*args)
+                if self.journaled:
+                    self._journal_command(command, args, result, was_started, was_over)
+            except BaseException:
+                self._rollback(history_length)
+                raise
+            finally:
+                self.clock = None
+            if isinstance(result, tuple) and result and result[0] is False:
+                # A rejected command changed nothing, so there is no new version to publish
+                self.pending_notifications = []
+                return result
+            self._commit()
+            if self._journaled_since_snapshot >= JOURNAL_SNAPSHOT_INTERVAL:
+                self._checkpoint_journal()
+        return result
+
+    def _rollback(self, history_length):
+        """Discard a failed command's partial changes by reloading the last published state."""
+        self.pending_notifications = []
+        history = self.history[:history_length]
+        # The snapshot is frozen, so it goes through JSON like a handed-off record
+        self.restore(json.loads(json.dumps(self.to_record(), default=str)))
+        self.history = history
+
+    def _commit(self):
+        """Publish a new snapshot for readers and send the command's notifications."""
+        self.version += 1
+        self.snapshot = LobbySnapshot(self, self.snapshot)
+        with self.event_condition:
+            # Wake long-polling /state requests
+            self.event_condition.notify_all()
+        notifications, self.pending_notifications = self.pending_notifications, []
+        self._writer_thread = None
+        try:
+            for event_type, data in notifications:
+                # Events that carry the whole game state send the published copy
+                if data is self.game_state:
+                    data = self.snapshot.game_state
+                self.notify(event_type, data)
+        finally:
+            self._writer_thread = threading.get_ident()
+        if not self.replaying:
+            turn_clock.update(self)
+            lobby_directory.update(self.snapshot)
+
+    def notify(self, event_type, data=None):
+        """Send a lobby_update for this lobby; replayed commands stay silent."""
+        if not self.replaying:
+            notify_lobby_update(self.lobby_id, event_type, data)
+
+    def now(self):
+        """Timestamp of the command being applied (or replayed), else the current time."""
+        return self.clock if self.clock is not None else time.time()
+
+    def start_journal(self):
+        """Start journaling a newly created lobby."""
+        self.journaled = True
+        payload = struct.pack('<i', self.turn_time_limit) + self.lobby_id.encode('utf-8')
+        record = encode_journal_record(JOURNAL_CREATE, self.created_at.timestamp(), payload)
+        self.history += record
+        move_journal.append(self.lobby_id, self.journal_segment, record)
+
+    def _checkpoint_journal(self):
+        """Start a new journal segment and snapshot the just-published state for compaction."""
+        self.journal_segment += 1
+        self._journaled_since_snapshot = 0
+        move_journal.checkpoint(self.lobby_id, self.journal_segment, self.to_record())
+
+    def _journal_command(self, command, args, result, was_started, was_over):
+        """Append the journal records for a command that was just applied."""
+        if getattr(command, '__name__', None) == 'execute_batch':
+            # Batches journal each of their actions as it is applied
+            return
+        self._append_journal(*self._journal_records(command, args, result, was_started, was_over))
+
+    def _journal_records(self, command, args, result, was_started, was_over):
+        """(records, game finished) to journal for a command that was just applied."""
+        name = getattr(command, '__name__', None)
+        succeeded = result[0] if isinstance(result, tuple) else True
+        last_move = self.game_state.get('last_move') or {}
+        color = bytes([WIRE_COLORS.index(last_move['player'])]) if last_move.get('player') in WIRE_COLORS else b''
+        records = []
+        if name == 'add_player':
+            records.append((JOURNAL_JOIN, _journal_str(args[0]) + _journal_str(args[1])))
+        elif name == 'remove_player':
+            records.append((JOURNAL_LEAVE, _journal_str(args[0])))
+        elif name == 'update_game_state' and succeeded:
+            records.append((JOURNAL_STATE, json.dumps(args[0], default=str).encode('utf-8')))
+        elif not succeeded:
+            pass
+        elif name == 'execute_move':
+            records.append((JOURNAL_MOVE, color + _journal_path(args[0], args[1])))
+        elif name == 'execute_controlled_move':
+            records.append((JOURNAL_CONTROLLED_MOVE, color + _journal_path(args[0], args[1])))
+        elif name == 'roll_spider_dice':
+            dice = last_move['dice_results']
+            records.append((JOURNAL_DICE, color + bytes([dice['die1'], dice['die2']])))
+        elif name == 'sacrifice_piece':
+            records.append((JOURNAL_SACRIFICE, color + bytes([WIRE_NODE_INDEX[last_move['node']]])))
+        elif name == 'control_enemy_piece':
+            records.append((JOURNAL_CONTROL, color + bytes([WIRE_NODE_INDEX[last_move['controlled_node']]])))
+        elif name == 'promote_orc':
+            records.append((JOURNAL_PROMOTE, color + bytes([encode_piece(last_move['promoted_to'])[0]])))
+        elif name == 'handle_player_timeout':
+            records.append((JOURNAL_TIMEOUT, bytes([WIRE_COLORS.index(args[0])])))
+        elif name == 'add_chat_message':
+            records.append((JOURNAL_CHAT, _journal_str(args[0]) + _journal_str(args[1])))
+
+        if self.game_state['game_started'] and not was_started:
+            records.append((JOURNAL_START, bytes(pack_board(self.game_state['board']))))
+        # Checkmate and stalemate are recorded so a replay never has to search for them
+        game_finished = self.game_state.get('game_over') and not was_over
+        if game_finished and self.game_state.get('game_end_reason') in JOURNAL_END_REASONS:
+            records.append((JOURNAL_GAME_OVER, bytes([
+                WIRE_COLORS.index(self.game_state['winner']),
+                JOURNAL_END_REASONS.index(self.game_state['game_end_reason'])
+            ])))
+        return records, game_finished
+
+    def _append_journal(self, records, game_finished):
+        """Write journal records and archive the game if they finished it."""
+        if records:
+            encoded = b''.join(
+                encode_journal_record(record_type, self.clock, payload) for record_type, payload in records)
+            self.history += encoded
+            self._journaled_since_snapshot += 1
+            move_journal.append(self.lobby_id, self.journal_segment, encoded)
+        if game_finished:
+            game_archive.add(self.lobby_id, self.clock, self.players, self.game_state['winner'],
+                             self.game_state['game_end_reason'], bytes(self.history))
+
     def get_lobby_info(self):
+        """Latest published (immutable) lobby info - never the live state being mutated."""
+        return self.snapshot.get_lobby_info()
+
+    def to_record(self):
+        """Plain-data record of the last committed state, used for handoff between workers."""
+        snapshot = self.snapshot
         return {
             'lobby_id': self.lobby_id,
-            'players': self.players,
-            'spectators': self.spectators,
-            'game_state': self.game_state,
-            'can_start': len(self.players) == 2
+            'created_at': self.created_at.isoformat(),
+            'turn_time_limit': self.turn_time_limit,
+            'version': snapshot.version,
+            'epoch': self.epoch,
+            'event_seq': self.event_seq,
+            'journaled': self.journaled,
+            'journal_segment': self.journal_segment,
+            'history': base64.b64encode(self.history).decode('ascii'),
+            'players': snapshot.players,
+            'spectators': snapshot.spectators,
+            'game_state': snapshot.game_state
         }
 
+    @classmethod
+    def from_record(cls, record):
+        """Rebuild a Lobby from to_record() output."""
+        lobby = cls(record['lobby_id'], record['turn_time_limit'])
+        lobby.restore(record)
+        # Stream readers that resume across the handoff get a snapshot instead of missing events
+        lobby.event_seq = record['event_seq']
+        return lobby
+
+    def restore(self, record):
+        """Load the committed state in a to_record() record into this lobby."""
+        self.created_at = datetime.fromisoformat(record['created_at'])
+        self.turn_time_limit = record['turn_time_limit']
+        for member in record['players'] + record['spectators']:
+            member['joined_at'] = datetime.fromisoformat(member['joined_at'])
+        self.players = record['players']
+        self.spectators = record['spectators']
+        self.members = {member['id']: member for member in self.spectators + self.players}
+        self.game_state = record['game_state']
+        self.version = record['version']
+        self.epoch = record.get('epoch', self.epoch)
+        self.journaled = record.get('journaled', False)
+        self.journal_segment = record.get('journal_segment', 0)
+        self.history = bytearray(base64.b64decode(record.get('history', '')))
+        self.last_active = time.time()
+        self.snapshot = LobbySnapshot(self)
+
+    def refresh(self, record):
+        """Adopt a newer state committed by another worker (shared lobby stores)."""
+        with self._writer:
+            if record['version'] > self.version:
+                self.restore(record)
+        # Commands queued while we held the writer slot are ours to apply
+        self._drain_commands()
+
+    def record_event(self, payload):
+        """Number a serialized notification, append it to the event log and wake stream readers.
+
+        Returns the payload with its sequence number added as a leading "seq" key.
+        """
+        with self.event_condition:
+            self.event_seq += 1
+            payload = '{"seq": %d, %s' % (self.event_seq, payload[1:])
+            self.recent_events.append((self.event_seq, payload))
+            self.event_condition.notify_all()
+            return payload
+
+    def events_since(self, seq):
+        """Return the events after seq, or None if the log no longer covers the gap."""
+        with self.event_condition:
+            if seq > self.event_seq:
+                return None
+            oldest_seq = self.recent_events[0][0] if self.recent_events else self.event_seq + 1
+            if seq + 1 < oldest_seq and seq < self.event_seq:
+                return None
+            return [event for event in self.recent_events if event[0] > seq]
+
+    def wait_for_events(self, seq, timeout):
+        """Block until an event after seq is recorded or the timeout expires."""
+        with self.event_condition:
+            return self.event_condition.wait_for(lambda: self.event_seq > seq, timeout)
+
+    def wait_for_version(self, version, timeout):
+        """Block until a command commits past version or the timeout expires."""
+        with self.event_condition:
+            return self.event_condition.wait_for(lambda: self.version > version, timeout)
+
     def _update_turn_timer(self, player_color):
         """Update the turn timer for the current player."""
         if not self.game_state['game_started'] or not self.game_state['turn_start_time']:
             return
         
         # Calculate elapsed time since turn started
-        current_time = datetime.now().timestamp()
+        current_time = self.now()
         elapsed_time = current_time - self.game_state['turn_start_time']
         
         # Subtract elapsed time from player's remaining time
@@ -540,7 +1699,7 @@ class Lobby:
         
     def _start_next_player_timer(self, next_player_color):
         """Start the timer for the next player's turn."""
-        self.game_state['turn_start_time'] = datetime.now().timestamp()
+        self.game_state['turn_start_time'] = self.now()
 
     def _check_time_expired(self, player_color):
         """Check if a player's time has expired."""
@@ -552,7 +1711,7 @@ class Lobby:
         if not self.game_state.get('turn_start_time'):
             return False
         
-        current_time = datetime.now().timestamp()
+        current_time = self.now()
         elapsed_this_turn = current_time - self.game_state['turn_start_time']
         remaining_time = self.game_state['player_time_remaining'][player_color]
         
@@ -567,7 +1726,7 @@ class Lobby:
             return False, "Game not active"
         
         # Verify the player has actually timed out
-        if not self._check_time_expired(player_color):
+        if not self.replaying and not self._check_time_expired(player_color):
             return False, "Player has not timed out"
         
         # Game over - the other player wins
@@ -578,14 +1737,14 @@ class Lobby:
         self.game_state['timeout_player'] = player_color
         
         # Notify all players about the timeout
-        notify_lobby_update(self.lobby_id, 'player_timeout', {
+        self.notify('player_timeout', {
             'timeout_player': player_color,
             'winner': winner_color,
             'game_end_reason': 'timeout'
         })
         
         # Send game over event
-        notify_lobby_update(self.lobby_id, 'game_over', {
+        self.notify('game_over', {
             'winner': winner_color,
             'game_end_reason': 'timeout',
             'timeout_player': player_color,
@@ -614,7 +1773,7 @@ class Lobby:
         self.game_state['player_turn_numbers'] = {'red': 0, 'blue': 0}  # Initialize player turn counters
         
         # Start the turn timer for the first player (red)
-        self.game_state['turn_start_time'] = datetime.now().timestamp()
+        self.game_state['turn_start_time'] = self.now()
         
         # Update the board state to reflect piece positions
         self.game_state['board'] = {}
@@ -622,7 +1781,12 @@ class Lobby:
             self.game_state['board'][node_id] = piece_name
         
         # Notify all players about the game start
-        notify_lobby_update(self.lobby_id, 'game_started', self.game_state)
+        self.notify('game_started', self.game_state)
+
+    def auto_start_if_ready(self):
+        """Start the game once both player slots are filled."""
+        if len(self.players) == 2 and not self.game_state['game_started']:
+            self.auto_start_game()
 
     def auto_start_game(self):
         """Automatically start the game with default piece mapping when two players join."""
@@ -681,24 +1845,26 @@ class Lobby:
             return False, "No piece at source node"
         
         # Verify it's the player's piece
-        player = next((p for p in self.players if p['id'] == player_id), None)
+        player = self.find_player(player_id)
         if not player or not piece_name.startswith(player['color'] + '_'):
             return False, "Not your piece"
         
-        # Verify the move is legal
-        legal_moves = self.get_legal_moves_for_piece(from_node)
-        if to_node not in legal_moves:
-            return False, "Illegal move"
-        
-        # Check if the player is currently in check
-        if self._is_player_in_check(player['color']):
-            # If in check, the move must resolve the check
-            if not self._does_move_resolve_check(from_node, to_node, piece_name, player['color']):
-                return False, "You are in check! You must make a move that resolves the check"
-        else:
-            # If not in check, check if this move would put the player's own Matron Mother in check
-            if not self._is_move_safe_for_matron_mother(from_node, to_node, piece_name, player['color']):
-                return False, "This move would put your Matron Mother in check"
+        # Journaled moves were validated when they were first played
+        if not self.replaying:
+            # Verify the move is legal
+            legal_moves = self.get_legal_moves_for_piece(from_node)
+            if to_node not in legal_moves:
+                return False, "Illegal move"
+            
+            # Check if the player is currently in check
+            if self._is_player_in_check(player['color']):
+                # If in check, the move must resolve the check
+                if not self._does_move_resolve_check(from_node, to_node, piece_name, player['color']):
+                    return False, "You are in check! You must make a move that resolves the check"
+            else:
+                # If not in check, check if this move would put the player's own Matron Mother in check
+                if not self._is_move_safe_for_matron_mother(from_node, to_node, piece_name, player['color']):
+                    return False, "This move would put your Matron Mother in check"
         
         # Handle weaponmaster special movement (two-node path with potential captures)
         captured_pieces = []
@@ -827,7 +1993,7 @@ class Lobby:
                 self.game_state['promotion_orc'] = piece_name
                 
                 # Notify about promotion opportunity
-                notify_lobby_update(self.lobby_id, 'orc_promotion_available', {
+                self.notify('orc_promotion_available', {
                     'promotable_pieces': promotable_pieces,
                     'promotion_node': final_destination,
                     'player': player['color']
@@ -850,8 +2016,10 @@ class Lobby:
         # Check if the next player is in check
         next_player_color = self.game_state['current_turn']
 
-        # Check if the next player is in checkmate
-        if self._is_player_in_checkmate(next_player_color):
+        # Check if the next player is in checkmate (a replay takes the result from the journal)
+        if self.replaying:
+            pass
+        elif run_rules(self._is_player_in_checkmate, next_player_color):
             # Game over - the player who just moved wins
             winner_color = player['color']
             self.game_state['game_over'] = True
@@ -862,7 +2030,7 @@ class Lobby:
             print(f"💀 Loser: {next_player_color}")
             print(f"🎮 Game ended due to checkmate")
             print(f"📊 Final board state: {self.game_state['board']}")
-        elif not self._does_player_have_legal_moves(next_player_color):
+        elif not run_rules(self._does_player_have_legal_moves, next_player_color):
             # Stalemate - no legal moves but not in check (player who can't move loses)
             winner_color = player['color']  # The player who just moved wins
             self.game_state['game_over'] = True
@@ -875,11 +2043,11 @@ class Lobby:
             print(f"📊 Final board state: {self.game_state['board']}")
         
         # Notify all players about the move
-        notify_lobby_update(self.lobby_id, 'piece_moved', self.game_state)
+        self.notify('piece_moved', self.game_state)
         
         # If game is over, send a separate game_over event
         if self.game_state.get('game_over'):
-            notify_lobby_update(self.lobby_id, 'game_over', {
+            self.notify('game_over', {
                 'winner': self.game_state.get('winner'),
                 'game_end_reason': self.game_state.get('game_end_reason'),
                 'final_board': self.game_state['board']
@@ -894,7 +2062,7 @@ class Lobby:
             return False, "Game not started"
         
         # Find the player
-        player = next((p for p in self.players if p['id'] == player_id), None)
+        player = self.find_player(player_id)
         if not player:
             return False, "Player not found"
         
@@ -908,9 +2076,12 @@ class Lobby:
             return False, f"Must wait until turn {SPIDER_DICE_MIN_TURN} (current turn: {player_turn_count})"
         
         # Roll two d8 dice (1-8)
-        import random
-        die1 = random.randint(1, 8)
-        die2 = random.randint(1, 8)
+        if self.replaying:
+            die1, die2 = self.replay_dice
+        else:
+            import random
+            die1 = random.randint(1, 8)
+            die2 = random.randint(1, 8)
         
         # Determine spider results (5-8 = spider, 1-4 = knife)
         die1_spider = die1 >= 5
@@ -952,7 +2123,7 @@ class Lobby:
             self._start_next_player_timer(next_player_color)
 
         # Notify all players about the dice roll
-        notify_lobby_update(self.lobby_id, 'spider_dice_rolled', self.game_state)
+        self.notify('spider_dice_rolled', self.game_state)
         
         return True, self.game_state
     
@@ -963,7 +2134,7 @@ class Lobby:
             return False, "Game not started"
         
         # Find the player
-        player = next((p for p in self.players if p['id'] == player_id), None)
+        player = self.find_player(player_id)
         if not player:
             return False, "Player not found"
         
@@ -1020,7 +2191,7 @@ class Lobby:
             self._start_next_player_timer(next_player_color)
 
         # Notify all players about the sacrifice
-        notify_lobby_update(self.lobby_id, 'piece_sacrificed', self.game_state)
+        self.notify('piece_sacrificed', self.game_state)
         
         return True, self.game_state
     
@@ -1031,7 +2202,7 @@ class Lobby:
             return False, "Game not started"
         
         # Find the player
-        player = next((p for p in self.players if p['id'] == player_id), None)
+        player = self.find_player(player_id)
         if not player:
             return False, "Player not found"
         
@@ -1070,7 +2241,7 @@ class Lobby:
         }
         
         # Notify all players about the control
-        notify_lobby_update(self.lobby_id, 'enemy_piece_controlled', self.game_state)
+        self.notify('enemy_piece_controlled', self.game_state)
         
         return True, self.game_state
     
@@ -1081,7 +2252,7 @@ class Lobby:
             return False, "Game not started"
         
         # Find the player
-        player = next((p for p in self.players if p['id'] == player_id), None)
+        player = self.find_player(player_id)
         if not player:
             return False, "Player not found"
         
@@ -1167,7 +2338,7 @@ class Lobby:
         self._start_next_player_timer(next_player_color)
 
         # Notify all players about the move
-        notify_lobby_update(self.lobby_id, 'controlled_piece_moved', self.game_state)
+        self.notify('controlled_piece_moved', self.game_state)
         
         return True, self.game_state
     
@@ -1178,7 +2349,7 @@ class Lobby:
             return False, "Game not started"
         
         # Find the player
-        player = next((p for p in self.players if p['id'] == player_id), None)
+        player = self.find_player(player_id)
         if not player:
             return False, "Player not found"
         
@@ -1231,19 +2402,82 @@ class Lobby:
         self._start_next_player_timer(next_player_color)
         
         # Notify all players about the promotion
-        notify_lobby_update(self.lobby_id, 'orc_promoted', self.game_state)
+        self.notify('orc_promoted', self.game_state)
         
         return True, self.game_state
+
+    def execute_batch(self, actions, player_id):
+        """Apply an ordered list of actions (see BATCH_ACTIONS) as one command: all or none.
+
+        The batch commits once, so readers see one new version and the lobby gets a single
+        commands_applied update listing the events its actions raised. If an action fails,
+        the game state and its notifications are rolled back and nothing is journaled.
+        """
+        if not isinstance(actions, list) or not actions:
+            return False, "No actions"
+        if len(actions) > BATCH_MAX_ACTIONS:
+            return False, f"At most {BATCH_MAX_ACTIONS} actions per batch"
+        player = self.find_player(player_id)
+        if not player:
+            return False, "Player not in lobby"
+
+        saved_state = copy.deepcopy(self.game_state)
+        first_notification = len(self.pending_notifications)
+        journal = []
+        for index, action in enumerate(actions, 1):
+            name = action.get('action') if isinstance(action, dict) else None
+            if name not in BATCH_ACTIONS:
+                success, result = False, f"Unknown action {name}"
+            elif not self.game_state['game_started']:
+                success, result = False, "Game not started"
+            elif self.game_state.get('game_over'):
+                success, result = False, "Game is over"
+            elif name == 'move' and player['color'] != self.game_state['current_turn']:
+                success, result = False, "Not your turn"
+            else:
+                method, fields = BATCH_ACTIONS[name]
+                command = getattr(self, method)
+                args = tuple(player_id if field == 'player_id' else action.get(field) for field in fields)
+                was_started = self.game_state['game_started']
+                was_over = self.game_state.get('game_over')
+                success, result = command(*args)
+                if success and self.journaled:
+                    # Journal records describe the state right after each action
+                    journal.append(self._journal_records(command, args, (success, result), was_started, was_over))
+            if not success:
+                self.game_state.clear()
+                self.game_state.update(saved_state)
+                del self.pending_notifications[first_notification:]
+                return False, f"Action {index} ({name}): {result}"
+
+        for records, game_finished in journal:
+            self._append_journal(records, game_finished)
+        # Events carrying the whole game state are already covered by the update's lobby_info
+        events = [{'event_type': event_type, 'data': None if data is self.game_state else data}
+                  for event_type, data in self.pending_notifications[first_notification:]]
+        self.pending_notifications[first_notification:] = [
+            ('commands_applied', {'player_id': player_id, 'events': events})]
+        return True, self.game_state
     
+    def update_game_state(self, game_state):
+        """Merge a client-supplied update into the game state."""
+        if not isinstance(game_state, dict):
+            return False, "game_state must be an object"
+        # Boards go out packed to binary clients, so they must hold known nodes and pieces
+        for key in ('board', 'final_board'):
+            board = game_state.get(key)
+            if board is not None and not (isinstance(board, dict) and all(
+                    node_id in WIRE_NODE_INDEX and is_wire_piece(piece) for node_id, piece in board.items())):
+                return False, f"{key} must map node ids to pieces"
+        self.game_state.update(game_state)
+        return True, self.game_state
+
     def add_chat_message(self, player_id, message):
         """Add a chat message to the lobby."""
         # Find the player
-        player = next((p for p in self.players if p['id'] == player_id), None)
+        player = self.members.get(player_id)
         if not player:
-            # Check spectators
-            player = next((s for s in self.spectators if s['id'] == player_id), None)
-            if not player:
-                return False, "Player not found"
+            return False, "Player not found"
         
         # Create message object
         chat_message = {
@@ -1252,8 +2486,8 @@ class Lobby:
             'player_name': player['name'],
             'player_color': player.get('color', 'spectator'),
             'message': message,
-            'timestamp': datetime.now().isoformat(),
-            'is_spectator': player_id in [s['id'] for s in self.spectators]
+            'timestamp': datetime.fromtimestamp(self.now()).isoformat(),
+            'is_spectator': 'color' not in player
         }
         
         # Add to chat messages (keep last 50 messages)
@@ -1518,88 +2752,1864 @@ class Lobby:
                             return True
         return False
 
-# WebSocket event handlers
-@socketio.on('connect')
-def handle_connect():
-    print('Client connected')
+class FrozenDict(dict):
+    """Immutable dict used for published snapshots (still serializes as a plain JSON object)."""
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('Snapshot state is immutable')
 
-@socketio.on('disconnect')
-def handle_disconnect():
-    print('Client disconnected')
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _immutable
 
-@socketio.on('join_lobby')
-def handle_join_lobby(data):
-    lobby_id = data.get('lobby_id')
-    
-    if lobby_id in lobbies:
-        join_room(lobby_id)
-
-        # Send current lobby state to the joining player
-        lobby_info = lobbies[lobby_id].get_lobby_info()
-        # Convert datetime objects to strings for JSON serialization
-        lobby_info = json.loads(json.dumps(lobby_info, default=str))
-        emit('lobby_update', {
-            'event_type': 'joined_lobby',
-            'lobby_info': lobby_info
-        })
-        
-        # Check if we should auto-start the game after this player joins
-        lobby = lobbies[lobby_id]
-        if len(lobby.players) == 2 and not lobby.game_state['game_started']:
-            lobby.auto_start_game()
+    def __copy__(self):
+        return self
 
-@socketio.on('leave_lobby')
-def handle_leave_lobby(data):
-    lobby_id = data.get('lobby_id')
-    player_id = data.get('player_id')
-    
-    if lobby_id in lobbies:
-        leave_room(lobby_id)
-        
-        # Remove player from lobby
-        lobby = lobbies[lobby_id]
-        should_cleanup = lobby.remove_player(player_id)
-        
-        if should_cleanup:
-            del lobbies[lobby_id]
-        else:
-            # Notify remaining players
-            notify_lobby_update(lobby_id, 'player_left', {'player_id': player_id})
+    def __deepcopy__(self, memo):
+        return self
 
-@socketio.on('sacrifice_piece')
-def handle_sacrifice_piece(data):
-    lobby_id = data.get('lobby_id')
-    node_id = data.get('node_id')
-    player_id = data.get('player_id')
-    
-    if lobby_id in lobbies:
-        lobby = lobbies[lobby_id]
-        
-        # Sacrifice the piece
-        success, result = lobby.sacrifice_piece(node_id, player_id)
-        
-        if success:
-            # Notify all players about the sacrifice
-            notify_lobby_update(lobby_id, 'piece_sacrificed', result)
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+def freeze(value, previous=None):
+    """Return an immutable copy of value, reusing every part of previous that is unchanged.
+
+    Dicts become FrozenDicts and lists become tuples. Unchanged sub-structures (captured
+    lists, chat history, player records...) are shared with the previous snapshot instead
+    of being copied again.
+    """
+    if isinstance(value, dict):
+        same = isinstance(previous, FrozenDict) and len(previous) == len(value)
+        frozen = {}
+        for key, item in value.items():
+            prev_item = previous.get(key) if same else None
+            frozen[key] = frozen_item = freeze(item, prev_item)
+            if same and (key not in previous or frozen_item is not prev_item):
+                same = False
+        return previous if same else FrozenDict(frozen)
+    if isinstance(value, (list, tuple)):
+        if not isinstance(previous, tuple):
+            return tuple(freeze(item) for item in value)
+        # Lists here grow at the end and are trimmed at the front (chat history), so line
+        # the new items up with the previous ones before comparing
+        offset = 0
+        if value and previous:
+            first = freeze(value[0], previous[0])
+            if first is not previous[0]:
+                offset = next((i for i in range(1, min(len(previous), 8)) if freeze(value[0], previous[i]) is previous[i]), 0)
+        frozen = tuple(freeze(item, previous[index + offset] if index + offset < len(previous) else None)
+                       for index, item in enumerate(value))
+        if offset == 0 and len(frozen) == len(previous) and all(a is b for a, b in zip(frozen, previous)):
+            return previous
+        return frozen
+    # Scalars are immutable already; keep the previous object when equal so parents can be shared
+    if previous is not None and type(previous) is type(value) and previous == value:
+        return previous
+    return value
+
+class LobbySnapshot:
+    """Immutable, versioned view of a lobby's state, published by the writer after each command.
+
+    Readers such as /state, /legal-moves, spectator streams and broadcasts use the snapshot
+    instead of the live Lobby, so they never wait on the writer and never observe a
+    half-applied command. Parts that did not change are shared with the previous snapshot.
+    """
+    def __init__(self, lobby, previous=None):
+        self.lobby_id = lobby.lobby_id
+        self.version = lobby.version
+        self.epoch = lobby.epoch
+        self.created_at = lobby.created_at
+        self.turn_time_limit = lobby.turn_time_limit
+        previous_info = previous.lobby_info if previous else None
+        self.lobby_info = freeze({
+            'lobby_id': lobby.lobby_id,
+            'players': lobby.players,
+            'spectators': lobby.spectators,
+            'game_state': lobby.game_state,
+            'can_start': len(lobby.players) == 2,
+            'version': lobby.version
+        }, previous_info)
+        self.players = self.lobby_info['players']
+        self.spectators = self.lobby_info['spectators']
+        if previous is not None and previous.players is self.players and previous.spectators is self.spectators:
+            self.members = previous.members
         else:
-            # Send error back to the player
-            emit('sacrifice_error', {'error': result})
-    else:
-        emit('sacrifice_error', {'error': 'Lobby not found'})
+            self.members = {member['id']: member for member in self.spectators + self.players}
+        self.game_state = self.lobby_info['game_state']
+        self._json = None
+        # An unchanged game state keeps its serialized form from the previous snapshot
+        self._game_state_json = previous._game_state_json if previous is not None and previous.game_state is self.game_state else None
 
-@socketio.on('control_enemy_piece')
-def handle_control_enemy_piece(data):
-    lobby_id = data.get('lobby_id')
-    node_id = data.get('node_id')
-    player_id = data.get('player_id')
-    
-    if lobby_id in lobbies:
-        lobby = lobbies[lobby_id]
-        
-        # Control the enemy piece
-        success, result = lobby.control_enemy_piece(node_id, player_id)
+    def get_lobby_info(self):
+        return self.lobby_info
+
+    def game_state_json(self):
+        """Serialized game state, computed at most once per snapshot."""
+        if self._game_state_json is None:
+            self._game_state_json = json.dumps(self.game_state, default=str)
+        return self._game_state_json
+
+    def lobby_info_json(self):
+        """Serialized lobby info, computed at most once per snapshot."""
+        if self._json is None:
+            # The game state is spliced in, so responses that also send it alone serialize it once
+            rest = json.dumps({key: value for key, value in self.lobby_info.items() if key != 'game_state'}, default=str)
+            self._json = '%s, "game_state": %s}' % (rest[:-1], self.game_state_json())
+        return self._json
+
+    find_player = Lobby.find_player
+
+    # Rule helpers only read self.game_state, so they evaluate against the snapshot as-is
+    get_legal_moves_for_piece = Lobby.get_legal_moves_for_piece
+    _is_move_safe_for_matron_mother = Lobby._is_move_safe_for_matron_mother
+    _is_player_in_check = Lobby._is_player_in_check
+    _get_threatening_pieces = Lobby._get_threatening_pieces
+    _does_move_resolve_check = Lobby._does_move_resolve_check
+
+# Position analysis
+# Analysis clients send many arbitrary positions at once; they are evaluated in chunks on a
+# pool of worker processes and each result is streamed back as soon as its chunk completes.
+# ANALYSIS_WORKERS=0 evaluates inline.
+ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', os.cpu_count() or 1))
+ANALYSIS_MAX_POSITIONS = int(os.environ.get('ANALYSIS_MAX_POSITIONS', 1000))
+ANALYSIS_CHUNK_SIZE = 16
+
+class AnalysisPosition:
+    """A board outside any lobby, evaluated with the same rule helpers as a lobby snapshot."""
+    def __init__(self, board, current_turn):
+        self.game_state = {'board': board, 'current_turn': current_turn, 'game_started': True}
+
+    get_legal_moves_for_piece = Lobby.get_legal_moves_for_piece
+    _is_move_safe_for_matron_mother = Lobby._is_move_safe_for_matron_mother
+    _is_player_in_check = Lobby._is_player_in_check
+    _get_threatening_pieces = Lobby._get_threatening_pieces
+    _does_move_resolve_check = Lobby._does_move_resolve_check
+
+def analyze_position(board, players, legal_move_counts):
+    """Check status, threatening pieces and optionally the legal move count of each player."""
+    if not isinstance(board, dict) or not all(
+            isinstance(node_id, str) and isinstance(piece, str) and node_id in NEIGHBOR_TABLE
+            for node_id, piece in board.items()):
+        return {'error': 'board must map node ids to piece names'}
+    result = {}
+    for color in players:
+        position = AnalysisPosition(board, color)
+        threatening_pieces = position._get_threatening_pieces(color)
+        analysis = {'is_in_check': bool(threatening_pieces), 'threatening_pieces': threatening_pieces}
+        if legal_move_counts:
+            analysis['legal_move_count'] = sum(
+                len(position.get_legal_moves_for_piece(node_id))
+                for node_id, piece in board.items() if piece.startswith(color + '_'))
+        result[color] = analysis
+    return result
+
+def analyze_positions(chunk, legal_move_counts):
+    """Analyze a chunk of (index, position) pairs; runs in an analysis worker."""
+    results = []
+    for index, position in chunk:
+        players = position.get('players') or WIRE_COLORS
+        if not isinstance(players, list) or not set(players) <= set(WIRE_COLORS):
+            results.append({'index': index, 'error': 'players must be red and/or blue'})
+            continue
+        try:
+            results.append(dict(analyze_position(position.get('board'), players, legal_move_counts), index=index))
+        except Exception as e:
+            results.append({'index': index, 'error': str(e)})
+    return results
+
+_analysis_pool = None
+_analysis_pool_lock = threading.Lock()
+
+def analysis_pool():
+    """Process pool for position analysis, started on first use (None when ANALYSIS_WORKERS=0)."""
+    global _analysis_pool
+    if ANALYSIS_WORKERS <= 0:
+        return None
+    with _analysis_pool_lock:
+        if _analysis_pool is None:
+            # By now this process runs threads (and may be gevent-patched), so forking could copy
+            # a lock some other thread holds. Spawned workers import the app afresh instead; its
+            # background services only start on first use, so they stay idle there.
+            _analysis_pool = ProcessPoolExecutor(ANALYSIS_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _analysis_pool
+
+def iter_position_analysis(positions, legal_move_counts):
+    """Yield analysis results (each tagged with its position's index) in completion order."""
+    indexed = list(enumerate(positions))
+    chunks = [indexed[start:start + ANALYSIS_CHUNK_SIZE] for start in range(0, len(indexed), ANALYSIS_CHUNK_SIZE)]
+    pool = analysis_pool()
+    if pool is None or len(chunks) == 1:
+        for chunk in chunks:
+            yield from run_rules(analyze_positions, chunk, legal_move_counts)
+        return
+    futures = [pool.submit(analyze_positions, chunk, legal_move_counts) for chunk in chunks]
+    try:
+        for future in as_completed(futures):
+            yield from future.result()
+    finally:
+        # A client that disconnects mid-stream should not keep the pool busy
+        for future in futures:
+            future.cancel()
+
+# Worker handoff
+# gunicorn recycles workers (max_requests), so on exit every lobby is written to a handoff file
+# and the next worker picks them up. The file is a header followed by length-prefixed entries:
+#   [u16 id length][lobby id][u32 metadata length][JSON cold_metadata()][u32 record length][JSON record]
+# Restoring only builds the id -> record index; each lobby is decoded on first access, and
+# until then the reaper and the lobby list go by its metadata.
+
+def save_lobby_handoff(path=LOBBY_HANDOFF_PATH):
+    """Serialize all lobbies (merged with any lobbies already in the file) for the next worker."""
+    if lobbies.shared:
+        # The other workers (and the replacement) already see every lobby
+        return 0
+    with open(path + '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        # Another worker may have handed off its lobbies already - keep them
+        for lobby_id, cold in _read_lobby_handoff(path):
+            if owns_lobby(lobby_id):
+                lobbies.add_cold(lobby_id, cold)
+        count = 0
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(LOBBY_HANDOFF_MAGIC)
+            for lobby_id, metadata, record in lobbies.serialized_records():
+                encoded_id = lobby_id.encode('utf-8')
+                encoded_metadata = json.dumps(metadata).encode('utf-8')
+                f.write(struct.pack('<H', len(encoded_id)) + encoded_id)
+                f.write(struct.pack('<I', len(encoded_metadata)) + encoded_metadata)
+                f.write(struct.pack('<I', len(record)) + record)
+                count += 1
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    print(f"Handed off {count} lobbies to {path}")
+    return count
+
+def _read_lobby_handoff(path):
+    """Yield (lobby_id, HandedOffLobby) pairs from a handoff file without decoding records."""
+    try:
+        with open(path, 'rb') as f:
+            data = memoryview(f.read())
+    except FileNotFoundError:
+        return
+    magic = bytes(data[:len(LOBBY_HANDOFF_MAGIC)])
+    if magic not in (LOBBY_HANDOFF_MAGIC, LOBBY_HANDOFF_MAGIC_V1):
+        print(f"Ignoring lobby handoff file with unknown format: {path}")
+        return
+    offset = len(LOBBY_HANDOFF_MAGIC)
+    while offset < len(data):
+        id_length, = struct.unpack_from('<H', data, offset)
+        offset += 2
+        lobby_id = bytes(data[offset:offset + id_length]).decode('utf-8')
+        offset += id_length
+        metadata = None
+        if magic == LOBBY_HANDOFF_MAGIC:
+            metadata_length, = struct.unpack_from('<I', data, offset)
+            offset += 4
+            metadata = json.loads(bytes(data[offset:offset + metadata_length]))
+            offset += metadata_length
+        record_length, = struct.unpack_from('<I', data, offset)
+        offset += 4
+        record = data[offset:offset + record_length]
+        offset += record_length
+        if metadata is None:
+            # An old file: decode the lobby once to learn its metadata
+            metadata = cold_metadata(Lobby.from_record(json.loads(bytes(record))))
+        yield lobby_id, HandedOffLobby(record, metadata)
+
+def restore_lobby_handoff(path=LOBBY_HANDOFF_PATH):
+    """Index lobbies handed off by the previous worker; they are decoded lazily on access."""
+    if lobbies.shared:
+        return 0
+    with open(path + '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        count = 0
+        for lobby_id, cold in _read_lobby_handoff(path):
+            lobbies.add_cold(lobby_id, cold)
+            count += 1
+        # The handoff is consumed; a later crash must not resurrect stale state
+        if os.path.exists(path):
+            os.remove(path)
+    if count:
+        print(f"Restored {count} lobbies from {path}")
+    return count
+
+# Move journal
+# Every committed command of a journaled lobby is appended to a journal segment,
+# <JOURNAL_DIR>/<lobby id>.<segment>.journal. A segment is a header followed by records:
+#   [u8 type][u32 payload length][f64 timestamp][payload]
+# Nodes are WIRE_NODE_INDEX bytes, colors are WIRE_COLORS indexes and strings are
+# [u16 length][utf-8]. Records are batched by a writer thread that fsyncs each file once per
+# batch (group commit). replay_journal() rebuilds the Lobby by re-applying the commands with
+# their recorded times and dice, skipping move validation and the checkmate search.
+#
+# Every JOURNAL_SNAPSHOT_INTERVAL commands a lobby starts a new segment and hands its
+# published state to a separate compactor thread, which writes <lobby id>.<segment>.snapshot
+# and then deletes the older segments and snapshots. Appends never wait for a snapshot, and
+# recovery is the newest snapshot plus at most one interval of records to replay.
+JOURNAL_DIR = os.environ.get('JOURNAL_DIR', '/tmp/sava-journal')
+# Commands wait for their journal records to be durable before returning (set to 0 to ack
+# immediately and let the writer catch up)
+JOURNAL_SYNC_COMMIT = os.environ.get('JOURNAL_SYNC_COMMIT', '1') != '0'
+# How long the writer waits for more records before flushing a batch
+JOURNAL_GROUP_COMMIT_SECONDS = float(os.environ.get('JOURNAL_GROUP_COMMIT_MS', 2)) / 1000
+# Journaled commands between snapshots
+JOURNAL_SNAPSHOT_INTERVAL = int(os.environ.get('JOURNAL_SNAPSHOT_INTERVAL', 50))
+JOURNAL_MAGIC = b'SAVAJRNL1'
+JOURNAL_SNAPSHOT_MAGIC = b'SAVASNAP1'
+JOURNAL_RECORD_HEADER = struct.Struct('<BId')
+
+JOURNAL_CREATE = 1           # [i32 turn time limit][lobby id]
+JOURNAL_JOIN = 2             # [str player id][str player name]
+JOURNAL_LEAVE = 3            # [str player id]
+JOURNAL_START = 4            # [packed board]
+JOURNAL_MOVE = 5             # [color][from][path node...]
+JOURNAL_DICE = 6             # [color][die1][die2]
+JOURNAL_SACRIFICE = 7        # [color][node]
+JOURNAL_CONTROL = 8          # [color][node]
+JOURNAL_CONTROLLED_MOVE = 9  # [color][from][path node...]
+JOURNAL_PROMOTE = 10         # [color][piece code]
+JOURNAL_TIMEOUT = 11         # [color of the player who ran out of time]
+JOURNAL_CHAT = 12            # [str player id][str message]
+JOURNAL_STATE = 13           # [JSON game state update]
+JOURNAL_GAME_OVER = 14       # [winner color][end reason]
+JOURNAL_END_REASONS = ['checkmate', 'stalemate']
+JOURNAL_RECORD_NAMES = {
+    JOURNAL_CREATE: 'create', JOURNAL_JOIN: 'join', JOURNAL_LEAVE: 'leave', JOURNAL_START: 'start',
+    JOURNAL_MOVE: 'move', JOURNAL_DICE: 'spider_dice', JOURNAL_SACRIFICE: 'sacrifice',
+    JOURNAL_CONTROL: 'control', JOURNAL_CONTROLLED_MOVE: 'controlled_move', JOURNAL_PROMOTE: 'promote',
+    JOURNAL_TIMEOUT: 'timeout', JOURNAL_CHAT: 'chat', JOURNAL_STATE: 'state_update', JOURNAL_GAME_OVER: 'game_over'
+}
+# Records that count as a move for replay snapshot intervals
+JOURNAL_TURN_RECORDS = (JOURNAL_MOVE, JOURNAL_DICE, JOURNAL_SACRIFICE, JOURNAL_CONTROL,
+                        JOURNAL_CONTROLLED_MOVE, JOURNAL_PROMOTE, JOURNAL_TIMEOUT)
+
+def encode_journal_record(record_type, timestamp, payload):
+    """Frame one journal record."""
+    return JOURNAL_RECORD_HEADER.pack(record_type, len(payload), timestamp) + payload
+
+def _journal_str(value):
+    # Cut on a character boundary so the truncated string still decodes
+    encoded = str(value).encode('utf-8')[:0xFFFF].decode('utf-8', 'ignore').encode('utf-8')
+    return struct.pack('<H', len(encoded)) + encoded
+
+def _journal_read_str(payload, offset=0):
+    length, = struct.unpack_from('<H', payload, offset)
+    offset += 2
+    return bytes(payload[offset:offset + length]).decode('utf-8'), offset + length
+
+def _journal_path(from_node, to_node):
+    return bytes([WIRE_NODE_INDEX[from_node]] + [WIRE_NODE_INDEX[node] for node in to_node.split('->')])
+
+def iter_journal_records(data, header=True):
+    """Yield (type, timestamp, payload) from journal bytes; a torn final record is ignored.
+
+    header=False reads bare records such as a lobby's history or an archived move list.
+    """
+    data = memoryview(data)
+    offset = 0
+    if header:
+        if bytes(data[:len(JOURNAL_MAGIC)]) != JOURNAL_MAGIC:
+            raise ValueError("Not a move journal")
+        offset = len(JOURNAL_MAGIC)
+    while offset + JOURNAL_RECORD_HEADER.size <= len(data):
+        record_type, length, timestamp = JOURNAL_RECORD_HEADER.unpack_from(data, offset)
+        offset += JOURNAL_RECORD_HEADER.size
+        if offset + length > len(data):
+            break
+        yield record_type, timestamp, data[offset:offset + length]
+        offset += length
+
+def _apply_journal_record(lobby, record_type, payload):
+    """Re-apply one journaled command to a lobby that is replaying."""
+    if record_type == JOURNAL_JOIN:
+        player_id, offset = _journal_read_str(payload)
+        player_name, _ = _journal_read_str(payload, offset)
+        lobby.add_player(player_id, player_name)
+    elif record_type == JOURNAL_LEAVE:
+        lobby.remove_player(_journal_read_str(payload)[0])
+    elif record_type == JOURNAL_START:
+        board = unpack_board(bytes(payload))
+        lobby.setup_game_board({piece_name: node_id for node_id, piece_name in board.items()})
+    elif record_type == JOURNAL_CHAT:
+        player_id, offset = _journal_read_str(payload)
+        lobby.add_chat_message(player_id, _journal_read_str(payload, offset)[0])
+    elif record_type == JOURNAL_STATE:
+        lobby.update_game_state(json.loads(bytes(payload)))
+    elif record_type == JOURNAL_GAME_OVER:
+        lobby.game_state['game_over'] = True
+        lobby.game_state['winner'] = WIRE_COLORS[payload[0]]
+        lobby.game_state['game_end_reason'] = JOURNAL_END_REASONS[payload[1]]
+    elif record_type == JOURNAL_TIMEOUT:
+        lobby.handle_player_timeout(WIRE_COLORS[payload[0]])
+    else:
+        color = WIRE_COLORS[payload[0]]
+        player_id = next((p['id'] for p in lobby.players if p['color'] == color), None)
+        if player_id is None:
+            raise ValueError(f"Corrupt journal: {JOURNAL_RECORD_NAMES.get(record_type, record_type)} "
+                             f"record for {color}, who has no seat in lobby {lobby.lobby_id}")
+        if record_type in (JOURNAL_MOVE, JOURNAL_CONTROLLED_MOVE):
+            from_node = WIRE_NODE_IDS[payload[1]]
+            to_node = '->'.join(WIRE_NODE_IDS[index] for index in payload[2:])
+            if record_type == JOURNAL_MOVE:
+                lobby.execute_move(from_node, to_node, player_id)
+            else:
+                lobby.execute_controlled_move(from_node, to_node, player_id)
+        elif record_type == JOURNAL_DICE:
+            lobby.replay_dice = (payload[1], payload[2])
+            lobby.roll_spider_dice(player_id)
+        elif record_type == JOURNAL_SACRIFICE:
+            lobby.sacrifice_piece(WIRE_NODE_IDS[payload[1]], player_id)
+        elif record_type == JOURNAL_CONTROL:
+            lobby.control_enemy_piece(WIRE_NODE_IDS[payload[1]], player_id)
+        elif record_type == JOURNAL_PROMOTE:
+            code = payload[1] - 1
+            piece_type = WIRE_PIECE_TYPES[code % len(WIRE_PIECE_TYPES)]
+            lobby.promote_orc(player_id, f"{WIRE_COLORS[code // len(WIRE_PIECE_TYPES)]}_{piece_type}")
+
+def describe_journal_record(record_type, timestamp, payload):
+    """Plain-data form of a journal record for the replay and export APIs."""
+    entry = {'type': JOURNAL_RECORD_NAMES.get(record_type, record_type), 'timestamp': timestamp}
+    if record_type == JOURNAL_CREATE:
+        entry['turn_time_limit'], = struct.unpack_from('<i', payload)
+    elif record_type in (JOURNAL_JOIN, JOURNAL_LEAVE, JOURNAL_CHAT):
+        entry['player_id'], offset = _journal_read_str(payload)
+        if record_type == JOURNAL_JOIN:
+            entry['player_name'], _ = _journal_read_str(payload, offset)
+        elif record_type == JOURNAL_CHAT:
+            entry['message'], _ = _journal_read_str(payload, offset)
+    elif record_type == JOURNAL_START:
+        entry['board'] = unpack_board(bytes(payload))
+    elif record_type == JOURNAL_STATE:
+        entry['game_state'] = json.loads(bytes(payload))
+    elif record_type == JOURNAL_GAME_OVER:
+        entry['winner'] = WIRE_COLORS[payload[0]]
+        entry['game_end_reason'] = JOURNAL_END_REASONS[payload[1]]
+    else:
+        entry['player'] = WIRE_COLORS[payload[0]]
+        if record_type in (JOURNAL_MOVE, JOURNAL_CONTROLLED_MOVE):
+            entry['from'] = WIRE_NODE_IDS[payload[1]]
+            entry['to'] = '->'.join(WIRE_NODE_IDS[index] for index in payload[2:])
+        elif record_type == JOURNAL_DICE:
+            entry['die1'], entry['die2'] = payload[1], payload[2]
+        elif record_type in (JOURNAL_SACRIFICE, JOURNAL_CONTROL):
+            entry['node'] = WIRE_NODE_IDS[payload[1]]
+        elif record_type == JOURNAL_PROMOTE:
+            code = payload[1] - 1
+            entry['piece'] = f"{WIRE_COLORS[code // len(WIRE_PIECE_TYPES)]}_{WIRE_PIECE_TYPES[code % len(WIRE_PIECE_TYPES)]}"
+    return entry
+
+def iter_replay(segments, lobby=None, header=True):
+    """Replay journal segments step by step, yielding (lobby, type, timestamp, payload) per record.
+
+    Without a base lobby (e.g. one restored from a snapshot) the first segment must start
+    with the create record.
+    """
+    if lobby is not None:
+        lobby.replaying = True
+    for data in segments:
+        for record_type, timestamp, payload in iter_journal_records(data, header):
+            if record_type == JOURNAL_CREATE:
+                time_limit, = struct.unpack_from('<i', payload)
+                lobby = Lobby(bytes(payload[4:]).decode('utf-8'), time_limit)
+                lobby.created_at = datetime.fromtimestamp(timestamp)
+                lobby.replaying = True
+            else:
+                lobby.clock = timestamp
+                _apply_journal_record(lobby, record_type, payload)
+                lobby.version += 1
+            lobby.history += encode_journal_record(record_type, timestamp, payload)
+            yield lobby, record_type, timestamp, payload
+
+def replay_journal(segments, record=None):
+    """Rebuild a Lobby from journal segment contents, optionally on top of a snapshot record."""
+    lobby = Lobby.from_record(record) if record is not None else None
+    for lobby, _, _, _ in iter_replay(segments, lobby):
+        pass
+    if lobby is None:
+        raise ValueError("Journal has no create record or snapshot")
+    if lobby.clock is not None:
+        # Idle time counts from the last journaled command, not from the recovery
+        lobby.last_active = lobby.clock
+    lobby.clock = None
+    lobby.replay_dice = None
+    lobby.replaying = False
+    # Version numbers counted during replay may repeat ones the lost copy already published
+    lobby.epoch = uuid.uuid4().hex[:8]
+    # The recovered lobby keeps appending to the same journal
+    lobby.journaled = True
+    lobby.snapshot = LobbySnapshot(lobby)
+    return lobby
+
+class MoveJournal:
+    """Segmented per-lobby journal files with a group-commit writer and a snapshot compactor.
+
+    With write_through (shared lobby stores) records are written as they are appended, while
+    the command still holds its lobby's lock, so records from different workers reach a lobby's
+    file in commit order; the writer thread then only fsyncs them.
+    """
+    def __init__(self, directory, write_through=False):
+        self.directory = directory
+        self.enabled = bool(directory)
+        self.write_through = write_through
+        self._pending = {}      # lobby_id -> [(segment, bytearray of records not yet written)]
+        self._unsynced = set()  # paths written through but not yet fsynced
+        self._appended = 0      # append counter; _durable is the counter covered by the last fsync
+        self._durable = 0
+        self._compactions = deque()  # (kind, lobby_id, segment or None, record or None, append counter)
+        self._condition = threading.Condition()
+        self._thread = None
+        self._compactor = None
+
+    def path(self, lobby_id, segment, kind='journal'):
+        return os.path.join(self.directory, f'{lobby_id}.{segment}.{kind}')
+
+    def append(self, lobby_id, segment, records):
+        """Queue encoded records for a lobby's journal segment."""
+        if not self.enabled:
+            return
+        if self.write_through:
+            os.makedirs(self.directory, exist_ok=True)
+            self._write_segment(lobby_id, segment, records, fsync=False)
+        with self._condition:
+            if self.write_through:
+                self._unsynced.add(self.path(lobby_id, segment))
+            else:
+                chunks = self._pending.setdefault(lobby_id, [])
+                if chunks and chunks[-1][0] == segment:
+                    chunks[-1][1].extend(records)
+                else:
+                    chunks.append((segment, bytearray(records)))
+            self._appended += 1
+            self._thread = self._ensure_thread(self._thread, self._run, 'move-journal')
+            self._condition.notify_all()
+
+    def checkpoint(self, lobby_id, segment, record):
+        """Queue a snapshot of the lobby state at the start of segment for the compactor."""
+        if not self.enabled:
+            return
+        with self._condition:
+            self._compactions.append(('snapshot', lobby_id, segment, record, self._appended))
+            self._compactor = self._ensure_thread(self._compactor, self._run_compactor, 'journal-compactor')
+            self._condition.notify_all()
+
+    def discard(self, lobby_id):
+        """Drop a removed lobby's journal segments and snapshots."""
+        if not self.enabled:
+            return
+        with self._condition:
+            self._pending.pop(lobby_id, None)
+            self._compactions = deque(job for job in self._compactions if job[1] != lobby_id)
+            # Deleted once the writer has finished any batch that still holds the lobby's records
+            self._compactions.append(('discard', lobby_id, None, None, self._appended))
+            self._compactor = self._ensure_thread(self._compactor, self._run_compactor, 'journal-compactor')
+            self._condition.notify_all()
+
+    def _ensure_thread(self, thread, target, name):
+        # Called with the condition held; threads start lazily so they only run in workers
+        if thread is None or not thread.is_alive():
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+        return thread
+
+    def sync(self, timeout=None):
+        """Wait until everything appended so far is on disk."""
+        with self._condition:
+            target = self._appended
+            return self._condition.wait_for(lambda: self._durable >= target, timeout)
+
+    def _run(self):
+        os.makedirs(self.directory, exist_ok=True)
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._appended > self._durable)
+            # Let commands that commit concurrently join this batch
+            time.sleep(JOURNAL_GROUP_COMMIT_SECONDS)
+            with self._condition:
+                batch, self._pending = self._pending, {}
+                unsynced, self._unsynced = self._unsynced, set()
+                target = self._appended
+            try:
+                run_rules(self._write_batch, batch, unsynced)
+            except OSError as e:
+                print(f"Move journal write failed: {e}")
+            with self._condition:
+                self._durable = target
+                self._condition.notify_all()
+
+    def _write_segment(self, lobby_id, segment, records, fsync=True):
+        with open(self.path(lobby_id, segment), 'ab') as f:
+            if f.tell() == 0:
+                f.write(JOURNAL_MAGIC)
+            f.write(records)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+
+    def _write_batch(self, batch, unsynced=()):
+        for lobby_id, chunks in batch.items():
+            for segment, records in chunks:
+                self._write_segment(lobby_id, segment, records)
+        for path in unsynced:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue  # compacted or discarded meanwhile
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _run_compactor(self):
+        os.makedirs(self.directory, exist_ok=True)
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._compactions)
+                kind, lobby_id, segment, record, target = self._compactions.popleft()
+            try:
+                if kind == 'snapshot':
+                    run_rules(self._write_snapshot, lobby_id, segment, record)
+                # Files are only removed once the writer has flushed every record queued before
+                # the job, so a late batch never recreates a segment that was just deleted
+                with self._condition:
+                    self._condition.wait_for(lambda: self._durable >= target)
+                if kind == 'snapshot':
+                    run_rules(self._remove_segments_before, lobby_id, segment)
+                else:
+                    run_rules(self._remove_files, lobby_id)
+            except OSError as e:
+                print(f"Journal compaction failed: {e}")
+
+    def _write_snapshot(self, lobby_id, segment, record):
+        path = self.path(lobby_id, segment, 'snapshot')
+        with open(path + '.tmp', 'wb') as f:
+            f.write(JOURNAL_SNAPSHOT_MAGIC)
+            f.write(json.dumps(record, default=str).encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+    def _remove_segments_before(self, lobby_id, segment):
+        # Everything before the segment is covered by its snapshot
+        older = segment - 1
+        while older >= 0:
+            removed = False
+            for kind in ('journal', 'snapshot'):
+                try:
+                    os.remove(self.path(lobby_id, older, kind))
+                    removed = True
+                except FileNotFoundError:
+                    pass
+            if not removed:
+                break
+            older -= 1
+
+    def _files(self, lobby_id):
+        """Map kind -> {segment: path} for a lobby's files on disk."""
+        files = {'journal': {}, 'snapshot': {}}
+        for path in glob.glob(os.path.join(glob.escape(self.directory), f'{glob.escape(lobby_id)}.*')):
+            _, segment, kind = os.path.basename(path).rsplit('.', 2)
+            if kind in files and segment.isdigit():
+                files[kind][int(segment)] = path
+        return files
+
+    def _remove_files(self, lobby_id):
+        for paths in self._files(lobby_id).values():
+            for path in paths.values():
+                os.remove(path)
+
+    def load(self, lobby_id):
+        """Rebuild a lobby from its newest readable snapshot and the segments after it."""
+        self.sync()
+        files = self._files(lobby_id)
+        record, first_segment = None, 0
+        for segment in sorted(files['snapshot'], reverse=True):
+            with open(files['snapshot'][segment], 'rb') as f:
+                data = f.read()
+            if data.startswith(JOURNAL_SNAPSHOT_MAGIC):
+                record, first_segment = json.loads(data[len(JOURNAL_SNAPSHOT_MAGIC):]), segment
+                break
+        segments = sorted(segment for segment in files['journal'] if segment >= first_segment)
+        journals = []
+        for segment in segments:
+            with open(files['journal'][segment], 'rb') as f:
+                journals.append(f.read())
+        lobby = replay_journal(journals, record)
+        lobby.journal_segment = max([first_segment] + segments)
+        return lobby
+
+    def lobby_ids(self):
+        """Lobby ids that have journal files."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return {name.split('.', 1)[0] for name in names if name.endswith(('.journal', '.snapshot'))}
+
+move_journal = MoveJournal(JOURNAL_DIR, write_through=lobbies.shared)
+atexit.register(move_journal.sync, 5)
+
+# Turn clock
+# One scheduler thread keeps every active game's deadline (turn start + the current player's
+# remaining time) in a heap ordered by monotonic time, and submits handle_player_timeout
+# when it passes, so players time out even when nobody's client is connected.
+# A turn change pushes a new entry; superseded entries are skipped when they reach the top.
+# Lobbies restored from a handoff or the journal are scheduled from their cold_metadata(), so
+# a game nobody is connected to still times out after a worker recycle or crash.
+def turn_deadline(game_state):
+    """(wall-clock deadline, color) of the player to move, or None when no clock is running."""
+    if game_state['game_started'] and not game_state.get('game_over') and game_state.get('turn_start_time'):
+        color = game_state['current_turn']
+        return (game_state['turn_start_time'] + game_state['player_time_remaining'][color], color)
+    return None
+
+class TurnClock:
+    """Heap scheduler for turn deadlines, O(log n) per turn change."""
+    def __init__(self):
+        self._heap = []  # (monotonic due time, lobby_id, deadline)
+        self._deadlines = {}  # lobby_id -> (wall-clock deadline, color) currently scheduled
+        self._condition = threading.Condition()
+        self._thread = None
+        self.fired = 0
+
+    def update(self, lobby):
+        """Schedule, move or cancel the lobby's timeout after its clock may have changed."""
+        self.schedule(lobby.lobby_id, turn_deadline(lobby.game_state))
+
+    def schedule(self, lobby_id, deadline):
+        """Set the lobby's turn_deadline(), or cancel its timeout when deadline is None."""
+        if self._deadlines.get(lobby_id) == deadline:
+            return
+        with self._condition:
+            if deadline is None:
+                self._deadlines.pop(lobby_id, None)
+                return
+            self._deadlines[lobby_id] = deadline
+            due = time.monotonic() + (deadline[0] - time.time())
+            heapq.heappush(self._heap, (due, lobby_id, deadline))
+            if len(self._heap) > 2 * len(self._deadlines) + 1024:
+                # Drop superseded entries so the heap stays proportional to active games
+                self._heap = [entry for entry in self._heap if self._deadlines.get(entry[1]) is entry[2]]
+                heapq.heapify(self._heap)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='turn-clock', daemon=True)
+                self._thread.start()
+            if self._heap[0][2] is deadline:
+                self._condition.notify()
+
+    def pending(self):
+        """Number of games with a scheduled timeout."""
+        return len(self._deadlines)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    while self._heap and self._deadlines.get(self._heap[0][1]) is not self._heap[0][2]:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+                    delay = self._heap[0][0] - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._condition.wait(delay)
+                _, lobby_id, deadline = heapq.heappop(self._heap)
+                del self._deadlines[lobby_id]
+            try:
+                self._fire(lobby_id, deadline[1])
+            except Exception as e:
+                print(f"Turn clock failed to time out lobby {lobby_id}: {e}")
+
+    def _fire(self, lobby_id, color):
+        try:
+            lobby = lobbies[lobby_id]
+        except KeyError:
+            return  # deleted or moved to another shard
+        success, _ = lobby.submit(lobby.handle_player_timeout, color)
+        if success:
+            self.fired += 1
+            print(f"⏰ {color} ran out of time in lobby {lobby_id}")
+        else:
+            # Not expired by the lobby's wall clock yet (or already over): reschedule if still due
+            self.update(lobby)
+
+turn_clock = TurnClock()
+
+# Lobby reaper
+class LobbyReaper:
+    """Background thread that applies the lobby TTLs and the LOBBY_MAX_HOT cap."""
+    def __init__(self, interval):
+        self.interval = interval
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_running(self):
+        """Start the reaper thread (lazily, so it only runs in processes holding lobbies)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='lobby-reaper', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.reap()
+            except Exception as e:
+                print(f"Lobby reaper failed: {e}")
+
+    def reap(self, now=None):
+        """Delete expired lobbies and spill idle or least recently used ones; returns the counts."""
+        now = now if now is not None else time.time()
+        deleted = spilled = 0
+        for lobby_id, lobby in lobbies.hot_lobbies():
+            if _room_connected(lobby_id):
+                # Someone is watching; the lobby is not idle
+                lobby.last_active = now
+                continue
+            state = lobby.lifecycle_state()
+            idle = now - lobby.last_active
+            if idle > LOBBY_TTLS[state]:
+                deleted += self._delete(lobby_id, now)
+            elif state == 'active' and idle > LOBBY_SPILL_AFTER:
+                spilled += lobbies.evict(lobby_id)
+        for lobby_id, cold in lobbies.cold_lobbies():
+            if now - cold.last_active > LOBBY_TTLS[cold.state]:
+                deleted += self._delete(lobby_id, now)
+        hot = lobbies.hot_lobbies()
+        for lobby_id, _ in hot[:max(0, len(hot) - LOBBY_MAX_HOT)]:
+            spilled += lobbies.evict(lobby_id)
+        if deleted or spilled:
+            print(f"Lobby reaper deleted {deleted} idle lobbies and spilled {spilled} to disk")
+        for lobby_id, player_id in sessions.expire(now):
+            # Members who did not come back after their connection dropped
+            release_abandoned_member(lobby_id, player_id)
+        expired = matchmaker.expire(now)
+        if expired:
+            print(f"Lobby reaper dropped {expired} abandoned matchmaking tickets")
+        return deleted, spilled
+
+    def _delete(self, lobby_id, now):
+        try:
+            if lobbies.shared:
+                # Another worker may have used it since; reading it picks up newer state
+                lobby = lobbies[lobby_id]
+                if now - lobby.last_active <= LOBBY_TTLS[lobby.lifecycle_state()]:
+                    return 0
+            del lobbies[lobby_id]
+        except KeyError:
+            return 0
+        return 1
+
+lobby_reaper = LobbyReaper(LOBBY_REAP_INTERVAL)
+
+# Lobby state polling
+# /api/lobby/<id>/state is tagged with the lobby version: If-None-Match with the current ETag
+# gets a 304 without serializing anything, and ?wait=<seconds> (at most LOBBY_STATE_MAX_WAIT)
+# holds such a request until the next command commits, a long-poll for clients without
+# WebSockets.
+LOBBY_STATE_MAX_WAIT = float(os.environ.get('LOBBY_STATE_MAX_WAIT', 30))
+LOBBY_STATE_WAIT_SLICE = 0.25 if LOBBY_STORE == 'sqlite' else 1.0
+
+# Lobby directory
+# /api/lobbies pages through an index that is updated as lobbies change instead of listing
+# and sorting every lobby per request. Entries are ordered newest first, with a secondary
+# index per status. Changes are batched and pushed to the lobby_directory Socket.IO room
+# every LOBBY_DIRECTORY_PUSH_INTERVAL seconds.
+LOBBY_DIRECTORY_PUSH_INTERVAL = float(os.environ.get('LOBBY_DIRECTORY_PUSH_INTERVAL', 1))
+LOBBY_DIRECTORY_PAGE_SIZE = 50
+LOBBY_DIRECTORY_MAX_PAGE_SIZE = 200
+LOBBY_DIRECTORY_ROOM = 'lobby_directory'
+
+def lobby_status(summary):
+    """Directory status of a lobby list entry: joinable, in_progress, finished or full."""
+    if summary['game_over']:
+        return 'finished'
+    if summary['game_started']:
+        return 'in_progress'
+    return 'joinable' if summary['can_join'] else 'full'
+
+class LobbyDirectory:
+    """Lobby list entries in sorted indexes, newest first; cursors are '<created_at>|<lobby_id>'."""
+    STATUSES = ('all', 'joinable', 'in_progress', 'finished', 'full')
+
+    def __init__(self):
+        self._entries = {}  # lobby_id -> (sort key, summary)
+        self._indexes = {status: [] for status in self.STATUSES}  # sorted (-created, lobby_id) keys
+        self._lock = threading.Lock()
+        self._pending = {}  # lobby_id -> summary, or None once removed, until the next push
+        self._push_thread = None
+        self._synced_at = None
+
+    @staticmethod
+    def _key(created_at, lobby_id):
+        return (-created_at.timestamp(), lobby_id)
+
+    def update(self, snapshot):
+        """Re-index a lobby after a change; a no-op when its entry is unchanged."""
+        summary = lobby_summary(snapshot)
+        with self._lock:
+            current = self._entries.get(snapshot.lobby_id)
+            if current is not None and current[1] == summary:
+                return
+            self._put(self._key(snapshot.created_at, snapshot.lobby_id), summary)
+            self._queue_push(snapshot.lobby_id, summary)
+
+    def remove(self, lobby_id):
+        with self._lock:
+            if self._drop(lobby_id):
+                self._queue_push(lobby_id, None)
+
+    def _put(self, key, summary):
+        self._drop(summary['lobby_id'])
+        bisect.insort(self._indexes['all'], key)
+        bisect.insort(self._indexes[lobby_status(summary)], key)
+        self._entries[summary['lobby_id']] = (key, summary)
+
+    def _drop(self, lobby_id):
+        entry = self._entries.pop(lobby_id, None)
+        if entry is None:
+            return False
+        key, summary = entry
+        for status in ('all', lobby_status(summary)):
+            index = self._indexes[status]
+            del index[bisect.bisect_left(index, key)]
+        return True
+
+    def _sync(self):
+        """Index lobbies this process has not seen commit: restored ones, or other workers' on a shared store."""
+        if self._synced_at is not None and not (lobbies.shared and time.monotonic() - self._synced_at > 1):
+            return
+        summaries = {summary['lobby_id']: summary for summary in lobbies.summaries()}
+        with self._lock:
+            if lobbies.shared:
+                for lobby_id in set(self._entries) - set(summaries):
+                    self._drop(lobby_id)
+            for lobby_id, summary in summaries.items():
+                current = self._entries.get(lobby_id)
+                if current is None or current[1] != summary:
+                    self._put(self._key(datetime.fromisoformat(summary['created_at']), lobby_id), summary)
+            self._synced_at = time.monotonic()
+
+    def page(self, status='all', cursor=None, limit=LOBBY_DIRECTORY_PAGE_SIZE):
+        """(entries, total in this status, next cursor or None); ValueError for a bad cursor."""
+        self._sync()
+        after = None
+        if cursor:
+            created_at, _, lobby_id = cursor.rpartition('|')
+            after = self._key(datetime.fromisoformat(created_at), lobby_id)
+        with self._lock:
+            index = self._indexes[status]
+            start = bisect.bisect_right(index, after) if after else 0
+            entries = [self._entries[key[1]][1] for key in index[start:start + limit]]
+            more = start + limit < len(index)
+            total = len(index)
+        next_cursor = f"{entries[-1]['created_at']}|{entries[-1]['lobby_id']}" if more and entries else None
+        return entries, total, next_cursor
+
+    def _queue_push(self, lobby_id, summary):
+        self._pending[lobby_id] = summary
+        if self._push_thread is None or not self._push_thread.is_alive():
+            self._push_thread = threading.Thread(target=self._run_push, name='lobby-directory', daemon=True)
+            self._push_thread.start()
+
+    def _run_push(self):
+        while True:
+            time.sleep(LOBBY_DIRECTORY_PUSH_INTERVAL)
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if pending and _room_has_participants(LOBBY_DIRECTORY_ROOM):
+                socketio.emit('lobby_directory_update', {
+                    'upserts': [summary for summary in pending.values() if summary is not None],
+                    'removed': [lobby_id for lobby_id, summary in pending.items() if summary is None]
+                }, room=LOBBY_DIRECTORY_ROOM)
+
+lobby_directory = LobbyDirectory()
+
+# Matchmaking
+# Players queue with a time control and a rating. Each time control has its own bucket of
+# waiting tickets sorted by rating, so pairing a new ticket is a bisect for the nearest rating
+# on either side. A pair within MATCHMAKING_RATING_BAND gets a new lobby with both players
+# seated. Waiting tickets that are not polled for MATCHMAKING_TICKET_TTL seconds are dropped
+# by the lobby reaper.
+MATCHMAKING_DEFAULT_RATING = 1500
+MATCHMAKING_RATING_BAND = float(os.environ.get('MATCHMAKING_RATING_BAND', 200))
+MATCHMAKING_TICKET_TTL = float(os.environ.get('MATCHMAKING_TICKET_TTL', 60))
+MATCHMAKING_MAX_WAIT = 30
+MATCHMAKING_WAIT_SAMPLES = 1000
+
+def wait_stats(samples):
+    """Percentiles of recent matchmaking queue waits, in seconds."""
+    samples = sorted(samples)
+    if not samples:
+        return {'samples': 0}
+    return {
+        'samples': len(samples),
+        'p50_seconds': round(samples[len(samples) // 2], 3),
+        'p90_seconds': round(samples[min(len(samples) - 1, int(len(samples) * 0.9))], 3),
+        'p99_seconds': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 3),
+        'max_seconds': round(samples[-1], 3),
+    }
+
+def create_matched_lobby(time_limit, first, second):
+    """Create a lobby for a matched pair with both players already seated (first plays red)."""
+    lobby = Lobby(new_lobby_id(), time_limit)
+    lobby.start_journal()
+    for ticket in (first, second):
+        lobby.submit(lobby.add_player, ticket['player_id'], ticket['player_name'])
+    lobbies[lobby.lobby_id] = lobby
+    return lobby.lobby_id
+
+class MatchmakingQueue:
+    """Tickets of players waiting for an opponent; subclasses keep the rating-sorted buckets.
+
+    A player has at most one waiting ticket: queueing again for the same time control returns
+    it (e.g. after a double click), and for another time control replaces it. Subclasses store
+    the tickets: _claim() queues a ticket or claims its opponent, _unclaim() undoes a claim,
+    _record_match() marks a pair matched, and _queued() and _wait_samples() feed stats().
+    They also implement ticket(ticket_id, wait), cancel(ticket_id) and expire(now).
+    """
+    def enqueue(self, player_id, player_name, time_limit, rating):
+        """Queue a player, or pair them at once; returns the ticket."""
+        lobby_reaper.ensure_running()
+        ticket, opponent = self._claim(self._new_ticket(player_id, player_name, time_limit, rating))
+        if opponent is None:
+            return ticket
+        # Both tickets are claimed, so nobody else can match them while the lobby is built
+        try:
+            lobby_id = create_matched_lobby(time_limit, opponent, ticket)
+        except Exception:
+            self._unclaim(ticket, opponent)
+            raise
+        now = time.time()
+        self._record_match(ticket, opponent, lobby_id, now)
+        return dict(ticket, lobby_id=lobby_id, matched_at=now, last_seen=now)
+
+    def stats(self):
+        """Waiting tickets per time control and percentiles of recent queue waits."""
+        return {'queued': {str(time_limit): count for time_limit, count in self._queued() if count},
+                'waits': wait_stats(self._wait_samples())}
+
+    @staticmethod
+    def _new_ticket(player_id, player_name, time_limit, rating):
+        now = time.time()
+        return {'ticket_id': uuid.uuid4().hex, 'player_id': player_id, 'player_name': player_name,
+                'time_limit': time_limit, 'rating': rating, 'enqueued_at': now, 'last_seen': now,
+                'lobby_id': None, 'matched_at': None}
+
+    @staticmethod
+    def view(ticket):
+        """Public form of a ticket."""
+        end = ticket['matched_at'] or time.time()
+        return {'ticket_id': ticket['ticket_id'], 'player_id': ticket['player_id'],
+                'status': 'matched' if ticket['matched_at'] else 'waiting',
+                'lobby_id': ticket['lobby_id'] if ticket['matched_at'] else None,
+                'time_limit': ticket['time_limit'], 'rating': ticket['rating'],
+                'waited_seconds': round(end - ticket['enqueued_at'], 3)}
+
+class InProcessMatchmakingQueue(MatchmakingQueue):
+    """Queue held in this process: one list of (rating, enqueued_at, ticket_id) per time control."""
+    def __init__(self):
+        self._buckets = {}  # time_limit -> sorted keys of waiting tickets
+        self._tickets = {}  # ticket_id -> ticket
+        self._waiting = {}  # player_id -> ticket_id of their waiting ticket
+        self._condition = threading.Condition()
+        self._waits = deque(maxlen=MATCHMAKING_WAIT_SAMPLES)  # seconds queued by recently matched tickets
+
+    @staticmethod
+    def _key(ticket):
+        return (ticket['rating'], ticket['enqueued_at'], ticket['ticket_id'])
+
+    def _take_opponent(self, bucket, rating, player_id):
+        """Remove and return the key nearest rating within the band, or None."""
+        index = bisect.bisect_left(bucket, (rating,))
+        candidates = [i for i in (index - 1, index)
+                      if 0 <= i < len(bucket) and self._tickets[bucket[i][2]]['player_id'] != player_id]
+        if not candidates:
+            return None
+        best = min(candidates, key=lambda i: abs(bucket[i][0] - rating))
+        if abs(bucket[best][0] - rating) > MATCHMAKING_RATING_BAND:
+            return None
+        return bucket.pop(best)
+
+    def _claim(self, ticket):
+        player_id, time_limit = ticket['player_id'], ticket['time_limit']
+        with self._condition:
+            existing = self._tickets.get(self._waiting.get(player_id))
+            if existing is not None:
+                if existing['time_limit'] == time_limit:
+                    existing['last_seen'] = ticket['last_seen']
+                    return dict(existing), None
+                self._remove_waiting(existing)
+            self._tickets[ticket['ticket_id']] = ticket
+            bucket = self._buckets.setdefault(time_limit, [])
+            opponent_key = self._take_opponent(bucket, ticket['rating'], player_id)
+            if opponent_key is None:
+                bisect.insort(bucket, self._key(ticket))
+                self._waiting[player_id] = ticket['ticket_id']
+                return dict(ticket), None
+            # Out of the bucket, the opponent's ticket cannot be claimed again
+            opponent = self._tickets[opponent_key[2]]
+            del self._waiting[opponent['player_id']]
+            return ticket, opponent
+
+    def _unclaim(self, ticket, opponent):
+        with self._condition:
+            del self._tickets[ticket['ticket_id']]
+            # Unless the opponent queued again meanwhile, their ticket goes back in the bucket
+            if self._waiting.setdefault(opponent['player_id'], opponent['ticket_id']) == opponent['ticket_id']:
+                bisect.insort(self._buckets[opponent['time_limit']], self._key(opponent))
+            else:
+                del self._tickets[opponent['ticket_id']]
+
+    def _record_match(self, ticket, opponent, lobby_id, now):
+        with self._condition:
+            for matched in (opponent, ticket):
+                matched['lobby_id'] = lobby_id
+                matched['matched_at'] = matched['last_seen'] = now
+                self._waits.append(now - matched['enqueued_at'])
+            self._condition.notify_all()
+
+    def ticket(self, ticket_id, wait=0):
+        with self._condition:
+            ticket = self._tickets.get(ticket_id)
+            if ticket is None:
+                return None
+            if wait:
+                self._condition.wait_for(lambda: ticket['matched_at'] or ticket_id not in self._tickets, wait)
+            ticket['last_seen'] = time.time()
+            return dict(ticket)
+
+    def cancel(self, ticket_id):
+        with self._condition:
+            ticket = self._tickets.get(ticket_id)
+            if ticket is None or ticket['lobby_id'] is not None:
+                return False
+            return self._remove_waiting(ticket)
+
+    def _remove_waiting(self, ticket):
+        """Take a waiting ticket out of the queue; False if it is being matched right now."""
+        bucket = self._buckets[ticket['time_limit']]
+        key = self._key(ticket)
+        index = bisect.bisect_left(bucket, key)
+        if index < len(bucket) and bucket[index] == key:
+            del bucket[index]
+            del self._tickets[ticket['ticket_id']]
+            del self._waiting[ticket['player_id']]
+            self._condition.notify_all()
+            return True
+        return False
+
+    def expire(self, now):
+        with self._condition:
+            stale = [ticket_id for ticket_id, ticket in self._tickets.items()
+                     if now - ticket['last_seen'] > MATCHMAKING_TICKET_TTL]
+        return sum(self.cancel(ticket_id) or self._forget_matched(ticket_id) for ticket_id in stale)
+
+    def _forget_matched(self, ticket_id):
+        with self._condition:
+            ticket = self._tickets.get(ticket_id)
+            if ticket is None or not ticket['matched_at']:
+                return False
+            del self._tickets[ticket_id]
+            return True
+
+    def _queued(self):
+        with self._condition:
+            return [(time_limit, len(bucket)) for time_limit, bucket in self._buckets.items()]
+
+    def _wait_samples(self):
+        with self._condition:
+            return list(self._waits)
+
+class SQLiteMatchmakingQueue(MatchmakingQueue):
+    """Queue shared by all workers in the lobby database (LOBBY_STORE=sqlite).
+
+    Waiting tickets are found through an index on (time_limit, rating), so pairing is one
+    index seek on either side of the new ticket's rating inside a write transaction.
+    """
+    COLUMNS = ('ticket_id', 'player_id', 'player_name', 'time_limit', 'rating', 'enqueued_at', 'last_seen',
+               'lobby_id', 'matched_at')
+
+    def __init__(self, store):
+        self.store = store
+
+    def _db(self):
+        db = self.store._db()
+        if getattr(self.store._local, 'matchmaking_pid', None) != os.getpid():
+            self.store._local.matchmaking_pid = os.getpid()
+            db.execute('CREATE TABLE IF NOT EXISTS matchmaking (ticket_id TEXT PRIMARY KEY, player_id TEXT, '
+                       'player_name TEXT, time_limit INTEGER, rating REAL, enqueued_at REAL, last_seen REAL, '
+                       'lobby_id TEXT, matched_at REAL)')
+            db.execute('CREATE INDEX IF NOT EXISTS matchmaking_waiting ON matchmaking (time_limit, rating) '
+                       'WHERE lobby_id IS NULL')
+            db.execute('CREATE INDEX IF NOT EXISTS matchmaking_player ON matchmaking (player_id) '
+                       'WHERE lobby_id IS NULL')
+            db.execute('CREATE TABLE IF NOT EXISTS matchmaking_waits (id INTEGER PRIMARY KEY, seconds REAL)')
+        return db
+
+    def _row(self, row):
+        return dict(zip(self.COLUMNS, row)) if row else None
+
+    def _get(self, ticket_id):
+        return self._row(self._db().execute(
+            f'SELECT {", ".join(self.COLUMNS)} FROM matchmaking WHERE ticket_id = ?', (ticket_id,)).fetchone())
+
+    def _claim(self, ticket):
+        player_id, time_limit, rating = ticket['player_id'], ticket['time_limit'], ticket['rating']
+        db = self._db()
+        columns = ', '.join(self.COLUMNS)
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            existing = self._row(db.execute(
+                f'SELECT {columns} FROM matchmaking WHERE player_id = ? AND lobby_id IS NULL', (player_id,)).fetchone())
+            if existing is not None and existing['time_limit'] == time_limit:
+                db.execute('UPDATE matchmaking SET last_seen = ? WHERE ticket_id = ?',
+                           (ticket['last_seen'], existing['ticket_id']))
+                ticket, opponent = dict(existing, last_seen=ticket['last_seen']), None
+            else:
+                if existing is not None:
+                    db.execute('DELETE FROM matchmaking WHERE ticket_id = ?', (existing['ticket_id'],))
+                neighbours = [self._row(db.execute(
+                    f'SELECT {columns} FROM matchmaking WHERE time_limit = ? AND lobby_id IS NULL AND rating {op} ? '
+                    f'AND player_id != ? ORDER BY rating {order} LIMIT 1', (time_limit, rating, player_id)).fetchone())
+                    for op, order in (('>=', 'ASC'), ('<', 'DESC'))]
+                neighbours = [n for n in neighbours if n and abs(n['rating'] - rating) <= MATCHMAKING_RATING_BAND]
+                opponent = min(neighbours, key=lambda n: abs(n['rating'] - rating)) if neighbours else None
+                # A claimed ticket has a lobby id but no matched_at until its lobby exists
+                claim = '' if opponent is None else 'pending'
+                db.execute(f'INSERT INTO matchmaking ({columns}) VALUES ({", ".join("?" * len(self.COLUMNS))})',
+                           tuple(dict(ticket, lobby_id=claim or None)[column] for column in self.COLUMNS))
+                if opponent is not None:
+                    db.execute('UPDATE matchmaking SET lobby_id = ? WHERE ticket_id = ?', (claim, opponent['ticket_id']))
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return ticket, opponent
+
+    def _unclaim(self, ticket, opponent):
+        db = self._db()
+        db.execute('UPDATE matchmaking SET lobby_id = NULL WHERE ticket_id = ?', (opponent['ticket_id'],))
+        db.execute('DELETE FROM matchmaking WHERE ticket_id = ?', (ticket['ticket_id'],))
+
+    def _record_match(self, ticket, opponent, lobby_id, now):
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        db.execute('UPDATE matchmaking SET lobby_id = ?, matched_at = ?, last_seen = ? WHERE ticket_id IN (?, ?)',
+                   (lobby_id, now, now, opponent['ticket_id'], ticket['ticket_id']))
+        db.executemany('INSERT INTO matchmaking_waits (seconds) VALUES (?)',
+                       [(now - opponent['enqueued_at'],), (now - ticket['enqueued_at'],)])
+        db.execute('DELETE FROM matchmaking_waits WHERE id <= (SELECT MAX(id) FROM matchmaking_waits) - ?',
+                   (MATCHMAKING_WAIT_SAMPLES,))
+        db.execute('COMMIT')
+
+    def ticket(self, ticket_id, wait=0):
+        deadline = time.monotonic() + wait
+        while True:
+            ticket = self._get(ticket_id)
+            # The match may be made by another worker, so poll the table
+            if ticket is None or ticket['matched_at'] or time.monotonic() >= deadline:
+                break
+            time.sleep(min(0.1, max(0, deadline - time.monotonic())))
+        if ticket is not None:
+            self._db().execute('UPDATE matchmaking SET last_seen = ? WHERE ticket_id = ?', (time.time(), ticket_id))
+        return ticket
+
+    def cancel(self, ticket_id):
+        return self._db().execute('DELETE FROM matchmaking WHERE ticket_id = ? AND lobby_id IS NULL',
+                                  (ticket_id,)).rowcount > 0
+
+    def expire(self, now):
+        # Waiting or matched tickets nobody asked about for a while; pending claims are left alone
+        return self._db().execute('DELETE FROM matchmaking WHERE last_seen < ? AND (lobby_id IS NULL OR matched_at IS NOT NULL)',
+                                  (now - MATCHMAKING_TICKET_TTL,)).rowcount
+
+    def _queued(self):
+        return self._db().execute(
+            'SELECT time_limit, COUNT(*) FROM matchmaking WHERE lobby_id IS NULL GROUP BY time_limit').fetchall()
+
+    def _wait_samples(self):
+        return [row[0] for row in self._db().execute('SELECT seconds FROM matchmaking_waits')]
+
+if LOBBY_STORE == 'sqlite':
+    matchmaker = SQLiteMatchmakingQueue(lobbies)
+else:
+    matchmaker = InProcessMatchmakingQueue()
+
+def recover_journaled_lobbies():
+    """Index journaled lobbies missing from the registry (e.g. after a crash) for lazy replay.
+
+    Each journal is replayed once here, off the request path, for its cold_metadata(); the
+    lobby itself is only kept in memory from its first access.
+    """
+    count = 0
+    for lobby_id in move_journal.lobby_ids():
+        if lobby_id not in lobbies and owns_lobby(lobby_id):
+            try:
+                lobby = move_journal.load(lobby_id)
+            except (OSError, ValueError) as e:
+                print(f"Could not recover lobby {lobby_id} from the move journal: {e}")
+                continue
+            lobbies.add_cold(lobby_id, JournaledLobby(lobby))
+            count += 1
+    if count:
+        print(f"Recovered {count} lobbies from the move journal in {move_journal.directory}")
+    return count
+
+# Lobby-affinity sharding
+# With SHARD_NAME set this process is one shard of a sharded deployment: SHARDS lists every
+# shard as name=host:port, and the router in sharding.py sends each lobby's requests and
+# Socket.IO connections to the shard owning it on a consistent hash ring. When the router
+# changes the membership, shards hand lobbies they no longer own to the new owners.
+SHARD_NAME = os.environ.get('SHARD_NAME', '')
+SHARD_SECRET = os.environ.get('SHARD_SECRET', '')
+SHARDS_FILE = os.environ.get('SHARDS_FILE', '')
+
+def _configured_shards():
+    """Shard membership from SHARDS_FILE (shared with the router) or the SHARDS list."""
+    if SHARDS_FILE and os.path.exists(SHARDS_FILE):
+        with open(SHARDS_FILE) as f:
+            return parse_shards(f.read())
+    return parse_shards(os.environ.get('SHARDS', ''))
+
+shard_ring = HashRing(_configured_shards())
+
+def owns_lobby(lobby_id):
+    """True when this process should hold the lobby (always, unless sharded)."""
+    return not SHARD_NAME or shard_ring.owner(lobby_id) == SHARD_NAME
+
+def new_lobby_id():
+    """Short random lobby id, owned by this shard when sharded."""
+    while True:
+        lobby_id = str(uuid.uuid4())[:8]
+        if owns_lobby(lobby_id):
+            return lobby_id
+
+def rebalance_lobbies(shards):
+    """Adopt a new shard membership and send lobbies owned elsewhere to their new owners."""
+    global shard_ring
+    shard_ring = HashRing(shards)
+    moving = {}
+    for lobby_id in list(lobbies):
+        if not owns_lobby(lobby_id):
+            moving.setdefault(shard_ring.owner(lobby_id), []).append(lobby_id)
+    moved = 0
+    for owner, lobby_ids in moving.items():
+        held = [lobbies[lobby_id] for lobby_id in lobby_ids]
+        # Hold each lobby's writer slot so no command lands between export and release
+        for lobby in held:
+            lobby._writer.acquire()
+        try:
+            move_journal.sync(5)
+            try:
+                post_json(shard_ring.shards[owner], '/internal/lobbies',
+                          {'records': [lobby.to_record() for lobby in held]}, SHARD_SECRET)
+            except OSError as e:
+                print(f"Could not hand {len(held)} lobbies to shard {owner}: {e}")
+                continue
+            for lobby in held:
+                lobbies.release(lobby.lobby_id)
+                lobby.evicted = True
+                # Clients reconnect through the router and land on the new owner
+                socketio.emit('lobby_moved', {'lobby_id': lobby.lobby_id}, room=lobby.lobby_id)
+            moved += len(held)
+        finally:
+            for lobby in held:
+                lobby._writer.release()
+            # Commands queued while we held the writer slots are applied here if the handoff
+            # failed, and fail (the lobby is gone) if it succeeded, instead of waiting forever
+            for lobby in held:
+                lobby._drain_commands()
+    if moved:
+        print(f"Shard {SHARD_NAME} handed {moved} lobbies to {sorted(moving)}")
+    return moved
+
+def _shard_request_allowed():
+    return bool(SHARD_NAME) and bool(SHARD_SECRET) and request.headers.get('X-Shard-Secret') == SHARD_SECRET
+
+# Game archive
+# Finished games are appended to <ARCHIVE_DIR>/games-<segment>.dat, a header followed by
+# [u32 length][game] entries. A game is [str game id][f64 finished at][winner color]
+# [end reason][player count] then per player [str id][str name][color], followed by the
+# game's journal records (its compact move list, replayable with replay_journal()).
+# A SQLite sidecar (index.db) maps game id, player name and finish time to
+# (segment, offset, length), so lookups never scan the archive. Segments are sealed at
+# ARCHIVE_SEGMENT_MB and read through mmap; the active segment is read with pread.
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', '/tmp/sava-archive')
+ARCHIVE_SEGMENT_BYTES = int(os.environ.get('ARCHIVE_SEGMENT_MB', 64)) * 1024 * 1024
+ARCHIVE_MAGIC = b'SAVAGAME1'
+ARCHIVE_END_REASONS = ['checkmate', 'stalemate', 'timeout']
+
+def encode_archived_game(game_id, finished_at, players, winner, game_end_reason, history):
+    """Encode one finished game for the archive."""
+    out = bytearray(_journal_str(game_id))
+    out += struct.pack('<dBBB', finished_at, WIRE_COLORS.index(winner),
+                       ARCHIVE_END_REASONS.index(game_end_reason), len(players))
+    for player in players:
+        out += _journal_str(player['id']) + _journal_str(player['name']) + bytes([WIRE_COLORS.index(player['color'])])
+    out += history
+    return bytes(out)
+
+def decode_archived_game(data):
+    """Decode an archived game; 'history' is a zero-copy view of its journal records."""
+    data = memoryview(data)
+    game_id, offset = _journal_read_str(data)
+    finished_at, winner, reason, player_count = struct.unpack_from('<dBBB', data, offset)
+    offset += 11
+    players = []
+    for _ in range(player_count):
+        player_id, offset = _journal_read_str(data, offset)
+        name, offset = _journal_read_str(data, offset)
+        players.append({'id': player_id, 'name': name, 'color': WIRE_COLORS[data[offset]]})
+        offset += 1
+    return {
+        'game_id': game_id,
+        'finished_at': finished_at,
+        'winner': WIRE_COLORS[winner],
+        'game_end_reason': ARCHIVE_END_REASONS[reason],
+        'players': players,
+        'history': data[offset:]
+    }
+
+class GameArchive:
+    """Append-only segment files of finished games with a SQLite sidecar index."""
+    def __init__(self, directory):
+        self.directory = directory
+        self.enabled = bool(directory)
+        self._queue = deque()
+        self._queued = 0
+        self._written = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._local = threading.local()
+        self._maps = {}  # sealed segment -> mmap
+        self._maps_lock = threading.Lock()
+
+    def segment_path(self, segment):
+        return os.path.join(self.directory, f'games-{segment}.dat')
+
+    def _db(self):
+        """Per-thread connection to the sidecar index."""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            os.makedirs(self.directory, exist_ok=True)
+            db = self._local.db = sqlite3.connect(os.path.join(self.directory, 'index.db'))
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript('''
+                CREATE TABLE IF NOT EXISTS games (
+                    rowid INTEGER PRIMARY KEY, game_id TEXT, segment INTEGER, offset INTEGER,
+                    length INTEGER, finished_at REAL, winner TEXT, game_end_reason TEXT,
+                    red_player TEXT, blue_player TEXT);
+                CREATE INDEX IF NOT EXISTS games_by_id ON games (game_id);
+                CREATE INDEX IF NOT EXISTS games_by_finish ON games (finished_at);
+                CREATE TABLE IF NOT EXISTS game_players (name TEXT, finished_at REAL, game INTEGER);
+                CREATE INDEX IF NOT EXISTS players_by_name ON game_players (name, finished_at);
+            ''')
+        return db
+
+    def add(self, game_id, finished_at, players, winner, game_end_reason, history):
+        """Queue a finished game; it is written and indexed by the archive thread."""
+        if not self.enabled:
+            return
+        entry = encode_archived_game(game_id, finished_at, players, winner, game_end_reason, history)
+        names = {player['color']: player['name'] for player in players}
+        with self._condition:
+            self._queue.append((entry, game_id, finished_at, winner, game_end_reason, names))
+            self._queued += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='game-archive', daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def flush(self, timeout=None):
+        """Wait until every queued game is written and indexed."""
+        with self._condition:
+            target = self._queued
+            return self._condition.wait_for(lambda: self._written >= target, timeout)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue)
+                batch, self._queue = self._queue, deque()
+            try:
+                run_rules(self._write_batch, batch)
+            except (OSError, sqlite3.Error) as e:
+                print(f"Game archive write failed: {e}")
+            with self._condition:
+                self._written += len(batch)
+                self._condition.notify_all()
+
+    def _write_batch(self, batch):
+        # Workers sharing the archive (LOBBY_STORE=sqlite) take turns appending
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, 'append.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._append(batch)
+
+    def _append(self, batch):
+        db = self._db()
+        segment = db.execute('SELECT MAX(segment) FROM games').fetchone()[0] or 0
+        rows = []
+        f = open(self.segment_path(segment), 'ab')
+        try:
+            for entry, game_id, finished_at, winner, game_end_reason, names in batch:
+                if f.tell() == 0:
+                    f.write(ARCHIVE_MAGIC)
+                elif f.tell() + len(entry) > ARCHIVE_SEGMENT_BYTES:
+                    # Seal the segment; from now on it is only read through mmap
+                    f.close()
+                    segment += 1
+                    f = open(self.segment_path(segment), 'ab')
+                    f.write(ARCHIVE_MAGIC)
+                f.write(struct.pack('<I', len(entry)))
+                rows.append((game_id, segment, f.tell(), len(entry), finished_at, winner, game_end_reason,
+                             names.get('red'), names.get('blue')))
+                f.write(entry)
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            f.close()
+        # Indexed after the data is durable, so the index never points past the archive
+        with db:
+            for row in rows:
+                rowid = db.execute('INSERT INTO games (game_id, segment, offset, length, finished_at, winner, '
+                                   'game_end_reason, red_player, blue_player) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                   row).lastrowid
+                db.executemany('INSERT INTO game_players (name, finished_at, game) VALUES (?, ?, ?)',
+                               [(name, row[4], rowid) for name in row[7:] if name])
+
+    def _read(self, segment, offset, length):
+        """Entry bytes: a zero-copy view for sealed segments, a pread for the active one."""
+        with self._maps_lock:
+            mapped = self._maps.get(segment)
+        if mapped is None and os.path.exists(self.segment_path(segment + 1)):
+            with open(self.segment_path(segment), 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            with self._maps_lock:
+                mapped = self._maps.setdefault(segment, mapped)
+        if mapped is not None:
+            return memoryview(mapped)[offset:offset + length]
+        with open(self.segment_path(segment), 'rb') as f:
+            return os.pread(f.fileno(), length, offset)
+
+    def get(self, game_id):
+        """The most recently finished game with this id (a lobby id), or None."""
+        if not self.enabled:
+            return None
+        row = self._db().execute('SELECT segment, offset, length FROM games WHERE game_id = ? '
+                                 'ORDER BY finished_at DESC LIMIT 1', (game_id,)).fetchone()
+        if row is None:
+            return None
+        return decode_archived_game(self._read(*row))
+
+    def iter_games(self, start=None, end=None, batch_size=500):
+        """Yield decoded games finished in [start, end), reading the index in small batches."""
+        if not self.enabled:
+            return
+        last_rowid = 0
+        while True:
+            rows = self._db().execute(
+                'SELECT rowid, segment, offset, length FROM games WHERE rowid > ? AND finished_at >= ? '
+                'AND finished_at < ? ORDER BY rowid LIMIT ?',
+                (last_rowid, start if start is not None else float('-inf'),
+                 end if end is not None else float('inf'), batch_size)).fetchall()
+            if not rows:
+                return
+            for rowid, segment, offset, length in rows:
+                yield decode_archived_game(self._read(segment, offset, length))
+            last_rowid = rows[-1][0]
+
+    def _summaries(self, query, params):
+        return [{
+            'game_id': game_id,
+            'finished_at': finished_at,
+            'winner': winner,
+            'game_end_reason': game_end_reason,
+            'players': {'red': red_player, 'blue': blue_player}
+        } for game_id, finished_at, winner, game_end_reason, red_player, blue_player
+            in self._db().execute(query, params)]
+
+    def by_player(self, name, start=None, end=None, limit=50):
+        """Index-only summaries of a player's games finished in [start, end), newest first."""
+        if not self.enabled:
+            return []
+        return self._summaries(
+            'SELECT g.game_id, g.finished_at, g.winner, g.game_end_reason, g.red_player, g.blue_player '
+            'FROM game_players p JOIN games g ON g.rowid = p.game '
+            'WHERE p.name = ? AND p.finished_at >= ? AND p.finished_at < ? ORDER BY p.finished_at DESC LIMIT ?',
+            (name, start if start is not None else float('-inf'), end if end is not None else float('inf'), limit))
+
+    def finished_between(self, start=None, end=None, limit=50):
+        """Index-only summaries of games finished in [start, end), oldest first."""
+        if not self.enabled:
+            return []
+        return self._summaries(
+            'SELECT game_id, finished_at, winner, game_end_reason, red_player, blue_player FROM games '
+            'WHERE finished_at >= ? AND finished_at < ? ORDER BY finished_at LIMIT ?',
+            (start if start is not None else float('-inf'), end if end is not None else float('inf'), limit))
+
+game_archive = GameArchive(ARCHIVE_DIR)
+atexit.register(game_archive.flush, 5)
+
+# Sessions
+# Every Socket.IO connection that belongs to a lobby member is bound to that member's seat,
+# so handlers act for the bound player rather than for whatever player_id the event carries,
+# and presence is known without asking the client. A player whose last connection drops is
+# reported offline at once. If they have not reconnected after SESSION_RECONNECT_GRACE seconds,
+# the lobby reaper frees their seat in a game that has not started (and drops spectators).
+SESSION_RECONNECT_GRACE = float(os.environ.get('SESSION_RECONNECT_GRACE', 30))
+
+class SessionRegistry:
+    """O(1) maps of sid -> (lobby_id, player_id) and player_id -> (lobby_id, sids)."""
+    def __init__(self):
+        self._sessions = {}  # sid -> (lobby_id, player_id)
+        self._players = {}  # player_id -> (lobby_id, set of connected sids)
+        self._online = {}  # lobby_id -> ids of players with at least one connection
+        self._offline_since = {}  # player_id -> (lobby_id, time their last connection dropped)
+        self._lock = threading.Lock()
+
+    def bind(self, sid, lobby_id, player_id):
+        """Attach a connection to a member's seat; True if the member just came online."""
+        with self._lock:
+            if self._sessions.get(sid) == (lobby_id, player_id):
+                return False
+            self._unbind(sid)
+            self._sessions[sid] = (lobby_id, player_id)
+            entry = self._players.get(player_id)
+            if entry is None or entry[0] != lobby_id:
+                entry = self._players[player_id] = (lobby_id, set())
+            entry[1].add(sid)
+            self._offline_since.pop(player_id, None)
+            online = self._online.setdefault(lobby_id, set())
+            if player_id in online:
+                return False
+            online.add(player_id)
+            return True
+
+    def unbind(self, sid):
+        """Detach a connection; returns (lobby_id, player_id) if it was the member's last one."""
+        with self._lock:
+            return self._unbind(sid)
+
+    def _unbind(self, sid):
+        session = self._sessions.pop(sid, None)
+        if session is None:
+            return None
+        lobby_id, player_id = session
+        entry = self._players.get(player_id)
+        if entry is None or entry[0] != lobby_id:
+            return None
+        entry[1].discard(sid)
+        if entry[1]:
+            return None
+        online = self._online.get(lobby_id)
+        if online is not None:
+            online.discard(player_id)
+            if not online:
+                del self._online[lobby_id]
+        self._offline_since[player_id] = (lobby_id, time.time())
+        return session
+
+    def session(self, sid):
+        """(lobby_id, player_id) a connection is bound to, or None."""
+        return self._sessions.get(sid)
+
+    def lobby_of(self, player_id):
+        """Lobby a player was last bound in, or None."""
+        entry = self._players.get(player_id)
+        return entry[0] if entry is not None else None
+
+    def online(self, lobby_id):
+        """Ids of the lobby's members with a live connection."""
+        return sorted(self._online.get(lobby_id, ()))
+
+    def expire(self, now):
+        """Forget members offline for longer than the grace period; returns their (lobby_id, player_id)."""
+        with self._lock:
+            expired = [(lobby_id, player_id) for player_id, (lobby_id, since) in self._offline_since.items()
+                       if now - since > SESSION_RECONNECT_GRACE]
+            for lobby_id, player_id in expired:
+                del self._offline_since[player_id]
+                entry = self._players.get(player_id)
+                if entry is not None and not entry[1]:
+                    del self._players[player_id]
+        return expired
+
+sessions = SessionRegistry()
+
+def notify_presence(lobby_id, player_id, online):
+    notify_lobby_update(lobby_id, 'player_presence', {
+        'player_id': player_id,
+        'online': online,
+        'online_players': sessions.online(lobby_id)
+    })
+
+def bind_session(lobby_id, player_id):
+    """Bind this connection to the member's seat in the lobby; False if they are not a member."""
+    if not player_id:
+        return False
+    lobby_id = lobby_id or sessions.lobby_of(player_id)
+    if not lobby_id or lobby_id not in lobbies or player_id not in lobbies[lobby_id].snapshot.members:
+        return False
+    if sessions.bind(request.sid, lobby_id, player_id):
+        notify_presence(lobby_id, player_id, True)
+    return True
+
+def session_player_id(lobby_id, data):
+    """Player a Socket.IO event acts for: the connection's bound seat, else the payload's player_id."""
+    session = sessions.session(request.sid)
+    if session is not None and session[0] == lobby_id:
+        return session[1]
+    return data.get('player_id')
+
+def release_abandoned_member(lobby_id, player_id):
+    """Remove a member who did not reconnect, unless they hold a seat in a started game."""
+    try:
+        lobby = lobbies[lobby_id]
+    except KeyError:
+        return False
+    if player_id not in lobby.snapshot.members:
+        return False
+    if lobby.snapshot.find_player(player_id) and lobby.lifecycle_state() != 'waiting':
+        return False
+    if lobby.submit(lobby.remove_player, player_id):
+        lobbies.pop(lobby_id, None)
+    else:
+        notify_lobby_update(lobby_id, 'player_left', {'player_id': player_id})
+    return True
+
+# WebSocket event handlers
+@socketio.on('connect')
+def handle_connect():
+    # A client that knows its seat passes it in the connection query (?lobby_id=&player_id=),
+    # so a reconnect is bound to the seat before it sends anything
+    bind_session(request.args.get('lobby_id'), request.args.get('player_id'))
+    print('Client connected')
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    session = sessions.unbind(request.sid)
+    if session is not None:
+        notify_presence(*session, False)
+    print('Client disconnected')
+
+@socketio.on('join_lobby')
+def handle_join_lobby(data):
+    lobby_id = data.get('lobby_id')
+    wire_format = data.get('wire_format', WIRE_FORMAT_JSON)
+    last_seq = data.get('last_seq')
+
+    if lobby_id in lobbies:
+        bind_session(lobby_id, data.get('player_id'))
+        lobby = lobbies[lobby_id]
+        # Binary clients get their own room so JSON and binary frames are encoded once per broadcast
+        join_room(binary_room(lobby_id) if wire_format == WIRE_FORMAT_BINARY else lobby_id)
+
+        # A reconnecting client sends the last event it saw and only gets what it missed (events
+        # arriving meanwhile may come twice; clients drop seqs they have seen). Workers sharing
+        # a store number events separately, so they always send a snapshot.
+        missed = None
+        if isinstance(last_seq, int) and not lobbies.shared:
+            missed = lobby.events_since(last_seq)
+        if missed is not None and (not missed or wire_format != WIRE_FORMAT_BINARY):
+            events = [json.loads(payload) for _, payload in missed]
+            emit('lobby_resume', {
+                'seq': events[-1]['seq'] if events else last_seq,
+                'events': [{'seq': e['seq'], 'event_type': e['event_type'], 'data': e['data']} for e in events],
+                # Intermediate states are superseded, so only the latest is sent
+                'lobby_info': events[-1]['lobby_info'] if events else None,
+                'online_players': sessions.online(lobby_id)
+            })
+        elif wire_format == WIRE_FORMAT_BINARY:
+            with lobby.event_condition:
+                seq = lobby.event_seq
+                lobby_info = lobby.snapshot.get_lobby_info()
+            emit('lobby_update_bin', encode_binary_notification({
+                'seq': seq,
+                'event_type': 'joined_lobby',
+                'lobby_info': lobby_info,
+                'data': None
+            }))
+        else:
+            # Send current lobby state to the joining player
+            # Convert datetime objects to strings for JSON serialization
+            with lobby.event_condition:
+                seq = lobby.event_seq
+                lobby_info = json.loads(lobby.snapshot.lobby_info_json())
+            emit('lobby_update', {
+                'seq': seq,
+                'event_type': 'joined_lobby',
+                'lobby_info': lobby_info,
+                'online_players': sessions.online(lobby_id)
+            })
+        
+        # Check if we should auto-start the game after this player joins
+        lobby.submit(lobby.auto_start_if_ready)
+
+@socketio.on('watch_lobby_directory')
+def handle_watch_lobby_directory(data=None):
+    # Lobby list pages get batched lobby_directory_update pushes instead of polling
+    join_room(LOBBY_DIRECTORY_ROOM)
+
+@socketio.on('leave_lobby')
+def handle_leave_lobby(data):
+    lobby_id = data.get('lobby_id')
+    player_id = session_player_id(lobby_id, data)
+    
+    if lobby_id in lobbies:
+        leave_room(lobby_id)
+        leave_room(binary_room(lobby_id))
+        sessions.unbind(request.sid)
+        
+        # Remove player from lobby
+        lobby = lobbies[lobby_id]
+        should_cleanup = lobby.submit(lobby.remove_player, player_id)
+        
+        if should_cleanup:
+            lobbies.pop(lobby_id, None)
+        else:
+            # Notify remaining players
+            notify_lobby_update(lobby_id, 'player_left', {'player_id': player_id})
+
+@socketio.on('sacrifice_piece')
+def handle_sacrifice_piece(data):
+    lobby_id = data.get('lobby_id')
+    node_id = data.get('node_id')
+    player_id = session_player_id(lobby_id, data)
+    
+    if lobby_id in lobbies:
+        lobby = lobbies[lobby_id]
+        
+        # Sacrifice the piece
+        success, result = lobby.submit(lobby.sacrifice_piece, node_id, player_id)
         
         if success:
+            result = lobby.snapshot.game_state
+            # Notify all players about the sacrifice
+            notify_lobby_update(lobby_id, 'piece_sacrificed', result)
+        else:
+            # Send error back to the player
+            emit('sacrifice_error', {'error': result})
+    else:
+        emit('sacrifice_error', {'error': 'Lobby not found'})
+
+@socketio.on('control_enemy_piece')
+def handle_control_enemy_piece(data):
+    lobby_id = data.get('lobby_id')
+    node_id = data.get('node_id')
+    player_id = session_player_id(lobby_id, data)
+    
+    if lobby_id in lobbies:
+        lobby = lobbies[lobby_id]
+        
+        # Control the enemy piece
+        success, result = lobby.submit(lobby.control_enemy_piece, node_id, player_id)
+        
+        if success:
+            result = lobby.snapshot.game_state
             # Notify all players about the control
             notify_lobby_update(lobby_id, 'enemy_piece_controlled', result)
         else:
@@ -1613,15 +4623,16 @@ def handle_move_controlled_piece(data):
     lobby_id = data.get('lobby_id')
     from_node = data.get('from_node')
     to_node = data.get('to_node')
-    player_id = data.get('player_id')
+    player_id = session_player_id(lobby_id, data)
     
     if lobby_id in lobbies:
         lobby = lobbies[lobby_id]
         
         # Execute the controlled move
-        success, result = lobby.execute_controlled_move(from_node, to_node, player_id)
+        success, result = lobby.submit(lobby.execute_controlled_move, from_node, to_node, player_id)
         
         if success:
+            result = lobby.snapshot.game_state
             # Notify all players about the controlled move
             notify_lobby_update(lobby_id, 'controlled_piece_moved', result)
         else:
@@ -1634,13 +4645,13 @@ def handle_move_controlled_piece(data):
 def handle_send_chat_message(data):
     lobby_id = data.get('lobby_id')
     message = data.get('message')
-    player_id = data.get('player_id')
+    player_id = session_player_id(lobby_id, data)
     
     if lobby_id in lobbies:
         lobby = lobbies[lobby_id]
         
         # Add the chat message
-        success, result = lobby.add_chat_message(player_id, message)
+        success, result = lobby.submit(lobby.add_chat_message, player_id, message)
         
         if success:
             # Notify all players about the new message
@@ -1655,15 +4666,16 @@ def handle_send_chat_message(data):
 def handle_promote_orc(data):
     lobby_id = data.get('lobby_id')
     selected_piece = data.get('selected_piece')
-    player_id = data.get('player_id')
+    player_id = session_player_id(lobby_id, data)
     
     if lobby_id in lobbies:
         lobby = lobbies[lobby_id]
         
         # Promote the orc
-        success, result = lobby.promote_orc(player_id, selected_piece)
+        success, result = lobby.submit(lobby.promote_orc, player_id, selected_piece)
         
         if success:
+            result = lobby.snapshot.game_state
             # Notify all players about the promotion
             notify_lobby_update(lobby_id, 'orc_promoted', result)
         else:
@@ -1672,22 +4684,40 @@ def handle_promote_orc(data):
     else:
         emit('promotion_error', {'error': 'Lobby not found'})
 
+@socketio.on('batch_commands')
+def handle_batch_commands(data):
+    lobby_id = data.get('lobby_id')
+    actions = data.get('actions')
+    player_id = session_player_id(lobby_id, data)
+    
+    if lobby_id in lobbies:
+        lobby = lobbies[lobby_id]
+        
+        # Apply every action, or none of them (the batch sends its own commands_applied update)
+        success, result = lobby.submit(lobby.execute_batch, actions, player_id)
+        
+        if not success:
+            # Send error back to the player
+            emit('batch_error', {'error': result})
+    else:
+        emit('batch_error', {'error': 'Lobby not found'})
+
 @socketio.on('player_timeout')
 def handle_player_timeout(data):
     lobby_id = data.get('lobby_id')
-    player_id = data.get('player_id')
+    player_id = session_player_id(lobby_id, data)
     
     if lobby_id in lobbies:
         lobby = lobbies[lobby_id]
         
         # Find the player
-        player = next((p for p in lobby.players if p['id'] == player_id), None)
+        player = lobby.snapshot.find_player(player_id)
         if not player:
             emit('timeout_error', {'error': 'Player not found'})
             return
         
         # Handle the timeout
-        success, result = lobby.handle_player_timeout(player['color'])
+        success, result = lobby.submit(lobby.handle_player_timeout, player['color'])
         
         if success:
             # Timeout notification already sent in handle_player_timeout
@@ -1698,21 +4728,110 @@ def handle_player_timeout(data):
     else:
         emit('timeout_error', {'error': 'Lobby not found'})
 
+# Static assets
+# tools/build_assets.py writes minified, content-hashed copies of the page scripts and styles
+# (with .gz/.br variants) to static/dist and lists them in its manifest. Their names change
+# with their content, so browsers may cache them forever.
+ASSET_DIR = os.path.join(app.static_folder, 'dist')
+ASSET_CACHE_SECONDS = 365 * 24 * 3600
+# Precompressed variants, best first
+ASSET_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+def load_asset_manifest():
+    """Built file for each asset whose source is unchanged since the last build."""
+    try:
+        with open(os.path.join(ASSET_DIR, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    built = {}
+    for path, entry in manifest.items():
+        try:
+            with open(os.path.join(app.static_folder, path), 'rb') as f:
+                source_sha256 = hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            continue
+        if source_sha256 == entry['source_sha256']:
+            built[path] = entry['file']
+        else:
+            # Edited since the build (e.g. in development): serve the source file instead
+            print(f"Asset {path} changed since the last build; serving it unbuilt")
+    return built
+
+asset_manifest = load_asset_manifest()
+
+@app.template_global()
+def asset_url(path):
+    """URL of a static asset: its built, fingerprinted copy if there is one."""
+    built = asset_manifest.get(path)
+    if built is None:
+        return url_for('static', filename=path)
+    return f'/assets/{built}'
+
+@app.route('/assets/<path:filename>')
+def serve_asset(filename):
+    """Serve a built asset, precompressed when the client accepts it, with immutable caching."""
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = suffix = None
+    for name, extension in ASSET_ENCODINGS:
+        if request.accept_encodings[name] and os.path.isfile(os.path.join(ASSET_DIR, filename + extension)):
+            encoding, suffix = name, extension
+            break
+    response = send_from_directory(ASSET_DIR, filename + (suffix or ''), mimetype=mimetype,
+                                   max_age=ASSET_CACHE_SECONDS)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+        # The name of the compressed file on disk is not the resource's name
+        response.headers.pop('Content-Disposition', None)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_CACHE_SECONDS}, immutable'
+    return response
+
+# Rendered pages
+# The landing, rules, lobby list and time select pages are the same for every request, and the
+# lobby page only differs by its lobby id. They are rendered once at startup (the lobby page as
+# a shell split at the lobby id) and revalidated by ETag. With FLASK_ENV=development every
+# request renders the template again, so edits show up.
+PAGE_CACHE_ENABLED = os.environ.get('FLASK_ENV') != 'development'
+CACHED_PAGES = ('landing.html', 'rules.html', 'lobby_list.html', 'timeselect.html', 'lobby.html')
+LOBBY_ID_PLACEHOLDER = 'sava-lobby-id-placeholder'
+
+def render_page(template):
+    """(parts of the page around its lobby id, ETag) for a template."""
+    body = render_template(template, lobby_id=LOBBY_ID_PLACEHOLDER)
+    return body.split(LOBBY_ID_PLACEHOLDER), hashlib.sha256(body.encode('utf-8')).hexdigest()[:16]
+
+with app.test_request_context():
+    rendered_pages = {template: render_page(template) for template in CACHED_PAGES}
+
+def page_response(template, lobby_id=''):
+    """A rendered page, or a 304 when the client's copy is current."""
+    parts, etag = rendered_pages[template] if PAGE_CACHE_ENABLED else render_page(template)
+    if lobby_id:
+        etag = f'{etag}-{lobby_id}'
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(str(escape(lobby_id)).join(parts), mimetype='text/html')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/')
 def landing():
-    return render_template('landing.html')
+    return page_response('landing.html')
 
 @app.route('/rules')
 def rules():
-    return render_template('rules.html')
+    return page_response('rules.html')
 
 @app.route('/lobbies')
 def lobby_list():
-    return render_template('lobby_list.html')
+    return page_response('lobby_list.html')
 
 @app.route('/timeselect')
 def timeselect():
-    return render_template('timeselect.html')
+    return page_response('timeselect.html')
 
 @app.route('/game')
 def game():
@@ -1720,14 +4839,16 @@ def game():
 
 @app.route('/create-lobby')
 def create_lobby():
-    lobby_id = str(uuid.uuid4())[:8]  # Short lobby ID
+    lobby_id = new_lobby_id()
     time_limit = request.args.get('time_limit', TURN_TIME_LIMIT)
     try:
         time_limit = int(time_limit)
     except (ValueError, TypeError):
         time_limit = TURN_TIME_LIMIT
     
-    lobbies[lobby_id] = Lobby(lobby_id, time_limit)
+    lobby = Lobby(lobby_id, time_limit)
+    lobby.start_journal()
+    lobbies[lobby_id] = lobby
     return redirect(url_for('join_lobby', lobby_id=lobby_id))
 
 @app.route('/lobby/<lobby_id>')
@@ -1735,8 +4856,7 @@ def join_lobby(lobby_id):
     if lobby_id not in lobbies:
         return render_template('error.html', message="Lobby not found")
     
-    lobby = lobbies[lobby_id]
-    return render_template('lobby.html', lobby_id=lobby_id)
+    return page_response('lobby.html', lobby_id)
 
 @app.route('/api/lobby/<lobby_id>/join', methods=['POST'])
 def join_lobby_api(lobby_id):
@@ -1748,14 +4868,14 @@ def join_lobby_api(lobby_id):
     player_name = data.get('player_name', f'Player {player_id[:4]}')
     
     lobby = lobbies[lobby_id]
-    role = lobby.add_player(player_id, player_name)
+    role = lobby.submit(lobby.add_player, player_id, player_name)
 
     # Notify all players about the new player
     notify_lobby_update(lobby_id, 'player_joined', {'player_id': player_id, 'role': role})
     
     return jsonify({
         'role': role,
-        'lobby_info': lobby.get_lobby_info()
+        'lobby_info': lobby.snapshot.get_lobby_info()
     })
 
 @app.route('/api/lobby/<lobby_id>/leave', methods=['POST'])
@@ -1767,23 +4887,167 @@ def leave_lobby_api(lobby_id):
     player_id = data.get('player_id')
     
     lobby = lobbies[lobby_id]
-    should_cleanup = lobby.remove_player(player_id)
+    should_cleanup = lobby.submit(lobby.remove_player, player_id)
     
     if should_cleanup:
-        del lobbies[lobby_id]
+        lobbies.pop(lobby_id, None)
     else:
         # Notify remaining players
         notify_lobby_update(lobby_id, 'player_left', {'player_id': player_id})
     
     return jsonify({'success': True})
 
+def lobby_state_etag(snapshot):
+    """ETag of a lobby's /state response; it changes with every committed command."""
+    return f'{snapshot.lobby_id}-{snapshot.epoch}-{snapshot.version}'
+
+@app.route('/api/matchmaking', methods=['GET'])
+def get_matchmaking_stats():
+    """Queued tickets per time control and recent queue wait percentiles."""
+    return jsonify(matchmaker.stats())
+
+@app.route('/api/matchmaking/queue', methods=['POST'])
+def enqueue_matchmaking():
+    """Queue for an opponent with the same time control and a rating within the band."""
+    data = request.get_json(silent=True) or {}
+    try:
+        time_limit = int(data.get('time_limit', TURN_TIME_LIMIT))
+        rating = float(data.get('rating', MATCHMAKING_DEFAULT_RATING))
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid time_limit or rating'}), 400
+    player_id = data.get('player_id') or f'player_{uuid.uuid4().hex[:9]}'
+    player_name = data.get('player_name', f'Player {player_id[-4:]}')
+    
+    ticket = matchmaker.enqueue(player_id, player_name, time_limit, rating)
+    return jsonify(matchmaker.view(ticket))
+
+@app.route('/api/matchmaking/<ticket_id>', methods=['GET'])
+def get_matchmaking_ticket(ticket_id):
+    """A queue ticket; ?wait=<seconds> holds the request until it is matched."""
+    try:
+        wait = min(max(float(request.args.get('wait', 0)), 0), MATCHMAKING_MAX_WAIT)
+    except ValueError:
+        return jsonify({'error': 'Invalid wait'}), 400
+    
+    ticket = matchmaker.ticket(ticket_id, wait)
+    if ticket is None:
+        return jsonify({'error': 'Ticket not found'}), 404
+    return jsonify(matchmaker.view(ticket))
+
+@app.route('/api/matchmaking/<ticket_id>', methods=['DELETE'])
+def cancel_matchmaking_ticket(ticket_id):
+    if not matchmaker.cancel(ticket_id):
+        return jsonify({'error': 'Ticket not found or already matched'}), 404
+    return jsonify({'success': True})
+
 @app.route('/api/lobby/<lobby_id>/state')
 def get_lobby_state(lobby_id):
+    """Lobby info; 304 when If-None-Match is current, optionally after waiting ?wait= seconds for a change."""
     if lobby_id not in lobbies:
         return jsonify({'error': 'Lobby not found'}), 404
+    try:
+        wait = min(max(float(request.args.get('wait', 0)), 0), LOBBY_STATE_MAX_WAIT)
+    except ValueError:
+        return jsonify({'error': 'Invalid wait'}), 400
     
     lobby = lobbies[lobby_id]
-    return jsonify(lobby.get_lobby_info())
+    snapshot = lobby.snapshot
+    if wait and request.if_none_match.contains(lobby_state_etag(snapshot)):
+        # The client is up to date: park until the next commit
+        known = lobby_state_etag(snapshot)
+        deadline = time.monotonic() + wait
+        while lobby_state_etag(snapshot) == known and time.monotonic() < deadline:
+            lobby.wait_for_version(snapshot.version, min(deadline - time.monotonic(), LOBBY_STATE_WAIT_SLICE))
+            # Other workers' commits (shared store) and a spilled lobby's paged-in copy only
+            # show up through the store, so look the lobby up again after every slice
+            try:
+                lobby = lobbies[lobby_id]
+            except KeyError:
+                return jsonify({'error': 'Lobby not found'}), 404
+            snapshot = lobby.snapshot
+    
+    etag = lobby_state_etag(snapshot)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(snapshot.lobby_info_json(), mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def format_sse(payload, event_id=None, event='lobby_update'):
+    """Format a single server-sent event."""
+    message = f'event: {event}\n'
+    if event_id is not None:
+        message += f'id: {event_id}\n'
+    return message + f'data: {payload}\n\n'
+
+@app.route('/api/lobby/<lobby_id>/stream')
+def lobby_event_stream(lobby_id):
+    """Read-only server-sent events feed of lobby updates for spectators."""
+    if lobby_id not in lobbies:
+        return jsonify({'error': 'Lobby not found'}), 404
+
+    lobby = lobbies[lobby_id]
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id'))
+    try:
+        last_seq = int(last_event_id) if last_event_id is not None else None
+    except ValueError:
+        last_seq = None
+
+    def snapshot_event():
+        """(seq, version, message): full lobby state tagged with the latest event sequence number."""
+        with lobby.event_condition:
+            seq = lobby.event_seq
+            snapshot = lobby.snapshot
+            payload = '{"seq": %d, "event_type": "joined_lobby", "lobby_info": %s, "data": null}' % (
+                seq, snapshot.lobby_info_json())
+        return seq, snapshot.version, format_sse(payload, seq)
+
+    def generate():
+        seq = last_seq
+        missed = lobby.events_since(seq) if seq is not None else None
+        if missed is None:
+            # New stream or gap larger than the event log - start from a full snapshot
+            seq, version, message = snapshot_event()
+            yield message
+        else:
+            version = lobby.snapshot.version
+            for seq, payload in missed:
+                yield format_sse(payload, seq)
+
+        # Events are recorded by the worker that committed the command, so with a shared store
+        # the stream also looks the lobby up every slice and sends a snapshot when another
+        # worker has committed a newer version
+        wait_slice = LOBBY_STATE_WAIT_SLICE if lobbies.shared else SSE_HEARTBEAT_SECONDS
+        deadline = time.monotonic() + SSE_MAX_STREAM_SECONDS
+        heartbeat_at = time.monotonic() + SSE_HEARTBEAT_SECONDS
+        while time.monotonic() < deadline and lobbies.get(lobby_id) is lobby:
+            if not lobby.wait_for_events(seq, wait_slice):
+                if lobby.snapshot.version > version:
+                    seq, version, message = snapshot_event()
+                    yield message
+                elif time.monotonic() >= heartbeat_at:
+                    yield ': keep-alive\n\n'
+                else:
+                    continue
+                heartbeat_at = time.monotonic() + SSE_HEARTBEAT_SECONDS
+                continue
+            version = lobby.snapshot.version
+            events = lobby.events_since(seq)
+            if events is None:
+                # Fell behind the event log - resynchronise with a snapshot
+                seq, version, message = snapshot_event()
+                yield message
+            else:
+                for seq, payload in events:
+                    yield format_sse(payload, seq)
+            heartbeat_at = time.monotonic() + SSE_HEARTBEAT_SECONDS
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
 @app.route('/api/lobby/<lobby_id>/legal-moves/<node_id>')
 def get_legal_moves_api(lobby_id, node_id):
@@ -1791,13 +5055,64 @@ def get_legal_moves_api(lobby_id, node_id):
         return jsonify({'error': 'Lobby not found'}), 404
     
     lobby = lobbies[lobby_id]
-    legal_moves = lobby.get_legal_moves_for_piece(node_id)
+    snapshot = lobby.snapshot
+    legal_moves = run_rules(snapshot.get_legal_moves_for_piece, node_id)
     
     return jsonify({
         'legal_moves': legal_moves,
-        'current_turn': lobby.game_state['current_turn']
+        'current_turn': snapshot.game_state['current_turn']
     })
 
+# Game state keys a command reply can be narrowed to. The set is fixed rather than read from
+# the current state, because keys such as game_over or winner only appear later in a game.
+GAME_STATE_FIELDS = frozenset({
+    'board', 'current_turn', 'game_started', 'last_move', 'game_pieces', 'captured_pieces',
+    'player_turn_numbers', 'player_time_remaining', 'turn_start_time', 'chat_messages',
+    'promotion_mode', 'promotion_player', 'promotion_node', 'promotion_orc',
+    'sacrifice_mode', 'sacrifice_player', 'spider_control_mode', 'spider_control_player',
+    'controlled_piece_name', 'controlled_piece_node', 'controlled_piece_original_color',
+    'timeout_player', 'game_over', 'winner', 'game_end_reason',
+})
+RESPONSE_FIELDS = GAME_STATE_FIELDS | {'lobby_info', 'game_state', 'version'}
+
+def response_fields():
+    """Fields a game command should reply with (?fields= or "fields" in the body), or None for all.
+
+    fields is a comma-separated string or a list naming lobby_info, game_state, version and
+    game state keys (e.g. fields=last_move,version). They are checked before the command runs,
+    so a typo cannot turn an applied move into an error reply.
+    """
+    body = request.get_json(silent=True)
+    fields = request.args.get('fields') or (body.get('fields') if isinstance(body, dict) else None)
+    if not fields:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    if not isinstance(fields, list) or not all(isinstance(field, str) for field in fields):
+        raise ValueError('fields must be a comma-separated string or a list of strings')
+    for field in fields:
+        if field not in RESPONSE_FIELDS:
+            raise ValueError(f'Unknown field {field}')
+    return fields
+
+def command_response(snapshot, fields=None):
+    """Body of a successful game command: game_state and lobby_info, or only the fields asked for."""
+    if fields is None:
+        # Both parts come from the snapshot's cached serializations
+        return Response('{"success": true, "game_state": %s, "lobby_info": %s}' % (
+            snapshot.game_state_json(), snapshot.lobby_info_json()), mimetype='application/json')
+    body = {'success': True}
+    for field in fields:
+        if field == 'lobby_info':
+            body[field] = snapshot.lobby_info
+        elif field == 'version':
+            body[field] = snapshot.version
+        elif field == 'game_state':
+            body[field] = snapshot.game_state
+        else:
+            body[field] = snapshot.game_state.get(field)
+    return jsonify(body)
+
 @app.route('/api/lobby/<lobby_id>/move', methods=['POST'])
 def move_piece_api(lobby_id):
     if lobby_id not in lobbies:
@@ -1811,27 +5126,28 @@ def move_piece_api(lobby_id):
     lobby = lobbies[lobby_id]
     
     # Verify player is in this lobby
-    player = next((p for p in lobby.players if p['id'] == player_id), None)
+    player = lobby.snapshot.find_player(player_id)
     if not player:
         return jsonify({'error': 'Player not in lobby'}), 403
     
     # Verify game is started
-    if not lobby.game_state['game_started']:
+    if not lobby.snapshot.game_state['game_started']:
         return jsonify({'error': 'Game not started'}), 400
     
     # Verify it's the player's turn
-    if player['color'] != lobby.game_state['current_turn']:
+    if player['color'] != lobby.snapshot.game_state['current_turn']:
         return jsonify({'error': 'Not your turn'}), 400
     
+    try:
+        fields = response_fields()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     # Execute the move
-    success, result = lobby.execute_move(from_node, to_node, player_id)
+    success, result = lobby.submit(lobby.execute_move, from_node, to_node, player_id)
     
     if success:
-        return jsonify({
-            'success': True,
-            'game_state': result,
-            'lobby_info': lobby.get_lobby_info()
-        })
+        return command_response(lobby.snapshot, fields)
     else:
         return jsonify({'error': result}), 400
 
@@ -1849,19 +5165,20 @@ def roll_spider_dice_api(lobby_id):
     lobby = lobbies[lobby_id]
     
     # Verify player is in this lobby
-    player = next((p for p in lobby.players if p['id'] == player_id), None)
+    player = lobby.snapshot.find_player(player_id)
     if not player:
         return jsonify({'error': 'Player not in lobby'}), 403
     
+    try:
+        fields = response_fields()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     # Roll the spider dice
-    success, result = lobby.roll_spider_dice(player_id)
+    success, result = lobby.submit(lobby.roll_spider_dice, player_id)
     
     if success:
-        return jsonify({
-            'success': True,
-            'game_state': result,
-            'lobby_info': lobby.get_lobby_info()
-        })
+        return command_response(lobby.snapshot, fields)
     else:
         return jsonify({'error': result}), 400
 
@@ -1880,17 +5197,17 @@ def sacrifice_piece_api(lobby_id):
     lobby = lobbies[lobby_id]
     
     # Verify player is in this lobby
-    player = next((p for p in lobby.players if p['id'] == player_id), None)
+    player = lobby.snapshot.find_player(player_id)
     if not player:
         return jsonify({'error': 'Player not in lobby'}), 403
     
     # Sacrifice the piece
-    success, result = lobby.sacrifice_piece(node_id, player_id)
+    success, result = lobby.submit(lobby.sacrifice_piece, node_id, player_id)
     
     if success:
         return jsonify({
             'success': True,
-            'game_state': result
+            'game_state': lobby.snapshot.game_state
         })
     else:
         return jsonify({'error': result}), 400
@@ -1901,22 +5218,22 @@ def check_status_api(lobby_id):
     if lobby_id not in lobbies:
         return jsonify({'error': 'Lobby not found'}), 404
     
-    lobby = lobbies[lobby_id]
+    snapshot = lobbies[lobby_id].snapshot
     
     # Check if game is started
-    if not lobby.game_state['game_started']:
+    if not snapshot.game_state['game_started']:
         return jsonify({'error': 'Game not started'}), 400
     
     # Get player color from query parameter or use current turn
-    player_color = request.args.get('player', lobby.game_state['current_turn'])
+    player_color = request.args.get('player', snapshot.game_state['current_turn'])
     
     # Check if player is in check
-    is_in_check = lobby._is_player_in_check(player_color)
+    is_in_check = run_rules(snapshot._is_player_in_check, player_color)
     
     # Find threatening pieces if in check
     threatening_pieces = []
     if is_in_check:
-        threatening_pieces = lobby._get_threatening_pieces(player_color)
+        threatening_pieces = run_rules(snapshot._get_threatening_pieces, player_color)
     
     return jsonify({
         'player': player_color,
@@ -1939,24 +5256,43 @@ def check_move_api(lobby_id):
         return jsonify({'error': 'Missing required parameters'}), 400
     
     # Check if any enemy piece can capture the target node (Matron Mother)
-    for node_id, piece_name in board_state.items():
-        if piece_name.startswith(enemy_color + '_'):
-            # Get all possible moves for this enemy piece
-            legal_moves = get_legal_moves(piece_name, node_id, board_state, enemy_color)
-            
-            # Check if any of these moves would capture the target
-            if target_node in legal_moves:
-                return jsonify({
-                    'would_result_in_check': True,
-                    'threatening_piece': piece_name,
-                    'threatening_node': node_id,
-                    'target_node': target_node
-                })
+    threat = run_rules(find_threat, board_state, target_node, enemy_color)
+    if threat:
+        node_id, piece_name = threat
+        return jsonify({
+            'would_result_in_check': True,
+            'threatening_piece': piece_name,
+            'threatening_node': node_id,
+            'target_node': target_node
+        })
     
     return jsonify({
         'would_result_in_check': False
     })
 
+@app.route('/api/analysis/positions', methods=['POST'])
+def analyze_positions_api():
+    """Analyze many positions at once and stream one NDJSON result per position as it completes.
+
+    Body: {"positions": [{"board": {node: piece}, "players": ["red"]}...], "legal_move_counts": bool}.
+    Each result line carries the position's index, since lines arrive in completion order.
+    """
+    data = request.get_json(silent=True) or {}
+    positions = data.get('positions')
+    legal_move_counts = bool(data.get('legal_move_counts'))
+    
+    if not isinstance(positions, list) or not all(isinstance(p, dict) for p in positions):
+        return jsonify({'error': 'positions must be a list of objects'}), 400
+    
+    if len(positions) > ANALYSIS_MAX_POSITIONS:
+        return jsonify({'error': f'At most {ANALYSIS_MAX_POSITIONS} positions per request'}), 400
+    
+    def generate():
+        for result in iter_position_analysis(positions, legal_move_counts):
+            yield _ndjson(result)
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
 @app.route('/api/lobby/<lobby_id>/update-state', methods=['POST'])
 def update_game_state(lobby_id):
     if lobby_id not in lobbies:
@@ -1969,12 +5305,14 @@ def update_game_state(lobby_id):
     lobby = lobbies[lobby_id]
     
     # Verify player is in this lobby
-    player = next((p for p in lobby.players if p['id'] == player_id), None)
+    player = lobby.snapshot.find_player(player_id)
     if not player:
         return jsonify({'error': 'Player not in lobby'}), 403
     
     # Update game state
-    lobby.game_state.update(game_state)
+    success, result = lobby.submit(lobby.update_game_state, game_state)
+    if not success:
+        return jsonify({'error': result}), 400
     
     return jsonify({'success': True})
 
@@ -1989,34 +5327,178 @@ def get_game_config():
     }
     return jsonify(config)
 
+@app.route('/api/event-bus')
+def get_event_bus_stats():
+    """Report which Socket.IO event bus this worker uses and its broadcast latency."""
+    manager = socketio.server.manager
+    stats = {'message_queue': SOCKETIO_MESSAGE_QUEUE or None, 'worker_pid': os.getpid()}
+    if isinstance(manager, LocalBusManager):
+        stats['delivered'] = manager.delivered
+        stats['latency'] = manager.latency_stats()
+    return jsonify(stats)
+
+def lobby_summary(snapshot):
+    """Entry for a lobby in the /api/lobbies list."""
+    return {
+        'lobby_id': snapshot.lobby_id,
+        'player_count': len(snapshot.players),
+        'spectator_count': len(snapshot.spectators),
+        'max_players': MAX_PLAYERS,
+        'can_join': len(snapshot.players) < MAX_PLAYERS,
+        'game_started': snapshot.game_state.get('game_started', False),
+        'game_over': snapshot.game_state.get('game_over', False),
+        'current_turn': snapshot.game_state.get('current_turn'),
+        'created_at': snapshot.created_at.isoformat(),
+        'players': [{'name': p['name'], 'color': p['color']} for p in snapshot.players]
+    }
+
 @app.route('/api/lobbies')
 def get_all_lobbies():
-    """Return list of all active lobbies."""
-    lobby_list = []
-    
-    for lobby_id, lobby in lobbies.items():
-        lobby_info = {
-            'lobby_id': lobby_id,
-            'player_count': len(lobby.players),
-            'spectator_count': len(lobby.spectators),
-            'max_players': MAX_PLAYERS,
-            'can_join': len(lobby.players) < MAX_PLAYERS,
-            'game_started': lobby.game_state.get('game_started', False),
-            'game_over': lobby.game_state.get('game_over', False),
-            'current_turn': lobby.game_state.get('current_turn'),
-            'created_at': lobby.created_at.isoformat(),
-            'players': [{'name': p['name'], 'color': p['color']} for p in lobby.players]
-        }
-        lobby_list.append(lobby_info)
-    
-    # Sort by creation time (newest first)
-    lobby_list.sort(key=lambda x: x['created_at'], reverse=True)
+    """Return a page of lobbies, newest first (?status=joinable|in_progress|finished, ?cursor=, ?limit=)."""
+    status = request.args.get('status', 'all')
+    if status not in LobbyDirectory.STATUSES:
+        return jsonify({'error': f'Unknown status {status}'}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', LOBBY_DIRECTORY_PAGE_SIZE)), LOBBY_DIRECTORY_MAX_PAGE_SIZE))
+        lobby_list, total, next_cursor = lobby_directory.page(status, request.args.get('cursor'), limit)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor or limit'}), 400
     
     return jsonify({
         'lobbies': lobby_list,
-        'total_count': len(lobby_list)
+        'total_count': total,
+        'next_cursor': next_cursor
     })
 
+@app.route('/api/games')
+def list_archived_games():
+    """Search finished games by player name or finish time (unix seconds)."""
+    try:
+        limit = min(int(request.args.get('limit', 50)), 500)
+        since = float(request.args['since']) if 'since' in request.args else None
+        until = float(request.args['until']) if 'until' in request.args else None
+    except ValueError:
+        return jsonify({'error': 'limit, since and until must be numbers'}), 400
+
+    player = request.args.get('player')
+    if player:
+        games = game_archive.by_player(player, since, until, limit=limit)
+    else:
+        games = game_archive.finished_between(since, until, limit=limit)
+    return jsonify({'games': games})
+
+def _ndjson(value):
+    return json.dumps(value, default=str) + '\n'
+
+def _live_game(record):
+    """(summary, history bytes) for a lobby that is not archived yet, from its to_record() data."""
+    game_state = record['game_state']
+    game = {
+        'game_id': record['lobby_id'],
+        'status': 'finished' if game_state.get('game_over') else 'active',
+        'players': [{'id': p['id'], 'name': p['name'], 'color': p['color']} for p in record['players']],
+        'winner': game_state.get('winner'),
+        'game_end_reason': game_state.get('game_end_reason')
+    }
+    return game, base64.b64decode(record['history'])
+
+@app.route('/api/games/<game_id>/replay')
+def replay_game(game_id):
+    """Stream a game's records as NDJSON, with a position snapshot every snapshot_every moves."""
+    try:
+        snapshot_every = max(int(request.args.get('snapshot_every', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'snapshot_every must be a number'}), 400
+
+    lobby = lobbies.get(game_id)
+    if lobby is not None:
+        game, history = _live_game(lobby.to_record())
+    else:
+        game = game_archive.get(game_id)
+        if game is None:
+            return jsonify({'error': 'Game not found'}), 404
+        history = game.pop('history')
+        game['status'] = 'archived'
+
+    def generate():
+        yield _ndjson(dict(game, type='game'))
+        if not snapshot_every:
+            for record in iter_journal_records(history, header=False):
+                yield _ndjson(describe_journal_record(*record))
+            return
+        moves = 0
+        try:
+            for replayed, record_type, timestamp, payload in iter_replay([history], header=False):
+                yield _ndjson(describe_journal_record(record_type, timestamp, payload))
+                if record_type in JOURNAL_TURN_RECORDS:
+                    moves += 1
+                    if moves % snapshot_every == 0:
+                        state = replayed.game_state
+                        yield _ndjson({
+                            'type': 'snapshot',
+                            'move': moves,
+                            'board': state['board'],
+                            'current_turn': state['current_turn'],
+                            'captured_pieces': state['captured_pieces'],
+                            'player_time_remaining': state['player_time_remaining']
+                        })
+        except ValueError as e:
+            # The status line is already sent, so the stream ends with the error
+            yield _ndjson({'type': 'error', 'error': str(e)})
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@app.route('/api/games/export')
+def export_games():
+    """Stream games (status=finished|active|all) as NDJSON, one game with its records per line."""
+    status = request.args.get('status', 'all')
+    if status not in ('finished', 'active', 'all'):
+        return jsonify({'error': 'status must be finished, active or all'}), 400
+    try:
+        since = float(request.args['since']) if 'since' in request.args else None
+        until = float(request.args['until']) if 'until' in request.args else None
+    except ValueError:
+        return jsonify({'error': 'since and until must be numbers'}), 400
+
+    def generate():
+        if status in ('finished', 'all'):
+            for game in game_archive.iter_games(since, until):
+                history = game.pop('history')
+                game['status'] = 'archived'
+                game['records'] = [describe_journal_record(*record)
+                                   for record in iter_journal_records(history, header=False)]
+                yield _ndjson(game)
+        if status in ('active', 'all'):
+            # Spilled and other cold lobbies are read where they are, not paged back in
+            for lobby_id, state, load in lobbies.records():
+                if state == 'finished':
+                    # Finished games are exported from the archive
+                    continue
+                try:
+                    record = load()
+                except FileNotFoundError:
+                    # Spilled, then paged back in meanwhile
+                    lobby = lobbies.get(lobby_id)
+                    if lobby is None:
+                        continue
+                    record = lobby.to_record()
+                game, history = _live_game(record)
+                game['records'] = [describe_journal_record(*record)
+                                   for record in iter_journal_records(history, header=False)]
+                yield _ndjson(game)
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@app.route('/api/games/<game_id>')
+def get_archived_game(game_id):
+    """Return a finished game's result and players."""
+    game = game_archive.get(game_id)
+    if game is None:
+        return jsonify({'error': 'Game not found'}), 404
+    history = game.pop('history')
+    game['record_count'] = sum(1 for _ in iter_journal_records(history, header=False))
+    return jsonify(game)
+
 @app.route('/api/lobby/<lobby_id>/chat', methods=['POST'])
 def send_chat_message_api(lobby_id):
     """Send a chat message to the lobby."""
@@ -2039,7 +5521,7 @@ def send_chat_message_api(lobby_id):
     lobby = lobbies[lobby_id]
     
     # Add the chat message
-    success, result = lobby.add_chat_message(player_id, message.strip())
+    success, result = lobby.submit(lobby.add_chat_message, player_id, message.strip())
     
     if success:
         # Notify all players about the new message via WebSocket
@@ -2068,19 +5550,53 @@ def promote_orc_api(lobby_id):
     lobby = lobbies[lobby_id]
     
     # Verify player is in this lobby
-    player = next((p for p in lobby.players if p['id'] == player_id), None)
+    player = lobby.snapshot.find_player(player_id)
     if not player:
         return jsonify({'error': 'Player not in lobby'}), 403
     
+    try:
+        fields = response_fields()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     # Promote the orc
-    success, result = lobby.promote_orc(player_id, selected_piece)
+    success, result = lobby.submit(lobby.promote_orc, player_id, selected_piece)
     
     if success:
-        return jsonify({
-            'success': True,
-            'game_state': result,
-            'lobby_info': lobby.get_lobby_info()
-        })
+        return command_response(lobby.snapshot, fields)
+    else:
+        return jsonify({'error': result}), 400
+
+@app.route('/api/lobby/<lobby_id>/commands', methods=['POST'])
+def batch_commands_api(lobby_id):
+    """Apply several actions of one turn (e.g. a move and the orc promotion it earns) atomically."""
+    if lobby_id not in lobbies:
+        return jsonify({'error': 'Lobby not found'}), 404
+    
+    data = request.get_json()
+    actions = data.get('actions')
+    player_id = data.get('player_id')
+    
+    if not actions or not player_id:
+        return jsonify({'error': 'Actions and Player ID required'}), 400
+    
+    lobby = lobbies[lobby_id]
+    
+    # Verify player is in this lobby
+    player = lobby.snapshot.find_player(player_id)
+    if not player:
+        return jsonify({'error': 'Player not in lobby'}), 403
+    
+    try:
+        fields = response_fields()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Apply every action, or none of them
+    success, result = lobby.submit(lobby.execute_batch, actions, player_id)
+    
+    if success:
+        return command_response(lobby.snapshot, fields)
     else:
         return jsonify({'error': result}), 400
 
@@ -2099,26 +5615,54 @@ def player_timeout_api(lobby_id):
     lobby = lobbies[lobby_id]
     
     # Verify player is in this lobby
-    player = next((p for p in lobby.players if p['id'] == player_id), None)
+    player = lobby.snapshot.find_player(player_id)
     if not player:
         return jsonify({'error': 'Player not in lobby'}), 403
     
+    try:
+        fields = response_fields()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     # Handle the timeout
-    success, result = lobby.handle_player_timeout(player['color'])
+    success, result = lobby.submit(lobby.handle_player_timeout, player['color'])
     
     if success:
-        return jsonify({
-            'success': True,
-            'game_state': result,
-            'lobby_info': lobby.get_lobby_info()
-        })
+        return command_response(lobby.snapshot, fields)
     else:
         return jsonify({'error': result}), 400
 
+@app.route('/internal/shards', methods=['POST'])
+def update_shards():
+    """Router notification of a new shard membership."""
+    if not _shard_request_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify({'moved': rebalance_lobbies(request.get_json()['shards'])})
+
+@app.route('/internal/lobbies', methods=['POST'])
+def adopt_lobbies():
+    """Take over lobbies handed off by another shard."""
+    if not _shard_request_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    records = request.get_json()['records']
+    for record in records:
+        lobby = Lobby.from_record(record)
+        if lobby.journaled:
+            # Start a fresh segment from a snapshot so the journal here stands on its own
+            lobby._checkpoint_journal()
+        lobbies[lobby.lobby_id] = lobby
+        turn_clock.update(lobby)
+    return jsonify({'adopted': len(records)})
+
 if __name__ == '__main__':
     # Development server - use gunicorn for production
     debug_mode = os.environ.get('FLASK_ENV') == 'development'
     port = int(os.environ.get('PORT', 5000))
     host = os.environ.get('HOST', '0.0.0.0')
+
+    # Keep live games across dev server restarts (gunicorn uses the hooks in gunicorn.conf.py)
+    restore_lobby_handoff()
+    recover_journaled_lobbies()
+    atexit.register(save_lobby_handoff)
     
     socketio.run(app, debug=debug_mode, host=host, port=port) 
\ No newline at end of file
@@ -10,17 +10,33 @@ bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
 backlog = 2048
 
 # Worker processes
-# For SocketIO applications, use 1 worker to avoid session sharing issues
-# unless using a shared session store like Redis
-workers = int(os.environ.get('GUNICORN_WORKERS', 1))
-worker_class = "sync"
+# With the default in-process lobby store, use 1 worker: lobbies live in that worker.
+# LOBBY_STORE=sqlite shares lobbies between workers, so run one worker per core.
+if os.environ.get('LOBBY_STORE', 'memory') == 'sqlite':
+    workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+else:
+    workers = int(os.environ.get('GUNICORN_WORKERS', 1))
 timeout = 30
 keepalive = 2
-threads = 4  # Increase threads to handle more concurrent connections
 
-# Restart workers after this many requests, to help with memory leaks
-max_requests = 1000
-max_requests_jitter = 100
+# ASYNC_MODE=gevent (see app.py) serves every connection from a green thread, so a single
+# worker can hold thousands of idle Socket.IO connections. The default threading mode
+# uses a small pool of OS threads per worker.
+if os.environ.get('ASYNC_MODE', 'threading') == 'gevent':
+    worker_class = "gevent"
+    worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 12000))
+else:
+    worker_class = "sync"
+    threads = 4  # Increase threads to handle more concurrent connections
+
+# Restart workers after this many requests, to help with memory leaks.
+# Disabled in gevent mode: every Socket.IO connection counts as a request there, and a
+# recycle would drop thousands of live connections at once.
+if worker_class == "gevent":
+    max_requests = 0
+else:
+    max_requests = 1000
+    max_requests_jitter = 100
 
 # Logging
 accesslog = "-"
@@ -48,4 +64,20 @@ limit_request_fields = 100
 limit_request_field_size = 8190
 
 # Application preloading
-preload_app = True
\ No newline at end of file
+preload_app = True
+
+# Live game handoff across worker recycling
+# Lobbies only live in worker memory, so a recycled worker writes them to a handoff file on
+# exit and the replacement worker indexes that file after fork (records decode lazily).
+# Lobbies that were not handed off (e.g. the worker crashed) are recovered from the move journal.
+def post_fork(server, worker):
+    from app import restore_lobby_handoff, recover_journaled_lobbies
+    restore_lobby_handoff()
+    recover_journaled_lobbies()
+
+
+def worker_exit(server, worker):
+    from app import save_lobby_handoff, move_journal, game_archive
+    move_journal.sync(5)
+    game_archive.flush(5)
+    save_lobby_handoff()
@@ -15,5 +15,9 @@ pip install --upgrade pip
 echo "📦 Installing dependencies..."
 pip install -r requirements.txt
 
+# Minify, fingerprint and precompress the page scripts and styles
+echo "📦 Building static assets..."
+python tools/build_assets.py
+
 echo "✅ Build completed successfully!"
 echo "🎮 Sava game application is ready for deployment!"
\ No newline at end of file
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Lobby-affinity sharding for the Sava game application.
+
+Each shard is a single-worker app process that keeps its lobbies in memory. Lobbies are
+assigned to shards by a consistent hash of the lobby id, and the router in this file sends
+every request for a lobby (/lobby/<id>, /api/lobby/<id>/..., Socket.IO connections opened
+with ?lobby_id=<id>) to the shard that owns it. Matchmaking requests all go to one shard,
+and so do Socket.IO connections without a lobby id (the lobby list's directory pushes).
+The lobby list and the game export are gathered from every shard.
+
+The shards file lists one shard per line as `<name> <host>:<port>`. Sending the router
+SIGHUP reloads it: the shards hand the lobbies whose owner changed to the new owners, and
+the router switches over once they are done. Example (see start_sharded.sh):
+
+    python sharding.py --listen 0.0.0.0:5000 --shards-file shards.txt
+"""
+
+import argparse
+import asyncio
+import bisect
+import hashlib
+import json
+import os
+import random
+import re
+import signal
+import urllib.request
+from datetime import datetime
+from urllib.parse import parse_qs, urlencode
+
+# Points per shard on the ring; more points spread lobbies more evenly
+RING_POINTS = 128
+# /api/games/export is about every game, not a lobby called "export"
+LOBBY_PATH = re.compile(r'^/(?:lobby|api/lobby|api/games)/(?!export(?:/|$))([^/?]+)')
+# Ring key whose owner hosts the matchmaking queue
+MATCHMAKING_KEY = 'matchmaking'
+# Ring key whose owner hosts Socket.IO sessions that are not about a lobby (the lobby list)
+DIRECTORY_KEY = 'lobby-directory'
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent hash ring mapping lobby ids to shard names."""
+    def __init__(self, shards=None):
+        self.shards = dict(shards or {})  # name -> host:port
+        points = sorted((_hash(f'{name}#{i}'), name) for name in self.shards for i in range(RING_POINTS))
+        self._keys = [key for key, _ in points]
+        self._names = [name for _, name in points]
+
+    def owner(self, lobby_id):
+        """Name of the shard that owns this lobby, or None for an empty ring."""
+        if not self._keys:
+            return None
+        index = bisect.bisect(self._keys, _hash(lobby_id)) % len(self._keys)
+        return self._names[index]
+
+    def address(self, lobby_id):
+        return self.shards.get(self.owner(lobby_id))
+
+
+def parse_shards(text):
+    """Parse shards from `name host:port` lines or a `name=host:port,...` list."""
+    shards = {}
+    for entry in re.split(r'[,\n]', text):
+        entry = entry.split('#', 1)[0].strip()
+        if entry:
+            name, address = re.split(r'[=\s]+', entry, maxsplit=1)
+            shards[name] = address
+    return shards
+
+
+def post_json(address, path, body, secret, timeout=30):
+    """POST JSON to another shard's internal endpoint and return the decoded reply."""
+    request = urllib.request.Request(
+        f'http://{address}{path}', data=json.dumps(body, default=str).encode('utf-8'),
+        headers={'Content-Type': 'application/json', 'X-Shard-Secret': secret})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def lobby_for_request(target):
+    """Lobby id a request target is about, or None."""
+    path, _, query = target.partition('?')
+    match = LOBBY_PATH.match(path)
+    if match:
+        return match.group(1)
+    if path.startswith('/api/matchmaking'):
+        # The whole queue lives on one shard, which creates the matched lobbies it owns
+        return MATCHMAKING_KEY
+    if path.startswith('/socket.io/'):
+        # Every Engine.IO request of a session must reach the shard that holds the session
+        return parse_qs(query).get('lobby_id', [DIRECTORY_KEY])[0]
+    return None
+
+
+class Router:
+    """Splices each client connection to the shard owning the lobby it is about."""
+    def __init__(self, shards_file, secret):
+        self.shards_file = shards_file
+        self.secret = secret
+        self.ring = HashRing(self._read_shards())
+
+    def _read_shards(self):
+        with open(self.shards_file) as f:
+            return parse_shards(f.read())
+
+    async def reload(self):
+        """Re-read the shards file and move lobbies to their new owners before switching."""
+        ring = HashRing(self._read_shards())
+        if ring.shards == self.ring.shards:
+            return
+        # Every shard, old and new, learns the new membership; shards that lost lobbies push
+        # them to their new owners before replying
+        addresses = set(self.ring.shards.values()) | set(ring.shards.values())
+        results = await asyncio.gather(*[
+            asyncio.to_thread(post_json, address, '/internal/shards', {'shards': ring.shards}, self.secret)
+            for address in addresses], return_exceptions=True)
+        moved = sum(result.get('moved', 0) for result in results if isinstance(result, dict))
+        for address, result in zip(addresses, results):
+            if isinstance(result, Exception):
+                print(f"Shard {address} failed to rebalance: {result}")
+        self.ring = ring
+        print(f"Shards now {sorted(ring.shards)}; moved {moved} lobbies")
+
+    async def handle(self, reader, writer):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        request_line, _, headers = head.partition(b'\r\n')
+        parts = request_line.decode('latin-1').split(' ')
+        if len(parts) != 3:
+            writer.close()
+            return
+        method, target, _ = parts
+        try:
+            if method == 'GET' and target.split('?')[0] == '/api/lobbies':
+                await self._list_lobbies(target, writer)
+                return
+            if method == 'GET' and target.split('?')[0] == '/api/games/export':
+                await self._export_games(target, writer)
+                return
+            lobby_id = lobby_for_request(target)
+            address = self.ring.address(lobby_id) if lobby_id else random.choice(list(self.ring.shards.values()))
+            host, _, port = address.rpartition(':')
+            upstream_reader, upstream_writer = await asyncio.open_connection(host, int(port))
+        except (OSError, IndexError) as e:
+            writer.write(b'HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+            await writer.drain()
+            writer.close()
+            print(f"Router could not reach a shard for {target}: {e}")
+            return
+        if b'upgrade:' not in headers.lower():
+            # One request per connection, so the next request is routed on its own lobby id
+            headers = re.sub(rb'(?im)^connection:[^\r\n]*\r\n', b'', headers)
+            head = request_line + b'\r\nConnection: close\r\n' + headers
+        upstream_writer.write(head)
+        await asyncio.gather(self._pipe(reader, upstream_writer), self._pipe(upstream_reader, writer))
+
+    async def _pipe(self, reader, writer):
+        try:
+            await self._copy(reader, writer)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _list_lobbies(self, target, writer):
+        """Merge a page of /api/lobbies from every shard."""
+        def fetch(address):
+            with urllib.request.urlopen(f'http://{address}{target}', timeout=10) as response:
+                return json.loads(response.read())
+        results = await asyncio.gather(*[asyncio.to_thread(fetch, address) for address in self.ring.shards.values()],
+                                       return_exceptions=True)
+        pages = [result for result in results if isinstance(result, dict)]
+        # Each shard returns its own next page after the cursor; the merged page is the newest
+        # `limit` of those, so the next cursor is simply the last entry returned
+        try:
+            limit = max(1, min(int(parse_qs(target.partition('?')[2]).get('limit', ['50'])[0]), 200))
+        except ValueError:
+            limit = 50
+        lobby_list = [lobby for page in pages for lobby in page['lobbies']]
+        lobby_list.sort(key=lambda x: (-datetime.fromisoformat(x['created_at']).timestamp(), x['lobby_id']))
+        more = len(lobby_list) > limit or any(page.get('next_cursor') for page in pages)
+        lobby_list = lobby_list[:limit]
+        next_cursor = f"{lobby_list[-1]['created_at']}|{lobby_list[-1]['lobby_id']}" if more and lobby_list else None
+        body = json.dumps({'lobbies': lobby_list, 'total_count': sum(page['total_count'] for page in pages),
+                           'next_cursor': next_cursor}).encode('utf-8')
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                     b'Content-Length: %d\r\nConnection: close\r\n\r\n' % len(body) + body)
+        await writer.drain()
+        writer.close()
+
+
+    async def _export_games(self, target, writer):
+        """Stream /api/games/export from every shard.
+
+        The game archive is shared by all shards, so archived games come from the first shard
+        only; every other shard adds its active games. The first shard also validates the
+        request, and an error reply from it is passed through as is.
+        """
+        path, _, query = target.partition('?')
+        params = parse_qs(query)
+        addresses = list(self.ring.shards.values())
+        targets = [(addresses[0], target)]
+        if params.get('status', ['all'])[0] != 'finished':
+            active_target = f"{path}?{urlencode(dict(params, status=['active']), doseq=True)}"
+            targets += [(address, active_target) for address in addresses[1:]]
+        replied = False
+        try:
+            for address, shard_target in targets:
+                host, _, port = address.rpartition(':')
+                try:
+                    reader, upstream = await asyncio.open_connection(host, int(port))
+                    # HTTP/1.0, so the streamed reply is plain bytes up to the end of the connection
+                    upstream.write(f'GET {shard_target} HTTP/1.0\r\nHost: {address}\r\n\r\n'.encode('latin-1'))
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+                    if not replied:
+                        raise
+                    print(f"Router could not export games from shard {address}: {e}")
+                    continue
+                status_line = head.partition(b'\r\n')[0]
+                ok = status_line.split(b' ')[1:2] == [b'200']
+                try:
+                    if not replied:
+                        writer.write(head)
+                        replied = True
+                    elif not ok:
+                        print(f"Shard {address} failed to export games: {status_line!r}")
+                        continue
+                    await self._copy(reader, writer)
+                finally:
+                    upstream.close()
+                if not ok:
+                    break
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+            if not replied:
+                writer.write(b'HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+            print(f"Router could not export games: {e}")
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _copy(reader, writer):
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+
+async def main(args):
+    router = Router(args.shards_file, os.environ.get('SHARD_SECRET', ''))
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.ensure_future(router.reload()))
+    host, _, port = args.listen.rpartition(':')
+    server = await asyncio.start_server(router.handle, host, int(port), limit=65536)
+    print(f"Routing {args.listen} to shards {sorted(router.ring.shards)}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--listen', default=f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+    parser.add_argument('--shards-file', default=os.environ.get('SHARDS_FILE', 'shards.txt'))
+    asyncio.run(main(parser.parse_args()))
@@ -15,5 +15,8 @@ echo "Host: $HOST"
 echo "Port: $PORT"
 echo "Log Level: $LOG_LEVEL"
 
+# Minify, fingerprint and precompress the page scripts and styles
+python3 tools/build_assets.py
+
 # Start gunicorn with the configuration file
 exec gunicorn --config gunicorn.conf.py wsgi:application
\ No newline at end of file
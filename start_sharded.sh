@@ -0,0 +1,30 @@
+#!/bin/bash
+
+# Sharded startup script for Sava game application
+# Starts SHARD_COUNT single-worker shards, each holding its own lobbies in memory, and the
+# router (sharding.py) that sends every lobby's traffic to the shard owning it.
+# To add or remove shards later, edit $SHARDS_FILE, start or stop the shard processes and
+# send the router SIGHUP: lobbies move to their new owners before the router switches.
+
+export FLASK_ENV=${FLASK_ENV:-production}
+export PORT=${PORT:-5000}
+export SHARD_COUNT=${SHARD_COUNT:-$(nproc)}
+export SHARD_BASE_PORT=${SHARD_BASE_PORT:-5100}
+export SHARDS_FILE=${SHARDS_FILE:-/tmp/sava-shards.txt}
+export SHARD_SECRET=${SHARD_SECRET:-$(head -c 16 /dev/urandom | od -An -tx1 | tr -d ' \n')}
+
+echo "Starting $SHARD_COUNT shards behind a router on port $PORT..."
+python3 tools/build_assets.py
+
+: > "$SHARDS_FILE"
+for i in $(seq 0 $((SHARD_COUNT - 1))); do
+    echo "shard$i 127.0.0.1:$((SHARD_BASE_PORT + i))" >> "$SHARDS_FILE"
+done
+for i in $(seq 0 $((SHARD_COUNT - 1))); do
+    SHARD_NAME=shard$i PORT=$((SHARD_BASE_PORT + i)) GUNICORN_WORKERS=1 \
+        LOBBY_HANDOFF_PATH=/tmp/sava-lobbies.shard$i.handoff \
+        gunicorn --config gunicorn.conf.py --bind 127.0.0.1:$((SHARD_BASE_PORT + i)) \
+        --pid /tmp/sava-shard$i.pid wsgi:application &
+done
+
+exec python3 sharding.py --listen 0.0.0.0:$PORT --shards-file "$SHARDS_FILE"
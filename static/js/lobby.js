@@ -0,0 +1,3465 @@
+let playerId = null;
+let playerRole = null;
+let gameBoard = null;
+let lobbyState = null;
+let socket = null;
+// Ids of members with a live connection, once the server has told us
+let onlinePlayers = null;
+// Sequence number of the last lobby event applied; sent on reconnect to resume after it
+let lastSeq = null;
+// Opt into the compact binary wire format with ?wire=binary (remembered per browser)
+const wireFormat = new URLSearchParams(window.location.search).get('wire') || localStorage.getItem('sava_wire_format') || 'json';
+localStorage.setItem('sava_wire_format', wireFormat);
+
+// Generate unique player ID
+function generatePlayerId() {
+    return 'player_' + Math.random().toString(36).substr(2, 9);
+}
+
+// Initialize lobby
+async function initializeLobby() {
+    const lobbyId = document.getElementById('lobby-id').textContent;
+    // Matchmaking seats players before they arrive and links here with their player id;
+    // otherwise the id is remembered per lobby so a reload takes back the same seat
+    playerId = new URLSearchParams(window.location.search).get('player_id')
+        || localStorage.getItem(`sava_player_${lobbyId}`) || generatePlayerId();
+    localStorage.setItem(`sava_player_${lobbyId}`, playerId);
+
+    // Set share URL
+    const shareUrl = window.location.origin + '/lobby/' + lobbyId;
+    document.getElementById('share-url').value = shareUrl;
+
+    // Join lobby
+    try {
+        const response = await fetch(`/api/lobby/${lobbyId}/join`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                player_id: playerId,
+                player_name: `Player ${playerId.slice(-4)}`
+            })
+        });
+
+        const data = await response.json();
+        playerRole = data.role;
+        lobbyState = data.lobby_info;
+
+        // Spectators only need a one-way feed, so they use the SSE stream instead of a socket
+        if (playerRole === 'spectator' && window.EventSource) {
+            initializeEventStream(lobbyId);
+        } else {
+            initializeWebSocket(lobbyId);
+        }
+
+        updateLobbyDisplay();
+
+        // Only initialize the board after we have the lobby state
+        if (lobbyState && lobbyState.game_state) {
+            initializeGameBoard().catch(error => {
+                console.error('Failed to initialize game board:', error);
+            });
+        } else {
+            console.log('Waiting for game state before initializing board...');
+        }
+    } catch (error) {
+        console.error('Failed to join lobby:', error);
+    }
+}
+
+// Initialize read-only server-sent events feed (spectators)
+function initializeEventStream(lobbyId) {
+    // EventSource reconnects on its own and resumes with Last-Event-ID
+    const eventSource = new EventSource(`/api/lobby/${lobbyId}/stream`);
+
+    eventSource.addEventListener('lobby_update', function(event) {
+        const data = JSON.parse(event.data);
+        console.log('Event stream update received:', data);
+        handleLobbyUpdate(data);
+    });
+
+    eventSource.onerror = function() {
+        console.log('Event stream disconnected, reconnecting...');
+    };
+}
+
+// Initialize WebSocket connection
+function initializeWebSocket(lobbyId) {
+    // The lobby id lets a sharding router send this connection to the lobby's shard
+    // The player id binds the connection (and every reconnect) to this player's seat
+    socket = io({ query: { lobby_id: lobbyId, player_id: playerId } });
+
+    // Handle connection events
+    socket.on('connect', function() {
+        console.log('WebSocket connected');
+
+        // Join the lobby room after connection is established
+        socket.emit('join_lobby', {
+            lobby_id: lobbyId,
+            player_id: playerId,
+            wire_format: wireFormat,
+            last_seq: lastSeq
+        });
+    });
+
+    socket.on('disconnect', function() {
+        console.log('WebSocket disconnected');
+    });
+
+    // The lobby was handed to another shard; reconnecting goes through the router again
+    socket.on('lobby_moved', function() {
+        console.log('Lobby moved, reconnecting...');
+        socket.disconnect();
+        socket.connect();
+    });
+
+    // Listen for lobby updates
+    socket.on('lobby_update', function(data) {
+        console.log('WebSocket update received:', data);
+        handleLobbyUpdate(data);
+    });
+
+    // Reconnected after a blip: only the events missed meanwhile, with the latest state
+    socket.on('lobby_resume', function(resume) {
+        console.log(`Resumed after ${resume.events.length} missed events`);
+        if (resume.online_players) {
+            onlinePlayers = new Set(resume.online_players);
+        }
+        resume.events.forEach(event => handleLobbyUpdate({ ...event, lobby_info: resume.lobby_info }));
+        updateLobbyDisplay();
+    });
+
+    // Binary frames decode to the same shape as JSON lobby updates
+    socket.on('lobby_update_bin', function(buffer) {
+        const data = WireFormat.decodeNotification(buffer);
+        console.log('WebSocket binary update received:', data);
+        handleLobbyUpdate(data);
+    });
+
+    // Listen for sacrifice errors
+    socket.on('sacrifice_error', function(data) {
+        console.error('Sacrifice error:', data.error);
+        document.getElementById('status-text').textContent = 'Sacrifice failed: ' + data.error;
+    });
+
+    // Listen for spider control errors
+    socket.on('spider_control_error', function(data) {
+        console.error('Spider control error:', data.error);
+        document.getElementById('status-text').textContent = 'Spider control failed: ' + data.error;
+    });
+
+    // Listen for controlled move errors
+    socket.on('controlled_move_error', function(data) {
+        console.error('Controlled move error:', data.error);
+        document.getElementById('status-text').textContent = 'Controlled move failed: ' + data.error;
+    });
+
+    // Listen for chat errors
+    socket.on('chat_error', function(data) {
+        console.error('Chat error:', data.error);
+        // You could show an error message in the chat window here
+    });
+
+    // Listen for timeout events
+    socket.on('player_timeout', function(data) {
+        console.log('⏰ Player timeout event received:', data);
+        updateTimerDisplay();
+        stopTurnTimer();
+    });
+
+    socket.on('timeout_error', function(data) {
+        console.error('Timeout error:', data.error);
+    });
+
+    // Listen for promotion errors
+    socket.on('promotion_error', function(data) {
+        console.error('Promotion error:', data.error);
+        document.getElementById('status-text').textContent = 'Promotion failed: ' + data.error;
+        closePromotionModal();
+    });
+}
+
+// Handle lobby updates from WebSocket
+function handleLobbyUpdate(data) {
+    const { event_type, lobby_info, data: eventData } = data;
+
+    // Events can arrive twice around a reconnect; apply each one once
+    if (typeof data.seq === 'number') {
+        if (lastSeq !== null && data.seq <= lastSeq && event_type !== 'joined_lobby') return;
+        lastSeq = data.seq;
+    }
+
+    // Update local state
+    lobbyState = lobby_info;
+    if (data.online_players) {
+        onlinePlayers = new Set(data.online_players);
+    } else if (event_type === 'player_presence') {
+        onlinePlayers = new Set(eventData.online_players);
+    }
+
+    // Update display
+    updateLobbyDisplay();
+
+    // Update captured pieces display (only if game has started)
+    if (lobby_info.game_state && lobby_info.game_state.game_started) {
+        updateCapturedPieces();
+    }
+
+            // Handle specific events
+switch (event_type) {
+    case 'game_started':
+        console.log('Game started via WebSocket');
+        if (gameBoard && lobby_info.game_state.board) {
+            gameBoard.updateBoardWithPieces(lobby_info.game_state.board);
+        }
+        const currentTurn = lobby_info.game_state.current_turn;
+        document.getElementById('status-text').textContent = 
+            `Game in progress - ${currentTurn.charAt(0).toUpperCase() + currentTurn.slice(1)}'s turn`;
+        document.getElementById('status-indicator').className = 'status-indicator status-playing';
+
+        // Update spider dice button state when game starts
+        updateSpiderDiceButtonState();
+        break;
+
+    case 'game_over':
+        handleGameOver(eventData);
+
+        // Stop timer when game ends
+        stopTurnTimer();
+
+        // Update spider dice button state when game ends
+        updateSpiderDiceButtonState();
+        break;
+
+        case 'piece_moved':
+            console.log('Piece moved via WebSocket');
+            if (gameBoard && lobby_info.game_state.board) {
+                gameBoard.updateBoardWithPieces(lobby_info.game_state.board);
+            }
+
+            // Update status with move information
+            const moveInfo = lobby_info.game_state.last_move;
+            if (moveInfo) {
+                let statusText = `${moveInfo.player.charAt(0).toUpperCase() + moveInfo.player.slice(1)} moved ${moveInfo.piece} from ${moveInfo.from} to ${moveInfo.to}`;
+                if (moveInfo.captured) {
+                    if (Array.isArray(moveInfo.captured) && moveInfo.captured.length > 0) {
+                        if (moveInfo.captured.length === 1) {
+                            statusText += ` (captured ${moveInfo.captured[0]})`;
+                        } else {
+                            statusText += ` (captured ${moveInfo.captured.join(', ')})`;
+                        }
+                    } else if (moveInfo.captured) {
+                        // Handle single capture for backward compatibility
+                        statusText += ` (captured ${moveInfo.captured})`;
+                    }
+                }
+                const currentTurn = lobby_info.game_state.current_turn;
+                statusText += `. ${currentTurn.charAt(0).toUpperCase() + currentTurn.slice(1)}'s turn.`;
+                document.getElementById('status-text').textContent = statusText;
+            }
+
+            // Clear any current selection since it's not our turn
+            gameBoard.clearLegalMoveIndicators();
+            if (gameBoard.selectedNode) {
+                gameBoard.selectedNode.classList.remove('selected');
+                gameBoard.selectedNode = null;
+            }
+
+            // Update captured pieces display
+            updateCapturedPieces();
+
+            // Update spider dice button state after piece move
+            updateSpiderDiceButtonState();
+
+            // Show check indicators after move
+            if (gameBoard && gameBoard.showCheckIndicators) {
+                gameBoard.showCheckIndicators();
+            }
+            break;
+
+        case 'piece_sacrificed':
+            console.log('Piece sacrificed via WebSocket');
+            if (gameBoard && lobby_info.game_state.board) {
+                gameBoard.updateBoardWithPieces(lobby_info.game_state.board);
+            }
+
+            // Exit sacrifice mode
+            if (gameBoard) {
+                gameBoard.exitSacrificeMode();
+            }
+
+            // Update status with sacrifice information
+            const sacrificeMoveInfo = lobby_info.game_state.last_move;
+            if (sacrificeMoveInfo) {
+                let statusText = `${sacrificeMoveInfo.player.charAt(0).toUpperCase() + sacrificeMoveInfo.player.slice(1)} sacrificed ${sacrificeMoveInfo.piece}`;
+                const currentTurn = lobby_info.game_state.current_turn;
+                statusText += `. ${currentTurn.charAt(0).toUpperCase() + currentTurn.slice(1)}'s turn.`;
+                document.getElementById('status-text').textContent = statusText;
+            }
+
+            // Clear any current selection since it's not our turn
+            gameBoard.clearLegalMoveIndicators();
+            if (gameBoard.selectedNode) {
+                gameBoard.selectedNode.classList.remove('selected');
+                gameBoard.selectedNode = null;
+            }
+
+            // Update captured pieces display
+            updateCapturedPieces();
+
+            // Update spider dice button state after sacrifice
+            updateSpiderDiceButtonState();
+
+            // Show check indicators after sacrifice
+            if (gameBoard && gameBoard.showCheckIndicators) {
+                gameBoard.showCheckIndicators();
+            }
+            break;
+
+        case 'enemy_piece_controlled':
+            console.log('Enemy piece controlled via WebSocket');
+            if (gameBoard && lobby_info.game_state.board) {
+                gameBoard.updateBoardWithPieces(lobby_info.game_state.board);
+            }
+
+            // Highlight the controlled piece
+            const controlledNode = lobby_info.game_state.controlled_piece_node;
+            if (gameBoard && controlledNode) {
+                gameBoard.highlightControlledPiece(controlledNode);
+            }
+
+            // Update status with control information
+            const controlMoveInfo = lobby_info.game_state.last_move;
+            if (controlMoveInfo) {
+                let statusText = `${controlMoveInfo.player.charAt(0).toUpperCase() + controlMoveInfo.player.slice(1)} took control of ${controlMoveInfo.controlled_piece}`;
+                statusText += '. Now move the controlled piece.';
+                document.getElementById('status-text').textContent = statusText;
+            }
+            break;
+
+        case 'controlled_piece_moved':
+            console.log('Controlled piece moved via WebSocket');
+            if (gameBoard && lobby_info.game_state.board) {
+                gameBoard.updateBoardWithPieces(lobby_info.game_state.board);
+            }
+
+            // Exit spider control mode
+            if (gameBoard) {
+                gameBoard.exitSpiderControlMode();
+            }
+
+            // Update status with move information
+            const controlledMoveInfo = lobby_info.game_state.last_move;
+            if (controlledMoveInfo) {
+                let statusText = `${controlledMoveInfo.player.charAt(0).toUpperCase() + controlledMoveInfo.player.slice(1)} moved controlled ${controlledMoveInfo.piece}`;
+                if (controlledMoveInfo.captured && controlledMoveInfo.captured.length > 0) {
+                    statusText += ` and captured ${controlledMoveInfo.captured.join(', ')}`;
+                }
+                const currentTurn = lobby_info.game_state.current_turn;
+                statusText += `. ${currentTurn.charAt(0).toUpperCase() + currentTurn.slice(1)}'s turn.`;
+                document.getElementById('status-text').textContent = statusText;
+            }
+
+            // Clear any current selection since it's not our turn
+            gameBoard.clearLegalMoveIndicators();
+            if (gameBoard.selectedNode) {
+                gameBoard.selectedNode.classList.remove('selected');
+                gameBoard.selectedNode = null;
+            }
+
+            // Update captured pieces display
+            updateCapturedPieces();
+
+            // Update spider dice button state
+            updateSpiderDiceButtonState();
+
+            // Show check indicators after controlled move
+            if (gameBoard && gameBoard.showCheckIndicators) {
+                gameBoard.showCheckIndicators();
+            }
+            break;
+
+        case 'spider_dice_rolled':
+            console.log('Spider dice rolled via WebSocket');
+            if (gameBoard && lobby_info.game_state.board) {
+                gameBoard.updateBoardWithPieces(lobby_info.game_state.board);
+            }
+
+            // Update status with dice results
+            const diceMoveInfo = lobby_info.game_state.last_move;
+            if (diceMoveInfo && diceMoveInfo.move_type === 'spider_dice_roll') {
+                const diceResults = diceMoveInfo.dice_results;
+                let statusText = `${diceMoveInfo.player.charAt(0).toUpperCase() + diceMoveInfo.player.slice(1)} rolled spider dice: `;
+                statusText += `${diceResults.die1_spider ? '🕷️' : '🔪'} and ${diceResults.die2_spider ? '🕷️' : '🔪'}`;
+
+                if (diceResults.both_spiders) {
+                    statusText += ' 🕷️🕷️ DOUBLE SPIDERS! Player can control an enemy piece!';
+                    // Enter spider control mode only if the current local player is the one who should control
+                    if (gameBoard && lobby_info.game_state?.spider_control_mode) {
+                        const currentPlayer = lobby_info.players?.find(p => p.id === playerId);
+                        const spiderControlPlayer = lobby_info.game_state?.spider_control_player;
+                        if (currentPlayer && currentPlayer.color === spiderControlPlayer) {
+                            gameBoard.enterSpiderControlMode();
+                        }
+                    }
+                } else if (diceResults.both_knives) {
+                    statusText += ' 🔪🔪 DOUBLE KNIVES! Player must sacrifice a piece!';
+                    // Enter sacrifice mode only if the current local player is the one who must sacrifice
+                    if (gameBoard && lobby_info.game_state?.sacrifice_mode) {
+                        const currentPlayer = lobby_info.players?.find(p => p.id === playerId);
+                        const sacrificePlayer = lobby_info.game_state?.sacrifice_player;
+                        if (currentPlayer && currentPlayer.color === sacrificePlayer) {
+                            gameBoard.enterSacrificeMode();
+                        }
+                    }
+                } else {
+                    const spiderCount = (diceResults.die1_spider ? 1 : 0) + (diceResults.die2_spider ? 1 : 0);
+                    if (spiderCount === 1) {
+                        statusText += ' (1 spider)';
+                    } else {
+                        statusText += ' (no knives)';
+                    }
+                }
+
+                const currentTurn = lobby_info.game_state.current_turn;
+                statusText += `. ${currentTurn.charAt(0).toUpperCase() + currentTurn.slice(1)}'s turn.`;
+
+                document.getElementById('status-text').innerHTML = statusText;
+            }
+
+            // Clear any current selection since it's not our turn
+            gameBoard.clearLegalMoveIndicators();
+            if (gameBoard.selectedNode) {
+                gameBoard.selectedNode.classList.remove('selected');
+                gameBoard.selectedNode = null;
+            }
+
+            // Update captured pieces display
+            updateCapturedPieces();
+
+            // Update spider dice button state after dice roll
+            updateSpiderDiceButtonState();
+            break;
+
+        // Duplicate piece_sacrificed case removed - handled above
+
+        case 'player_joined':
+            console.log('Player joined via WebSocket:', eventData);
+            // Force update the lobby display to show the new player
+            updateLobbyDisplay();
+            break;
+
+        case 'player_left':
+            console.log('Player left via WebSocket:', eventData);
+            // Force update the lobby display to reflect the player leaving
+            updateLobbyDisplay();
+            break;
+
+        case 'joined_lobby':
+            console.log('Joined lobby via WebSocket:', lobby_info);
+            // Update the display with the current lobby state
+            updateLobbyDisplay();
+
+            // Initialize the board if it hasn't been initialized yet and we have game state
+            if (!gameBoard && lobby_info.game_state) {
+                console.log('Initializing game board from WebSocket data...');
+                initializeGameBoard().catch(error => {
+                    console.error('Failed to initialize game board from WebSocket:', error);
+                });
+            }
+
+            // Load existing chat messages
+            loadChatMessages();
+            break;
+
+        case 'chat_message_sent':
+            console.log('Chat message received via WebSocket:', eventData);
+            addChatMessage(eventData);
+            break;
+
+        case 'orc_promotion_available':
+            console.log('Orc promotion available via WebSocket:', eventData);
+            showPromotionModal(eventData);
+            break;
+
+        case 'orc_promoted':
+            console.log('Orc promoted via WebSocket:', eventData);
+            if (gameBoard && lobby_info.game_state.board) {
+                gameBoard.updateBoardWithPieces(lobby_info.game_state.board);
+            }
+            closePromotionModal();
+
+            // Update status
+            const promotionInfo = lobby_info.game_state.last_move;
+            if (promotionInfo && promotionInfo.move_type === 'orc_promotion') {
+                let statusText = `${promotionInfo.player.charAt(0).toUpperCase() + promotionInfo.player.slice(1)} promoted ${promotionInfo.promoted_from} to ${promotionInfo.promoted_to}`;
+                const currentTurn = lobby_info.game_state.current_turn;
+                statusText += `. ${currentTurn.charAt(0).toUpperCase() + currentTurn.slice(1)}'s turn.`;
+                document.getElementById('status-text').textContent = statusText;
+            }
+
+            // Update captured pieces display
+            updateCapturedPieces();
+
+            // Show check indicators after promotion
+            if (gameBoard && gameBoard.showCheckIndicators) {
+                gameBoard.showCheckIndicators();
+            }
+            break;
+
+        case 'commands_applied':
+            // One update for a batch of actions: handle each action's event against the final state
+            eventData.events.forEach(event => handleLobbyUpdate({ event_type: event.event_type, lobby_info, data: event.data }));
+            break;
+
+        default:
+            console.log('Unknown event type:', event_type);
+    }
+}
+
+// Update lobby display
+function updateLobbyDisplay() {
+    if (!lobbyState) return;
+
+    // Update player count
+    const playerCount = lobbyState.players?.length || 0;
+    document.querySelector('.player-section h3').textContent = `Players (${playerCount}/2)`;
+
+    // Update player list
+    const playerList = document.getElementById('player-list');
+    playerList.innerHTML = '';
+
+    if (!lobbyState.players || lobbyState.players.length === 0) {
+        playerList.innerHTML = '<li class="player-item">Waiting for players to join...</li>';
+    } else {
+        lobbyState.players.forEach(player => {
+            const li = document.createElement('li');
+            li.className = 'player-item';
+            // Prepare player display name
+            let displayName = player.name;
+            if (window.SHOW_PLAYER_IDS && player.id) {
+                displayName += ` (${player.id.slice(-4)})`;
+            }
+
+            li.innerHTML = `
+                <div class="player-avatar">${player.name.slice(0, 2).toUpperCase()}</div>
+                <div class="player-info">
+                    <div class="player-name">${displayName}</div>
+                    <div class="player-role">${player.color} player${onlinePlayers && !onlinePlayers.has(player.id) ? ' · offline' : ''}</div>
+                </div>
+            `;
+            playerList.appendChild(li);
+        });
+    }
+
+    // Update spectator list
+    const spectatorList = document.getElementById('spectator-list');
+    spectatorList.innerHTML = '';
+
+    if (lobbyState.spectators.length === 0) {
+        spectatorList.innerHTML = '<li class="player-item">No spectators</li>';
+    } else {
+        lobbyState.spectators.forEach(spectator => {
+            const li = document.createElement('li');
+            li.className = 'player-item spectator';
+            li.innerHTML = `
+                <div class="player-avatar">👁</div>
+                <div class="player-info">
+                    <div class="player-name">${spectator.name}</div>
+                    <div class="player-role">Spectator</div>
+                </div>
+            `;
+            spectatorList.appendChild(li);
+        });
+    }
+
+    // Update status
+    const statusIndicator = document.getElementById('status-indicator');
+    const statusText = document.getElementById('status-text');
+
+    if (lobbyState.game_state.game_started) {
+        // Game is already started
+        statusIndicator.className = 'status-indicator status-playing';
+        const currentTurn = lobbyState.game_state.current_turn;
+        const currentPlayer = lobbyState?.players?.find(p => p.id === playerId);
+        if (currentPlayer) {
+            const playerTurnCount = lobbyState.game_state.player_turn_numbers?.[currentPlayer.color] || 0;
+            statusText.textContent = `Game in progress - Your turn count: ${playerTurnCount} - ${currentTurn.charAt(0).toUpperCase() + currentTurn.slice(1)}'s turn`;
+        } else {
+            statusText.textContent = `Game in progress - ${currentTurn.charAt(0).toUpperCase() + currentTurn.slice(1)}'s turn`;
+        }
+    } else if (lobbyState.can_start) {
+        // Ready to start but not started yet
+        statusIndicator.className = 'status-indicator status-ready';
+        statusText.textContent = 'Starting game automatically...';
+    } else {
+        // Waiting for players
+        statusIndicator.className = 'status-indicator status-waiting';
+        statusText.textContent = `Waiting for players... (${playerCount}/2)`;
+    }
+
+    // Update spider dice button state when lobby display is updated
+    if (lobbyState.game_state && lobbyState.game_state.game_started) {
+        updateSpiderDiceButtonState();
+        // Update timer display
+        updateTimerDisplay();
+        // Start timer if game is active
+        if (!lobbyState.game_state.game_over) {
+            startTurnTimer();
+        }
+    } else {
+        // Stop timer if game hasn't started or is over
+        stopTurnTimer();
+    }
+}
+
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
+// Update captured pieces display
+function updateCapturedPieces() {
+    if (!lobbyState || !lobbyState.game_state || !lobbyState.game_state.captured_pieces) return;            
+    const redCaptured = document.getElementById('red-captured');
+    const blueCaptured = document.getElementById('blue-captured');
+
+    // Clear existing displays
+    redCaptured.innerHTML = '';
+    blueCaptured.innerHTML = '';
+
+    // Display red's captured pieces
+    lobbyState.game_state.captured_pieces.red.forEach(pieceName => {
+        const pieceElement = document.createElement('div');
+        pieceElement.className = 'captured-piece blue'; // Blue pieces captured by red
+        pieceElement.textContent = getPieceSymbol(pieceName);
+        pieceElement.title = pieceName;
+        redCaptured.appendChild(pieceElement);
+    });
+
+    // Display blue's captured pieces
+    lobbyState.game_state.captured_pieces.blue.forEach(pieceName => {
+        const pieceElement = document.createElement('div');
+        pieceElement.className = 'captured-piece red'; // Red pieces captured by blue
+        pieceElement.textContent = getPieceSymbol(pieceName);
+        pieceElement.title = pieceName;
+        blueCaptured.appendChild(pieceElement);
+    });
+}
+
+// Game board class
+class MolecularBoard {
+    constructor() {
+        this.board = document.getElementById('game-board');
+        this.nodes = [];
+        this.selectedNode = null;
+        this.weaponmasterMode = false;
+        this.firstNode = null;
+        this.weaponmasterMoves = [];
+        this.wizardMode = false;
+        this.wizardFirstNode = null;
+        this.wizardSecondNode = null;
+        this.wizardMoves = [];
+        this.sacrificeMode = false;
+        this.spiderControlMode = false;
+        this.controlledPieceNode = null;
+        this.controlledWeaponmasterMode = false;
+        this.controlledWeaponmasterMoves = [];
+        this.controlledFirstNode = null;
+
+        // Store initial dimensions for resize detection
+        this.lastWidth = window.innerWidth;
+        this.lastHeight = window.innerHeight;
+
+        // Mobile detection
+        this.isMobile = this.detectMobile();
+
+        // Check if GAME_CONFIG is loaded before initializing board
+        if (GAME_CONFIG) {
+            console.log('🎯 GAME_CONFIG available, waiting for container dimensions');
+            // Wait for next frame to ensure container has proper dimensions
+            requestAnimationFrame(() => {
+                this.initializeBoard();
+            });
+        } else {
+            console.log('🎯 GAME_CONFIG not loaded yet, waiting...');
+            // Wait for GAME_CONFIG to load
+            this.waitForGameConfig();
+        }
+
+        this.setupResizeDetection();
+    }
+
+    async waitForGameConfig() {
+        let attempts = 0;
+        const maxAttempts = 50; // Wait up to 5 seconds
+
+        while (!GAME_CONFIG && attempts < maxAttempts) {
+            await new Promise(resolve => setTimeout(resolve, 100));
+            attempts++;
+        }
+
+        if (GAME_CONFIG) {
+            console.log('🎯 GAME_CONFIG loaded after waiting, waiting for container dimensions');
+            requestAnimationFrame(() => {
+                this.initializeBoard();
+            });
+        } else {
+            console.error('🎯 GAME_CONFIG failed to load after waiting');
+        }
+    }
+
+    detectMobile() {
+        // Check for mobile device based on multiple criteria
+        const userAgent = navigator.userAgent || navigator.vendor || window.opera;
+        const isMobileUA = /Android|webOS|iPhone|iPad|iPod|BlackBerry|IEMobile|Opera Mini/i.test(userAgent);
+
+        // Check for touch capability
+        const hasTouch = 'ontouchstart' in window || navigator.maxTouchPoints > 0;
+
+        // Check screen size - consider devices under 768px width as mobile
+        const isSmallScreen = window.innerWidth < 768;
+
+        // Combine criteria - mobile if small screen OR (mobile user agent AND touch)
+        const isMobile = isSmallScreen || (isMobileUA && hasTouch);                
+        return isMobile;
+    }
+
+    setupResizeDetection() {
+        window.addEventListener('resize', () => {
+            // Re-detect mobile on resize (orientation change)
+            this.isMobile = this.detectMobile();
+            this.onResize();
+        });
+    }
+
+    onResize() {
+        try {
+            const currentWidth = window.innerWidth;
+            const currentHeight = window.innerHeight;
+
+            if (currentWidth !== this.lastWidth || currentHeight !== this.lastHeight) {
+                devLog('🔄 Window resize detected:', {
+                    old: { width: this.lastWidth, height: this.lastHeight },
+                    new: { width: currentWidth, height: currentHeight }
+                });
+
+                this.lastWidth = currentWidth;
+                this.lastHeight = currentHeight;
+
+                // Store current game state before reinitializing
+                const currentBoardState = lobbyState?.game_state?.board || {};
+                const currentSelection = this.selectedNode ? this.selectedNode.getAttribute('data-id') : null;
+                const currentWeaponmasterMode = this.weaponmasterMode;
+                const currentWizardMode = this.wizardMode;
+
+                // Re-initialize board to apply new scaling
+                this.initializeBoard();
+
+                // Restore game state after reinitializing
+                if (Object.keys(currentBoardState).length > 0) {
+                    this.updateBoardWithPieces(currentBoardState);
+
+                    // Restore selection if there was one
+                    if (currentSelection) {
+                        const nodeToSelect = this.nodes.find(n => n.id === currentSelection);
+                        if (nodeToSelect) {
+                            nodeToSelect.element.classList.add('selected');
+                            this.selectedNode = nodeToSelect.element;
+
+                            // Restore special move modes
+                            if (currentWeaponmasterMode) {
+                                this.weaponmasterMode = true;
+                                this.getLegalMoves(currentSelection);
+                                console.log('⚔️ Weaponmaster mode restored');
+                            } else if (currentWizardMode) {
+                                this.wizardMode = true;
+                                this.getLegalMoves(currentSelection);
+                            } else {
+                                // Regular piece selection - get legal moves
+                                this.getLegalMoves(currentSelection);
+                            }
+                        } else {
+                            console.warn('⚠️ Could not restore selection - node not found:', currentSelection);
+                        }
+                    }
+
+                    // Ensure complete game state restoration
+                    setTimeout(() => {
+                        this.restoreGameStateAfterResize();
+                    }, 100); // Small delay to ensure DOM is ready
+                }
+            }
+        } catch (error) {
+            console.error('❌ Error during resize handling:', error);
+            // Fallback: try to refresh the board completely
+            try {
+                console.log('🔄 Attempting fallback board refresh...');
+                this.refreshBoard();
+            } catch (fallbackError) {
+                console.error('❌ Fallback refresh also failed:', fallbackError);
+            }
+        }
+    }
+
+    initializeBoard() {
+        this.board.innerHTML = '';
+        this.nodes = [];
+
+        // Ensure board has dimensions before calculating
+        if (this.board.offsetWidth === 0 || this.board.offsetHeight === 0) {
+            console.warn('🎯 Board has no dimensions yet, retrying...');
+            requestAnimationFrame(() => this.initializeBoard());
+            return;
+        }
+
+        // Calculate center based on actual board size
+        const boardWidth = this.board.offsetWidth;
+        const boardHeight = this.board.offsetHeight;
+        this.centerX = boardWidth / 2;
+        this.centerY = boardHeight / 2;
+
+        // Use different board layouts based on device type
+        if (this.isMobile) {
+            this.initializeMobileBoard(boardWidth, boardHeight);
+        } else {
+            this.initializeDesktopBoard(boardWidth, boardHeight);
+        }
+    }
+
+    initializeDesktopBoard(boardWidth, boardHeight) {
+        // Calculate dynamic scaling factor based on available space
+        // Use the smaller dimension to ensure proper aspect ratio for circular board
+        const smallerDim = Math.min(boardWidth, boardHeight);
+        const baseSize = smallerDim; // Use pure smaller dimension for precise geometry
+        const referenceSize = 800; // Reference board size
+        const scaleFactor = Math.max(0.7, Math.min(2.0, baseSize / referenceSize));
+
+        // Apply scaling to board dimensions for better spacing
+        const scaledCenterOffset = GAME_CONFIG.board_scaling.center_offset * scaleFactor * 1.0; // Reduced multiplier
+        const scaledMaxRadius = smallerDim * GAME_CONFIG.board_scaling.max_radius_multiplier; // Use config value
+        const scaledNodeSize = Math.max(20, Math.min(60, GAME_CONFIG.board_scaling.node_size * scaleFactor));
+
+        // Create center nodes (4 nodes in a square) with scaled positioning
+        const centerPositions = [
+            {x: this.centerX - scaledCenterOffset, y: this.centerY - scaledCenterOffset},
+            {x: this.centerX + scaledCenterOffset, y: this.centerY - scaledCenterOffset},
+            {x: this.centerX - scaledCenterOffset, y: this.centerY + scaledCenterOffset},
+            {x: this.centerX + scaledCenterOffset, y: this.centerY + scaledCenterOffset}
+        ];
+
+        centerPositions.forEach((pos, index) => {
+            this.createNode(pos.x, pos.y, `C${index}`, 'center', scaledNodeSize);
+        });
+
+        // Create concentric rings using config ratios for perfect intersection
+        const ringRadii = GAME_CONFIG.board_scaling.ring_radius_ratios.map(ratio => 
+            scaledMaxRadius * ratio
+        );
+        ringRadii.forEach((radius, ringIndex) => {
+            this.createRing(radius, ringIndex + 1, scaledNodeSize);
+        });
+
+        // Create connecting strands with scaled dimensions
+        this.createStrands(scaleFactor, scaledMaxRadius);
+
+        // Create resurrection zone overlays
+        this.createResurrectionZoneOverlays();
+    }
+
+    initializeMobileBoard(boardWidth, boardHeight) {
+        console.log('📱 Initializing mobile rectangular board');
+
+        // MOBILE RECTANGULAR BOARD LAYOUT
+        // Instead of concentric circles that waste space on mobile, we use concentric rectangles
+        // that fill the available screen space much more efficiently. The game logic remains
+        // identical - we just change the visual positioning of the same node IDs.
+
+        // Calculate scaling factor based on available space for rectangular layout
+        const referenceSize = 600; // Reference board size for mobile
+        const scaleFactor = Math.max(0.5, Math.min(1.5, Math.min(boardWidth, boardHeight) / referenceSize));
+        const scaledNodeSize = Math.max(18, Math.min(40, GAME_CONFIG.board_scaling.node_size * scaleFactor));
+
+        // Create rectangular grid layout that fills available space efficiently
+        // We'll create 3 concentric rectangles + center nodes
+
+        // Calculate margins and spacing to avoid UI element overlap
+        // Account for hamburger menu (top-left), chat bubbles (top-right), and other UI elements
+        const topMargin = 100 * scaleFactor; // Extra space for hamburger menu and chat
+        const sideMargin = 80 * scaleFactor; // Extra space for chat bubbles and UI elements
+        const bottomMargin = 60 * scaleFactor; // Space for bottom UI elements
+
+        const usableWidth = boardWidth - (2 * sideMargin);
+        const usableHeight = boardHeight - topMargin - bottomMargin;
+
+        // Adjust center position to account for asymmetric margins
+        const adjustedCenterX = this.centerX;
+        const adjustedCenterY = this.centerY + (topMargin - bottomMargin) / 2;
+
+        // Create center nodes (4 nodes in a small rectangle)
+        const centerSpacing = 25 * scaleFactor;
+        const centerPositions = [
+            {x: adjustedCenterX - centerSpacing, y: adjustedCenterY - centerSpacing},
+            {x: adjustedCenterX + centerSpacing, y: adjustedCenterY - centerSpacing},
+            {x: adjustedCenterX - centerSpacing, y: adjustedCenterY + centerSpacing},
+            {x: adjustedCenterX + centerSpacing, y: adjustedCenterY + centerSpacing}
+        ];
+
+        centerPositions.forEach((pos, index) => {
+            this.createNode(pos.x, pos.y, `C${index}`, 'center', scaledNodeSize);
+        });
+
+        // Create 3 rectangular "rings" that use the available space
+        const rectangularRings = [
+            { width: usableWidth * 0.4, height: usableHeight * 0.4 },
+            { width: usableWidth * 0.7, height: usableHeight * 0.7 },
+            { width: usableWidth * 0.95, height: usableHeight * 0.95 }
+        ];
+
+        rectangularRings.forEach((rect, ringIndex) => {
+            this.createRectangularRing(rect.width, rect.height, ringIndex + 1, scaledNodeSize, adjustedCenterX, adjustedCenterY);
+        });
+
+        // Create connecting strands for rectangular layout
+        this.createRectangularStrands(scaleFactor);
+
+        // Create resurrection zone overlays
+        this.createResurrectionZoneOverlays();
+    }
+
+    createNode(x, y, id, type, nodeSize) {
+        const node = document.createElement('div');
+        node.className = 'node';
+
+        // Apply scaled dimensions
+        node.style.width = nodeSize + 'px';
+        node.style.height = nodeSize + 'px';
+        node.style.fontSize = Math.max(0.6, Math.min(1.2, 0.8 * (nodeSize / 20))) + 'rem';
+        node.style.borderWidth = Math.max(1, Math.min(3, 2 * (nodeSize / 20))) + 'px';
+
+        // Position with scaled offset
+        node.style.left = (x - nodeSize / 2) + 'px';
+        node.style.top = (y - nodeSize / 2) + 'px';
+
+        node.setAttribute('data-id', id);
+        node.setAttribute('data-type', type);
+        node.setAttribute('data-x', x);
+        node.setAttribute('data-y', y);
+
+        // Only show node labels in development mode
+        if (GAME_CONFIG?.development?.enabled) {
+            node.textContent = id;
+        } else {
+            node.textContent = '';
+        }
+
+        // Default styling for all nodes
+        node.style.background = '#fff';
+        node.style.borderColor = '#333';
+
+        node.addEventListener('click', (e) => this.handleNodeClick(e));
+
+        this.board.appendChild(node);
+        this.nodes.push({id, x, y, type, element: node});
+    }
+
+    createRing(radius, ringIndex, nodeSize) {
+        const nodesPerRing = 16;
+        for (let i = 0; i < nodesPerRing; i++) {
+            const angle = (i * 2 * Math.PI) / nodesPerRing;
+            const x = this.centerX + radius * Math.cos(angle);
+            const y = this.centerY + radius * Math.sin(angle);
+            const id = `R${ringIndex}N${i}`;
+            this.createNode(x, y, id, `ring${ringIndex}`, nodeSize);
+        }
+    }
+
+    createRectangularRing(width, height, ringIndex, nodeSize, centerX = this.centerX, centerY = this.centerY) {
+        const nodesPerRing = 16; // Keep same number of nodes for compatibility
+
+        // Distribute 16 nodes around rectangle perimeter starting from pure right (like desktop)
+        // N0 starts at right side, then clockwise: N1=bottom-right, N2=bottom, N3=bottom-left, etc.
+        const perimeter = 2 * (width + height);
+        const nodeSpacing = perimeter / nodesPerRing;
+
+        for (let i = 0; i < nodesPerRing; i++) {
+            const distanceAlongPerimeter = i * nodeSpacing;
+            let x, y;
+
+            if (distanceAlongPerimeter <= height) {
+                // Right side (top to bottom) - N0 starts here
+                x = centerX + width/2;
+                y = centerY - height/2 + distanceAlongPerimeter;
+            } else if (distanceAlongPerimeter <= height + width) {
+                // Bottom side (right to left)
+                x = centerX + width/2 - (distanceAlongPerimeter - height);
+                y = centerY + height/2;
+            } else if (distanceAlongPerimeter <= height + width + height) {
+                // Left side (bottom to top)
+                x = centerX - width/2;
+                y = centerY + height/2 - (distanceAlongPerimeter - height - width);
+            } else {
+                // Top side (left to right)
+                x = centerX - width/2 + (distanceAlongPerimeter - height - width - height);
+                y = centerY - height/2;
+            }
+
+            const id = `R${ringIndex}N${i}`;
+            this.createNode(x, y, id, `ring${ringIndex}`, nodeSize);
+        }
+    }
+
+    createStrands(scaleFactor, maxRadius) {
+        // Create concentric ring strands using SVG for perfect alignment
+        this.createRingStrands(scaleFactor, maxRadius);
+
+        // Create connecting strands through specific nodes
+        this.createNodeConnections(scaleFactor);
+    }
+
+    createRingStrands(scaleFactor, maxRadius) {
+        // Create SVG for ring strands
+        const svg = document.createElementNS('http://www.w3.org/2000/svg', 'svg');
+        svg.setAttribute('width', this.board.offsetWidth);
+        svg.setAttribute('height', this.board.offsetHeight);
+        svg.style.position = 'absolute';
+        svg.style.top = '0';
+        svg.style.left = '0';
+        svg.style.zIndex = '4'; // Behind the connecting strands
+        this.board.appendChild(svg);
+
+        // Draw concentric rings using the same radii as nodes
+        const ringRadii = GAME_CONFIG.board_scaling.ring_radius_ratios.map(ratio => 
+            maxRadius * ratio
+        );
+
+        ringRadii.forEach((radius, index) => {
+            const circle = document.createElementNS('http://www.w3.org/2000/svg', 'circle');
+            circle.setAttribute('cx', this.centerX);
+            circle.setAttribute('cy', this.centerY);
+            circle.setAttribute('r', radius);
+            circle.setAttribute('fill', 'none');
+            circle.setAttribute('stroke', '#333');
+            circle.setAttribute('stroke-width', Math.max(1, Math.min(3, 2 * scaleFactor)));
+            circle.setAttribute('opacity', '0.8');
+            svg.appendChild(circle);
+        });
+    }
+
+    createNodeConnections(scaleFactor) {
+        // Create SVG for curved strands
+        const svg = document.createElementNS('http://www.w3.org/2000/svg', 'svg');
+        svg.setAttribute('width', this.board.offsetWidth);
+        svg.setAttribute('height', this.board.offsetHeight);
+        svg.style.position = 'absolute';
+        svg.style.top = '0';
+        svg.style.left = '0';
+        svg.style.zIndex = '5';
+        this.board.appendChild(svg);
+
+        // Create strands using shared configuration with scaled stroke width
+        GAME_CONFIG.strand_definitions.forEach(strandDef => {
+            this.createCurvedStrand(svg, strandDef.nodes, strandDef.direction, scaleFactor);
+        });
+    }
+
+    createCurvedStrand(svg, nodeIds, direction, scaleFactor) {
+        const nodes = nodeIds.map(id => this.nodes.find(n => n.id === id)).filter(n => n);
+
+        if (nodes.length < 2) return;
+
+        // Create path through node centers
+        let pathData = '';
+
+        nodes.forEach((node, index) => {
+            const x = node.x;
+            const y = node.y;
+
+            if (index === 0) {
+                pathData += `M ${x} ${y}`;
+            } else {
+                // Use straight lines for perfect alignment
+                pathData += ` L ${x} ${y}`;
+            }
+        });
+
+        const path = document.createElementNS('http://www.w3.org/2000/svg', 'path');
+        path.setAttribute('d', pathData);
+        path.setAttribute('stroke', '#333');
+        path.setAttribute('stroke-width', Math.max(1, Math.min(3, 2 * scaleFactor)) + 'px'); // Apply scaled stroke width
+        path.setAttribute('fill', 'none');
+        path.setAttribute('stroke-linecap', 'round');
+        path.setAttribute('stroke-linejoin', 'round');
+
+        svg.appendChild(path);
+    }
+
+    createRectangularStrands(scaleFactor) {
+        // Create rectangular ring strands
+        this.createRectangularRingStrands(scaleFactor);
+
+        // Create connecting strands between rectangular rings and center
+        this.createRectangularNodeConnections(scaleFactor);
+    }
+
+    createRectangularRingStrands(scaleFactor) {
+        // Create SVG for rectangular ring strands
+        const svg = document.createElementNS('http://www.w3.org/2000/svg', 'svg');
+        svg.setAttribute('width', this.board.offsetWidth);
+        svg.setAttribute('height', this.board.offsetHeight);
+        svg.style.position = 'absolute';
+        svg.style.top = '0';
+        svg.style.left = '0';
+        svg.style.zIndex = '4'; // Behind the connecting strands
+        this.board.appendChild(svg);
+
+        // Calculate margins for rectangular rings (same as mobile board)
+        const boardWidth = this.board.offsetWidth;
+        const boardHeight = this.board.offsetHeight;
+        const topMargin = 100 * scaleFactor;
+        const sideMargin = 80 * scaleFactor;
+        const bottomMargin = 60 * scaleFactor;
+
+        const usableWidth = boardWidth - (2 * sideMargin);
+        const usableHeight = boardHeight - topMargin - bottomMargin;
+
+        // Adjust center position to match mobile board positioning
+        const adjustedCenterX = this.centerX;
+        const adjustedCenterY = this.centerY + (topMargin - bottomMargin) / 2;
+
+        // Draw 3 rectangular rings
+        const rectangularRings = [
+            { width: usableWidth * 0.4, height: usableHeight * 0.4 },
+            { width: usableWidth * 0.7, height: usableHeight * 0.7 },
+            { width: usableWidth * 0.95, height: usableHeight * 0.95 }
+        ];
+
+        rectangularRings.forEach((rect, index) => {
+            const rectangle = document.createElementNS('http://www.w3.org/2000/svg', 'rect');
+            rectangle.setAttribute('x', adjustedCenterX - rect.width/2);
+            rectangle.setAttribute('y', adjustedCenterY - rect.height/2);
+            rectangle.setAttribute('width', rect.width);
+            rectangle.setAttribute('height', rect.height);
+            rectangle.setAttribute('fill', 'none');
+            rectangle.setAttribute('stroke', '#333');
+            rectangle.setAttribute('stroke-width', Math.max(1, Math.min(3, 2 * scaleFactor)));
+            rectangle.setAttribute('opacity', '0.8');
+            svg.appendChild(rectangle);
+        });
+    }
+
+    createRectangularNodeConnections(scaleFactor) {
+        // Create SVG for connecting strands between rectangular rings and center
+        const svg = document.createElementNS('http://www.w3.org/2000/svg', 'svg');
+        svg.setAttribute('width', this.board.offsetWidth);
+        svg.setAttribute('height', this.board.offsetHeight);
+        svg.style.position = 'absolute';
+        svg.style.top = '0';
+        svg.style.left = '0';
+        svg.style.zIndex = '5';
+        this.board.appendChild(svg);
+
+        // Create equivalent connections for rectangular layout
+        // These need to map to the same node IDs as the circular layout for game compatibility
+        GAME_CONFIG.strand_definitions.forEach(strandDef => {
+            this.createRectangularStrand(svg, strandDef.nodes, strandDef.direction, scaleFactor);
+        });
+    }
+
+    createRectangularStrand(svg, nodeIds, direction, scaleFactor) {
+        const nodes = nodeIds.map(id => this.nodes.find(n => n.id === id)).filter(n => n);
+
+        if (nodes.length < 2) return;
+
+        // Create path through node centers (same as circular version)
+        let pathData = '';
+
+        nodes.forEach((node, index) => {
+            const x = node.x;
+            const y = node.y;
+
+            if (index === 0) {
+                pathData += `M ${x} ${y}`;
+            } else {
+                // Use straight lines for connection
+                pathData += ` L ${x} ${y}`;
+            }
+        });
+
+        const path = document.createElementNS('http://www.w3.org/2000/svg', 'path');
+        path.setAttribute('d', pathData);
+        path.setAttribute('stroke', '#333');
+        path.setAttribute('stroke-width', Math.max(1, Math.min(3, 2 * scaleFactor)) + 'px');
+        path.setAttribute('fill', 'none');
+        path.setAttribute('stroke-linecap', 'round');
+        path.setAttribute('stroke-linejoin', 'round');
+
+        svg.appendChild(path);
+    }
+
+    createResurrectionZoneOverlays() {
+        // Create SVG overlay for resurrection zones
+        const svg = document.createElementNS('http://www.w3.org/2000/svg', 'svg');
+        svg.setAttribute('width', this.board.offsetWidth);
+        svg.setAttribute('height', this.board.offsetHeight);
+        svg.style.position = 'absolute';
+        svg.style.top = '0';
+        svg.style.left = '0';
+        svg.style.zIndex = '3'; // Above rings but below connecting strands
+        svg.style.pointerEvents = 'none'; // Allow clicks to pass through to nodes
+        this.board.appendChild(svg);
+
+        // Draw resurrection zone overlays
+        this.drawResurrectionZoneTrapezoid(svg, 'red', '#e3f2fd', 0.6, true);
+        this.drawResurrectionZoneTrapezoid(svg, 'blue', '#ffebee', 0.3, false);
+    }
+
+    drawResurrectionZoneTrapezoid(svg, zoneType, color, opacity, mirrorHorizontally = false) {
+        const zoneNodes = GAME_CONFIG?.resurrection_zones?.[zoneType];
+        if (!zoneNodes || zoneNodes.length === 0) return;
+
+        // Find all nodes in this resurrection zone
+        const zonePositions = zoneNodes.map(nodeId => {
+            const node = this.nodes.find(n => n.id === nodeId);
+            return node ? { x: node.x, y: node.y } : null;
+        }).filter(pos => pos !== null);
+
+        if (zonePositions.length === 0) return;
+
+        // Calculate bounding box for the zone
+        const minX = Math.min(...zonePositions.map(p => p.x));
+        const maxX = Math.max(...zonePositions.map(p => p.x));
+        const minY = Math.min(...zonePositions.map(p => p.y));
+        const maxY = Math.max(...zonePositions.map(p => p.y));
+
+        // Calculate trapezoid points with padding
+        const padding = 20;
+        const topWidth = maxX - minX + (padding * 2);
+        const bottomWidth = topWidth * 0.6; // Make it more trapezoid-shaped
+        const height = maxY - minY + (padding * 2);
+
+        // Center the trapezoid
+        const centerX = (minX + maxX) / 2;
+        const centerY = (minY + maxY) / 2;
+
+        // Calculate trapezoid points
+        let topLeft, topRight, bottomLeft, bottomRight, topY, bottomY;
+
+        if (mirrorHorizontally) {
+            // Mirror horizontally: swap top and bottom widths
+            topLeft = centerX - bottomWidth / 2;
+            topRight = centerX + bottomWidth / 2;
+            bottomLeft = centerX - topWidth / 2;
+            bottomRight = centerX + topWidth / 2;
+        } else {
+            // Normal trapezoid (wider at top)
+            topLeft = centerX - topWidth / 2;
+            topRight = centerX + topWidth / 2;
+            bottomLeft = centerX - bottomWidth / 2;
+            bottomRight = centerX + bottomWidth / 2;
+        }
+
+        topY = centerY - height / 2;
+        bottomY = centerY + height / 2;
+
+        // Create trapezoid path with rounded corners
+        const cornerRadius = 8;
+        const pathData = `M ${topLeft + cornerRadius} ${topY} 
+                         L ${topRight - cornerRadius} ${topY} 
+                         Q ${topRight} ${topY} ${topRight} ${topY + cornerRadius}
+                         L ${bottomRight} ${bottomY - cornerRadius}
+                         Q ${bottomRight} ${bottomY} ${bottomRight - cornerRadius} ${bottomY}
+                         L ${bottomLeft + cornerRadius} ${bottomY}
+                         Q ${bottomLeft} ${bottomY} ${bottomLeft} ${bottomY - cornerRadius}
+                         L ${topLeft} ${topY + cornerRadius}
+                         Q ${topLeft} ${topY} ${topLeft + cornerRadius} ${topY} Z`;
+
+        const path = document.createElementNS('http://www.w3.org/2000/svg', 'path');
+        path.setAttribute('d', pathData);
+        path.setAttribute('fill', color);
+        path.setAttribute('opacity', opacity);
+        path.setAttribute('stroke', color);
+        path.setAttribute('stroke-width', '2');
+        path.setAttribute('stroke-opacity', opacity * 0.8);
+        path.setAttribute('stroke-linejoin', 'round');
+
+        svg.appendChild(path);
+    }
+
+    handleNodeClick(event) {
+        const node = event.target;
+        const nodeId = node.getAttribute('data-id');
+
+        // Only allow moves if player is a player (not spectator) and it's their turn
+        if (playerRole !== 'player') {
+            document.getElementById('status-text').textContent = 'Spectators cannot make moves';
+            return;
+        }
+
+        // Check if this is a controlled weaponmaster move
+        if (this.controlledWeaponmasterMode && this.selectedNode && this.selectedNode.getAttribute('data-id') === this.controlledPieceNode) {
+            if ((node.classList.contains('first-move') || node.classList.contains('second-move'))) {
+                this.handleControlledWeaponmasterMove(nodeId);
+                return;
+            }
+        }
+
+        // Check if this is a legal move for a previously selected piece
+        if (this.selectedNode && node.classList.contains('legal-move')) {
+            const selectedNodeId = this.selectedNode.getAttribute('data-id');
+
+            // Check if this is a controlled piece move (non-weaponmaster)
+            if (this.controlledPieceNode === selectedNodeId && !this.controlledWeaponmasterMode) {
+                // Check if this node has a stored move path (for complex moves like weaponmaster)
+                const movePath = node.getAttribute('data-move-path');
+                if (movePath) {
+                    console.log('🕷️ Executing controlled complex move with path:', movePath);
+                    this.moveControlledPiece(selectedNodeId, movePath);
+                } else {
+                    console.log('🕷️ Executing controlled simple move:', selectedNodeId, '->', nodeId);
+                    this.moveControlledPiece(selectedNodeId, nodeId);
+                }
+            } else {
+                // Regular piece move
+                this.executeMove(selectedNodeId, nodeId, playerId);
+            }
+            return;
+        }
+
+        // Check if this is a weaponmaster move
+        if (this.selectedNode && this.weaponmasterMode && (node.classList.contains('first-move') || node.classList.contains('second-move'))) {
+            this.handleWeaponmasterMove(nodeId);
+            return;
+        }
+
+        // Check if this is a wizard move
+        if (this.selectedNode && this.wizardMode && node.classList.contains('wizard-move-3')) {
+            this.handleWizardMove(nodeId);
+            return;
+        }
+
+        // Check if this is a sacrifice move
+        if (this.sacrificeMode && node.classList.contains('sacrifice-candidate')) {
+            // Double-check that this is the correct player who should sacrifice
+            const currentPlayer = lobbyState?.players?.find(p => p.id === playerId);
+            const sacrificePlayer = lobbyState?.game_state?.sacrifice_player;
+            if (currentPlayer && currentPlayer.color === sacrificePlayer) {
+                this.sacrificePiece(nodeId);
+            } else {
+                console.log('🔪 Not the sacrifice player, ignoring sacrifice attempt');
+                document.getElementById('status-text').textContent = 'Only the player who rolled double knives can sacrifice';
+            }
+            return;
+        }
+
+        // Check if this is a spider control move (selecting enemy piece to control)
+        if (this.spiderControlMode && !this.controlledPieceNode && node.classList.contains('spider-control-candidate')) {
+            this.controlEnemyPiece(nodeId);
+            return;
+        }
+
+        // Clear previous legal move indicators
+        this.clearLegalMoveIndicators();
+
+        // Remove previous selection
+        if (this.selectedNode) {
+            this.selectedNode.classList.remove('selected');
+        }
+
+        // Reset weaponmaster state when selecting a new piece
+        if (this.selectedNode && this.selectedNode !== node) {
+            this.weaponmasterMode = false;
+            this.firstNode = null;
+            this.weaponmasterMoves = [];
+
+            // Reset wizard state when selecting a new piece
+            this.wizardMode = false;
+            this.wizardMoves = [];
+        }
+
+        // Check if the clicked node has a piece and if it belongs to the current player
+        const boardState = lobbyState?.game_state?.board || {};
+        const pieceName = boardState[nodeId];
+
+        console.log('Board state:', boardState);
+        console.log('Piece at node:', pieceName);
+
+        if (pieceName) {
+            // Check if this piece belongs to the current player
+            const currentTurn = lobbyState?.game_state?.current_turn;
+
+            // Safety check: ensure we have a valid current turn
+            if (!currentTurn) {
+                console.error('No current turn found in lobby state');
+                document.getElementById('status-text').textContent = 'Game state error: no current turn found';
+                return;
+            }
+
+            // Find the current player's color from the lobby state
+            const currentPlayer = lobbyState?.players?.find(p => p.id === playerId);
+            if (!currentPlayer) {
+                console.error('Current player not found in lobby state');
+                document.getElementById('status-text').textContent = 'Game state error: player not found';
+                return;
+            }
+
+            const playerColor = currentPlayer.color;
+
+            // Check if it's the player's turn OR if we're in spider control mode and it's our spider control
+            const isMyTurn = currentTurn === playerColor;
+            const spiderControlMode = lobbyState?.game_state?.spider_control_mode || false;
+            const spiderControlPlayer = lobbyState?.game_state?.spider_control_player;
+            const isMySpiderControl = spiderControlMode && spiderControlPlayer === playerColor;
+
+            // Don't allow moves if it's not our turn and we're not in spider control
+            if (!isMyTurn && !isMySpiderControl) {
+                document.getElementById('status-text').textContent = `It's ${currentTurn}'s turn. Wait for your turn.`;
+                return;
+            }
+
+            // Check if this piece belongs to the current player (not the current turn)
+            // Piece names can be: "red_matron mother", "red_orc_0", "blue_wizard", etc.
+            const isFriendlyPiece = pieceName.startsWith(playerColor + '_') || pieceName.startsWith(playerColor + ' ');
+
+            // Check if this is a controlled piece (can select enemy pieces when controlled)
+            const isControlledPiece = this.controlledPieceNode === nodeId;
+
+            if (isFriendlyPiece || isControlledPiece) {
+                // This is the player's piece or a controlled enemy piece - select it and show legal moves
+                console.log('Selecting piece (friendly or controlled), getting legal moves');
+                node.classList.add('selected');
+                this.selectedNode = node;
+
+                // Check if this is a weaponmaster piece
+                if (pieceName.includes('weaponmaster')) {
+                    this.weaponmasterMode = true;
+                    document.getElementById('status-text').textContent = 
+                        `Weaponmaster selected. Click a light green node to start your move, then a dark green node to complete it.`;
+                    console.log('Weaponmaster piece selected:', pieceName);
+                }
+
+                // Check if this is a wizard piece
+                if (pieceName.includes('wizard')) {
+                    this.wizardMode = true;
+                    document.getElementById('status-text').textContent = 
+                        `Wizard selected. Click any highlighted node to move there (all moves are exactly 3 nodes away).`;
+                    console.log('Wizard piece selected:', pieceName);
+                }
+
+                // Use appropriate method to get legal moves
+                if (isControlledPiece) {
+                    this.getLegalMovesForControlledPiece(nodeId);
+                } else {
+                    this.getLegalMoves(nodeId);
+                }
+            } else {
+                // This is an enemy piece - don't select it (unless it's spider control mode)
+                console.log('Enemy piece clicked, not selecting');
+                document.getElementById('status-text').textContent = 
+                    `Cannot select enemy piece. You can only select your own pieces.`;
+                return;
+            }
+        } else {
+            // Empty node - just select it (though this might not be useful)
+            console.log('Empty node clicked');
+            node.classList.add('selected');
+            this.selectedNode = node;
+            document.getElementById('status-text').textContent = 
+                `Selected empty node ${nodeId}`;
+        }
+    }
+
+    async executeMove(fromNode, toNode, playerId) {
+        try {
+            const lobbyId = document.getElementById('lobby-id').textContent;
+            console.log('Executing move:', { fromNode, toNode, playerId });
+
+            const response = await fetch(`/api/lobby/${lobbyId}/move?fields=game_state`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    from_node: fromNode,
+                    to_node: toNode,
+                    player_id: playerId
+                })
+            });
+
+            const data = await response.json();
+            console.log('Move response:', data);
+
+            if (data.success) {
+                // Update the board with the new state
+                this.updateBoardWithPieces(data.game_state.board);
+
+                // Clear selection and legal moves
+                this.clearLegalMoveIndicators();
+                if (this.selectedNode) {
+                    this.selectedNode.classList.remove('selected');
+                    this.selectedNode = null;
+                }
+
+                // Reset weaponmaster state if this was a weaponmaster move
+                if (this.weaponmasterMode) {
+                    this.weaponmasterMode = false;
+                    this.firstNode = null;
+                    this.weaponmasterMoves = [];
+                }
+
+                // Always hide weaponmaster controls after any successful move
+                document.getElementById('weaponmaster-controls').style.display = 'none';
+
+                // Reset wizard state if this was a wizard move
+                if (this.wizardMode) {
+                    this.wizardMode = false;
+                    this.wizardMoves = [];
+                }
+
+                // Update status
+                const moveInfo = data.game_state.last_move;
+                if (moveInfo) {
+                    let statusText = `${moveInfo.player.charAt(0).toUpperCase() + moveInfo.player.slice(1)} moved ${moveInfo.piece} from ${moveInfo.from} to ${moveInfo.to}`;
+                    if (moveInfo.captured) {
+                        if (Array.isArray(moveInfo.captured) && moveInfo.captured.length > 0) {
+                            if (moveInfo.captured.length === 1) {
+                                statusText += ` (captured ${moveInfo.captured[0]})`;
+                            } else {
+                                statusText += ` (captured ${moveInfo.captured.join(', ')})`;
+                            }
+                        } else if (moveInfo.captured) {
+                            // Handle single capture for backward compatibility
+                            statusText += ` (captured ${moveInfo.captured})`;
+                        }
+                    }
+                    const currentTurn = data.game_state.current_turn;
+                    statusText += `. ${currentTurn.charAt(0).toUpperCase() + currentTurn.slice(1)}'s turn.`;
+
+                    document.getElementById('status-text').innerHTML = statusText;
+                } else {
+                    // Fallback status update
+                    const currentTurn = data.game_state.current_turn;
+                    document.getElementById('status-text').innerHTML = 
+                        `Move completed. ${currentTurn.charAt(0).toUpperCase() + currentTurn.slice(1)}'s turn.`;
+                }
+
+                // Update local lobby state to match server
+                if (data.lobby_info) {
+                    // Use the full lobby info from the API response
+                    lobbyState = data.lobby_info;
+                } else {
+                    // Fallback: update just the game state if lobby_info not available
+                    if (lobbyState) {
+                        lobbyState.game_state = data.game_state;
+                    } else {
+                        console.warn('lobbyState not initialized, creating minimal structure');
+                        lobbyState = {
+                            game_state: data.game_state,
+                            players: [],
+                            spectators: []
+                        };
+                    }
+                }
+
+                // Force update of captured pieces display
+                updateCapturedPieces();
+            } else {
+                document.getElementById('status-text').innerHTML = '<strong>Move failed:</strong> ' + (data.error || 'Unknown error');
+            }
+        } catch (error) {
+            console.error('Failed to execute move:', error);
+            document.getElementById('status-text').innerHTML = '<strong>Failed to execute move.</strong> Please try again.';
+        }
+    }
+
+    async getLegalMoves(nodeId) {
+        try {
+            // Double-check: ensure this is a friendly piece before making the API call
+            const boardState = lobbyState?.game_state?.board || {};
+            const pieceName = boardState[nodeId];
+            const currentTurn = lobbyState?.game_state?.current_turn;
+
+            if (pieceName && currentTurn) {
+                // Find the current player's color
+                const currentPlayer = lobbyState?.players?.find(p => p.id === playerId);
+                if (currentPlayer) {
+                    const playerColor = currentPlayer.color;
+                    const isFriendlyPiece = pieceName.startsWith(playerColor + '_') || pieceName.startsWith(playerColor + ' ');
+                    if (!isFriendlyPiece) {
+                        console.error('getLegalMoves called for enemy piece! This should not happen.');
+                        document.getElementById('status-text').textContent = 'Error: Cannot get moves for enemy piece';
+                        return;
+                    }
+                }
+            }
+
+            const lobbyId = document.getElementById('lobby-id').textContent;
+            console.log('Making API call to:', `/api/lobby/${lobbyId}/legal-moves/${nodeId}`);
+            const response = await fetch(`/api/lobby/${lobbyId}/legal-moves/${nodeId}`);
+            const data = await response.json();
+
+            console.log('API response:', data);
+
+            if (data.error) {
+                document.getElementById('status-text').textContent = 'Error getting legal moves: ' + data.error;
+                return;
+            }
+
+            if (data.legal_moves.length > 0) {
+                if (this.weaponmasterMode) {
+                    // Store weaponmaster moves for parsing
+                    this.weaponmasterMoves = data.legal_moves;
+                    this.highlightWeaponmasterMoves(data.legal_moves);
+                    document.getElementById('status-text').textContent = 
+                        `Weaponmaster moves available. Click a light green node to start your move.`;
+                } else if (this.wizardMode) {
+                    // Store wizard moves for parsing
+                    this.wizardMoves = data.legal_moves;
+                    this.highlightWizardMoves(data.legal_moves);
+                    document.getElementById('status-text').textContent = 
+                        `Wizard moves available. Click any highlighted node to move there.`;
+                } else {
+                    this.highlightLegalMoves(data.legal_moves);
+                    document.getElementById('status-text').textContent = 
+                        `Legal moves for ${nodeId}: ${data.legal_moves.join(', ')}`;
+                }
+            } else {
+                document.getElementById('status-text').textContent = 
+                    `No legal moves for ${nodeId}`;
+            }
+        } catch (error) {
+            console.error('Failed to get legal moves:', error);
+            document.getElementById('status-text').textContent = 'Failed to get legal moves';
+        }
+    }
+
+    highlightLegalMoves(legalMoves) {
+        legalMoves.forEach(nodeId => {
+            const node = this.nodes.find(n => n.id === nodeId);
+            if (node) {
+                node.element.classList.add('legal-move');
+            }
+        });
+    }
+
+    highlightControlledPieceMoves(legalMoves) {
+        console.log('🕷️ Highlighting controlled piece moves:', legalMoves);
+
+        // Check if the controlled piece is a weaponmaster
+        const boardState = lobbyState?.game_state?.board || {};
+        const controlledPieceName = boardState[this.controlledPieceNode];
+        const isWeaponmaster = controlledPieceName && controlledPieceName.includes('weaponmaster');
+
+        if (isWeaponmaster && legalMoves.some(move => move.includes('->'))) {
+            // Use weaponmaster-style highlighting for path selection
+            this.controlledWeaponmasterMode = true;
+            this.controlledWeaponmasterMoves = legalMoves;
+            this.highlightWeaponmasterMoves(legalMoves);
+            document.getElementById('status-text').textContent = 
+                '🕷️ Controlled weaponmaster selected. Click a light green node to start your move, then a dark green node to complete it.';
+        } else {
+            // Use simple highlighting for non-weaponmaster pieces
+            this.controlledWeaponmasterMode = false;
+            legalMoves.forEach(move => {
+                if (move.includes('->')) {
+                    // Complex move (non-weaponmaster) - highlight the final destination
+                    const nodes = move.split('->');
+                    const finalDestination = nodes[nodes.length - 1]; // Last node in the path
+
+                    const node = this.nodes.find(n => n.id === finalDestination);
+                    if (node) {
+                        node.element.classList.add('legal-move');
+                        // Store the full move path on the node for later use
+                        node.element.setAttribute('data-move-path', move);
+                    } else {
+                        console.warn('🕷️ Node not found for complex move destination:', finalDestination);
+                    }
+                } else {
+                    // Simple move - highlight directly
+                    const node = this.nodes.find(n => n.id === move);
+                    if (node) {
+                        node.element.classList.add('legal-move');
+                    } else {
+                        console.warn('🕷️ Node not found for simple move:', move);
+                    }
+                }
+            });
+        }
+    }
+
+    highlightWeaponmasterMoves(legalMoves) {
+        // Parse weaponmaster moves to extract first and second nodes
+        const firstNodes = new Set();
+        const secondNodes = new Set();
+
+        legalMoves.forEach(move => {
+            if (move.includes('->')) {
+                const [firstNode, secondNode] = move.split('->');
+                firstNodes.add(firstNode);
+                secondNodes.add(secondNode);
+            }
+        });
+
+        // Highlight first nodes in light green
+        firstNodes.forEach(nodeId => {
+            const node = this.nodes.find(n => n.id === nodeId);
+            if (node) {
+                node.element.classList.add('first-move');
+            }
+        });
+
+        // Highlight second nodes in dark green
+        secondNodes.forEach(nodeId => {
+            const node = this.nodes.find(n => n.id === nodeId);
+            if (node) {
+                node.element.classList.add('second-move');
+            }
+        });
+
+        console.log('Weaponmaster moves highlighted:', { firstNodes: Array.from(firstNodes), secondNodes: Array.from(secondNodes) });
+    }
+
+    highlightWizardMoves(legalMoves) {
+        // Parse wizard moves - all moves should be three-node paths
+        const threeNodeMoves = new Set();
+
+        legalMoves.forEach(move => {
+            if (move.includes('->')) {
+                const nodes = move.split('->');
+                if (nodes.length === 3) {
+                    // Three-node path: highlight the final destination
+                    threeNodeMoves.add(nodes[2]);
+                }
+            }
+        });
+
+        // Highlight three-node final destinations in dark blue
+        threeNodeMoves.forEach(nodeId => {
+            const node = this.nodes.find(n => n.id === nodeId);
+            if (node) {
+                node.element.classList.add('wizard-move-3');
+            }
+        });
+
+        console.log('Wizard moves highlighted:', { 
+            threeNodes: Array.from(threeNodeMoves) 
+        });
+    }
+
+    handleWeaponmasterMove(nodeId) {
+        if (!this.firstNode) {
+            // First node selection
+            if (this.nodes.find(n => n.id === nodeId)?.element.classList.contains('first-move')) {
+                this.firstNode = nodeId;
+
+                // Highlight the selected first node
+                const firstNodeElement = this.nodes.find(n => n.id === nodeId)?.element;
+                if (firstNodeElement) {
+                    firstNodeElement.classList.remove('first-move');
+                    firstNodeElement.classList.add('selected');
+                }
+
+                // Clear first move indicators and show only valid second moves
+                this.clearLegalMoveIndicators();
+                this.showValidSecondMoves(nodeId);
+
+                // Show weaponmaster controls
+                document.getElementById('weaponmaster-controls').style.display = 'block';
+
+                document.getElementById('status-text').textContent = 
+                    `First node selected: ${nodeId}. Now click a dark green node to complete your move.`;
+
+                console.log('First node selected:', nodeId);
+            } else {
+                document.getElementById('status-text').textContent = 
+                    `Please click a light green node first to start your weaponmaster move.`;
+            }
+        } else {
+            // Second node selection
+            if (this.nodes.find(n => n.id === nodeId)?.element.classList.contains('second-move')) {
+                // Execute the complete weaponmaster move
+                const movePath = `${this.firstNode}->${nodeId}`;
+                console.log('Executing weaponmaster move:', movePath);
+
+                // Reset weaponmaster state
+                this.weaponmasterMode = false;
+                this.firstNode = null;
+                this.weaponmasterMoves = [];
+
+                // Execute the move
+                this.executeMove(this.selectedNode.getAttribute('data-id'), movePath, playerId);
+            } else {
+                document.getElementById('status-text').textContent = 
+                    `Please click a dark green node to complete your weaponmaster move.`;
+            }
+        }
+    }
+
+    handleControlledWeaponmasterMove(nodeId) {
+        if (!this.controlledFirstNode) {
+            // First node selection for controlled weaponmaster
+            if (this.nodes.find(n => n.id === nodeId)?.element.classList.contains('first-move')) {
+                this.controlledFirstNode = nodeId;
+
+                // Highlight the selected first node
+                const firstNodeElement = this.nodes.find(n => n.id === nodeId)?.element;
+                if (firstNodeElement) {
+                    firstNodeElement.classList.remove('first-move');
+                    firstNodeElement.classList.add('selected');
+                }
+
+                // Clear first move indicators and show only valid second moves for controlled piece
+                this.clearLegalMoveIndicators();
+                this.showValidSecondMovesForControlled(nodeId);
+
+                document.getElementById('status-text').textContent = 
+                    `🕷️ Controlled weaponmaster first node selected: ${nodeId}. Now click a dark green node to complete the move.`;
+
+                console.log('🕷️ Controlled weaponmaster first node selected:', nodeId);
+            } else {
+                document.getElementById('status-text').textContent = 
+                    `🕷️ Please click a light green node first to start your controlled weaponmaster move.`;
+            }
+        } else {
+            // Second node selection for controlled weaponmaster
+            if (this.nodes.find(n => n.id === nodeId)?.element.classList.contains('second-move')) {
+                // Execute the complete controlled weaponmaster move
+                const movePath = `${this.controlledFirstNode}->${nodeId}`;
+                console.log('🕷️ Executing controlled weaponmaster move:', movePath);
+
+                // Reset controlled weaponmaster state
+                this.controlledWeaponmasterMode = false;
+                this.controlledFirstNode = null;
+                this.controlledWeaponmasterMoves = [];
+
+                // Execute the controlled move
+                this.moveControlledPiece(this.controlledPieceNode, movePath);
+            } else {
+                document.getElementById('status-text').textContent = 
+                    `🕷️ Please click a dark green node to complete your controlled weaponmaster move.`;
+            }
+        }
+    }
+
+    showValidSecondMoves(firstNodeId) {
+        // Find all valid second nodes for the selected first node
+        const validSecondNodes = new Set();
+
+        this.weaponmasterMoves.forEach(move => {
+            if (move.includes('->')) {
+                const [firstNode, secondNode] = move.split('->');
+                if (firstNode === firstNodeId) {
+                    validSecondNodes.add(secondNode);
+                }
+            }
+        });
+
+        // Highlight valid second nodes in dark green
+        validSecondNodes.forEach(nodeId => {
+            const node = this.nodes.find(n => n.id === nodeId);
+            if (node) {
+                node.element.classList.add('second-move');
+            }
+        });
+
+        console.log('Valid second moves shown for', firstNodeId, ':', Array.from(validSecondNodes));
+    }
+
+    showValidSecondMovesForControlled(firstNodeId) {
+        // Find all valid second nodes for the selected first node in controlled weaponmaster moves
+        const validSecondNodes = new Set();
+
+        this.controlledWeaponmasterMoves.forEach(move => {
+            if (move.includes('->')) {
+                const [firstNode, secondNode] = move.split('->');
+                if (firstNode === firstNodeId) {
+                    validSecondNodes.add(secondNode);
+                }
+            }
+        });
+
+        // Highlight valid second nodes
+        validSecondNodes.forEach(nodeId => {
+            const node = this.nodes.find(n => n.id === nodeId);
+            if (node) {
+                node.element.classList.add('second-move');
+            }
+        });
+    }
+
+    cancelWeaponmasterMove() {
+        // Reset weaponmaster state
+        this.weaponmasterMode = false;
+        this.firstNode = null;
+        this.weaponmasterMoves = [];
+
+        // Clear all indicators
+        this.clearLegalMoveIndicators();
+
+        // Hide controls
+        document.getElementById('weaponmaster-controls').style.display = 'none';
+
+        // Update status
+        document.getElementById('status-text').textContent = 'Weaponmaster move cancelled.';
+
+        console.log('Weaponmaster move cancelled');
+    }
+
+    handleWizardMove(nodeId) {
+        // Find the three-node path to reach this destination
+        let movePath = null;
+
+        // Check if this is a three-node move
+        this.wizardMoves.forEach(move => {
+            if (move.includes('->')) {
+                const nodes = move.split('->');
+                if (nodes.length === 3 && nodes[2] === nodeId) {
+                    // Three-node path
+                    movePath = move;
+                }
+            }
+        });
+
+        if (!movePath) {
+            console.error('No valid three-node path found for wizard move');
+            document.getElementById('status-text').textContent = 'Invalid wizard move path';
+            return;
+        }
+
+        console.log('Executing wizard move:', movePath);
+
+        // Reset wizard state
+        this.wizardMode = false;
+        this.wizardMoves = [];
+
+        // Execute the move
+        this.executeMove(this.selectedNode.getAttribute('data-id'), movePath, playerId);
+    }
+
+    clearLegalMoveIndicators() {
+        this.nodes.forEach(node => {
+            node.element.classList.remove('legal-move');
+            node.element.classList.remove('first-move');
+            node.element.classList.remove('second-move');
+            node.element.classList.remove('wizard-move-3');
+            // Clear stored move paths for controlled pieces
+            node.element.removeAttribute('data-move-path');
+        });
+    }
+
+    updateBoardWithPieces(boardState) {                
+        if (!boardState || Object.keys(boardState).length === 0) {
+            console.log('🎯 No board state to update');
+            return;
+        }
+
+        if (!this.nodes || this.nodes.length === 0) {
+            console.error('🎯 No nodes available for piece placement');
+            return;
+        }
+
+        // Clear all existing pieces
+        this.nodes.forEach(node => {
+            // Only show node ID if in development mode
+            if (GAME_CONFIG?.development?.enabled) {
+                node.element.textContent = node.id;
+            } else {
+                node.element.textContent = '';
+            }
+            node.element.style.background = '#fff';
+            node.element.style.borderColor = '#333';
+            node.element.classList.remove('enemy-piece');
+        });
+
+        // Place pieces according to board state
+        for (const [nodeId, pieceName] of Object.entries(boardState)) {
+            const node = this.nodes.find(n => n.id === nodeId);
+            if (node) {
+                // Get the piece symbol based on piece name
+                const pieceSymbol = this.getPieceSymbol(pieceName);
+                if (pieceSymbol) {
+                    node.element.textContent = pieceSymbol;
+
+                    // Color the node based on piece color
+                    const isRed = pieceName.startsWith('red_');
+
+                    // Default to red styling if currentTurn is not set yet
+                    if (isRed) {
+                        node.element.style.background = '#ffebee';
+                        node.element.style.color = '#c62828';
+                        node.element.style.borderColor = '#ef5350';
+                    } else {
+                        node.element.style.background = '#e3f2fd';
+                        node.element.style.color = '#1565c0';
+                        node.element.style.borderColor = '#42a5f5';
+                    }
+
+                    // Add enemy-piece class if we have a current turn and this is an enemy piece
+                    const currentTurn = lobbyState?.game_state?.current_turn;
+                    if (currentTurn) {
+                        const isEnemyPiece = pieceName.startsWith(currentTurn + '_') === false;
+                        if (isEnemyPiece) {
+                            node.element.classList.add('enemy-piece');
+                            node.element.style.opacity = '0.8';
+                        } else {
+                            node.element.style.opacity = '1';
+                        }
+                    } else {
+                        // No current turn set yet, default to normal opacity
+                        node.element.style.opacity = '1';
+                    }
+                } else {
+                    console.warn(`🎯 Could not get symbol for piece: ${pieceName}`);
+                }
+            } else {
+                console.warn(`🎯 Node not found for piece placement: ${nodeId}`);
+            }
+        }                
+        // Update spider dice button state after board update
+        updateSpiderDiceButtonState();
+
+        // Show check indicators if any player is in check
+        if (this.showCheckIndicators) {
+            this.showCheckIndicators();
+        }
+    }
+
+    getPieceSymbol(pieceName) {
+        return GameLogic.getPieceSymbol(pieceName);
+    }
+
+    restoreGameStateAfterResize() {
+        // This method is called after resize to ensure all game state is properly restored
+        if (!lobbyState?.game_state?.board) return;
+
+        // Update the board with current pieces
+        this.updateBoardWithPieces(lobbyState.game_state.board);
+
+        // Update captured pieces display
+        updateCapturedPieces();
+
+        // Update status text if game is over
+        if (lobbyState.game_state.game_over) {
+            const gameData = {
+                winner: lobbyState.game_state.winner,
+                game_end_reason: lobbyState.game_state.game_end_reason
+            };
+            handleGameOver(gameData);
+        }
+    }
+
+    handleSidebarToggle(isCollapsed) {
+        // This method handles sidebar toggle events to redraw the board elegantly
+        // console.log('🔄 Handling sidebar toggle, isCollapsed:', isCollapsed);
+
+        // Store current game state
+        const currentBoardState = lobbyState?.game_state?.board || {};
+        const currentSelection = this.selectedNode ? this.selectedNode.getAttribute('data-id') : null;
+        const currentWeaponmasterMode = this.weaponmasterMode;
+        const currentWizardMode = this.wizardMode;
+
+        // Force a complete board redraw with new dimensions
+        this.initializeBoard();
+
+        // Restore game state after redraw
+        if (Object.keys(currentBoardState).length > 0) {
+            this.updateBoardWithPieces(currentBoardState);
+
+            // Restore selection if there was one
+            if (currentSelection) {
+                const nodeToSelect = this.nodes.find(n => n.id === currentSelection);
+                if (nodeToSelect) {
+                    nodeToSelect.element.classList.add('selected');
+                    this.selectedNode = nodeToSelect.element;
+
+                    // Restore special move modes
+                    if (currentWeaponmasterMode) {
+                        this.weaponmasterMode = true;
+                        this.getLegalMoves(currentSelection);
+                    } else if (currentWizardMode) {
+                        this.wizardMode = true;
+                        this.getLegalMoves(currentSelection);
+                    } else {
+                        // Regular piece selection - get legal moves
+                        this.getLegalMoves(currentSelection);
+                    }
+                }
+            }
+
+            // Update captured pieces display
+            updateCapturedPieces();
+
+            // Update spider dice button state after sidebar toggle
+            updateSpiderDiceButtonState();
+        }
+    }
+
+    async rollSpiderDice() {
+        try {
+            console.log('🎲 Rolling spider dice...');                    
+            // Check if it's the current player's turn
+            const currentPlayer = lobbyState?.players?.find(p => p.id === playerId);
+            if (!currentPlayer) {
+                document.getElementById('status-text').textContent = 'Error: Player not found';
+                return;
+            }
+
+            const currentTurn = lobbyState?.game_state?.current_turn;
+            if (currentPlayer.color !== currentTurn) {
+                document.getElementById('status-text').textContent = 'Not your turn!';
+                return;
+            }
+
+            // Start rolling animation
+            const diceBtn = document.getElementById('spider-dice-btn');
+            diceBtn.disabled = true;
+            diceBtn.textContent = '🎲 Rolling...';
+            diceBtn.classList.add('rolling');
+
+            // Update button text to show rolling progress
+            let rollTime = 0;
+            const rollInterval = setInterval(() => {
+                rollTime += 0.5;
+                if (rollTime < 2) {
+                    diceBtn.textContent = `🎲 Rolling... ${rollTime.toFixed(1)}s`;
+                }
+            }, 500);
+
+            // Stop the rollInterval after 2 seconds
+            setTimeout(() => {
+                clearInterval(rollInterval);
+            }, 2000);
+
+            // Initialize audio and play dice rolling sound
+            initAudioContext();
+            playDiceRollSound();
+
+            // Show dice overlay with rolling animation
+            const diceResult = document.getElementById('dice-result');
+            const die1Element = document.getElementById('die1');
+            const die2Element = document.getElementById('die2');
+            const diceMessage = document.getElementById('dice-message');
+
+            // Set initial rolling state
+            diceMessage.textContent = '🎲 Rolling the dice...';
+            die1Element.textContent = '🎲';
+            die2Element.textContent = '🎲';
+            die1Element.className = 'die rolling-fast';
+            die2Element.className = 'die rolling-fast';
+
+            // Show the overlay
+            diceResult.classList.add('show');
+
+            // Update dice message to show rolling progress
+            let diceRollTime = 0;
+            const diceMessageInterval = setInterval(() => {
+                diceRollTime += 0.5;
+                if (diceRollTime < 2) {
+                    diceMessage.textContent = `🎲 Rolling the dice... ${diceRollTime.toFixed(1)}s`;
+                } else {
+                    // Stop the interval when rolling is complete
+                    clearInterval(diceMessageInterval);
+                }
+            }, 500);
+
+            const lobbyId = document.getElementById('lobby-id').textContent;
+            const response = await fetch(`/api/lobby/${lobbyId}/roll-spider-dice?fields=game_state`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    player_id: playerId
+                })
+            });
+
+            const data = await response.json();
+            console.log('Spider dice response:', data);
+
+            if (data.success) {
+                // Update the board with the new state
+                this.updateBoardWithPieces(data.game_state.board);
+
+                // Clear any current selection
+                this.clearLegalMoveIndicators();
+                if (this.selectedNode) {
+                    this.selectedNode.classList.remove('selected');
+                    this.selectedNode = null;
+                }
+
+                // Update status with dice results
+                const moveInfo = data.game_state.last_move;
+                if (moveInfo && moveInfo.move_type === 'spider_dice_roll') {
+                    const diceResults = moveInfo.dice_results;
+                    let statusText = `${moveInfo.player.charAt(0).toUpperCase() + moveInfo.player.slice(1)} rolled spider dice: `;
+                    statusText += `${diceResults.die1_spider ? '🕷️' : '🔪'} and ${diceResults.die2_spider ? '🕷️' : '🔪'}`;
+
+                    if (diceResults.both_spiders) {
+                        statusText += ' 🕷️🕷️ DOUBLE SPIDERS! Player can control an enemy piece!';
+                        // Enter spider control mode only if the current local player is the one who should control
+                        if (gameBoard && lobbyState?.game_state?.spider_control_mode) {
+                            const currentPlayer = lobbyState?.players?.find(p => p.id === playerId);
+                            const spiderControlPlayer = lobbyState.game_state?.spider_control_player;
+                            if (currentPlayer && currentPlayer.color === spiderControlPlayer) {
+                                gameBoard.enterSpiderControlMode();
+                            }
+                        }
+                    } else if (diceResults.both_knives) {
+                        statusText += ' 🔪🔪 DOUBLE KNIVES! Player must sacrifice a piece!';
+                        // Enter sacrifice mode only if the current local player is the one who must sacrifice
+                        if (gameBoard && lobbyState?.game_state?.sacrifice_mode) {
+                            const currentPlayer = lobbyState?.players?.find(p => p.id === playerId);
+                            const sacrificePlayer = lobbyState.game_state?.sacrifice_player;
+                            if (currentPlayer && currentPlayer.color === sacrificePlayer) {
+                                gameBoard.enterSacrificeMode();
+                            }
+                        }
+                    } else {
+                        const spiderCount = (diceResults.die1_spider ? 1 : 0) + (diceResults.die2_spider ? 1 : 0);
+                        if (spiderCount === 1) {
+                            statusText += ' (1 spider)';
+                        } else {
+                            statusText += ' (no knives)';
+                        }
+                    }
+
+                    const currentTurn = data.game_state.current_turn;
+                    statusText += `. ${currentTurn.charAt(0).toUpperCase() + currentTurn.slice(1)}'s turn.`;
+
+                    document.getElementById('status-text').innerHTML = statusText;
+
+                    // Stop rolling animation and show final results with bounce
+                    clearInterval(rollInterval); // Stop the rolling progress counter
+                    clearInterval(diceMessageInterval); // Stop the dice message progress counter
+                    setTimeout(() => {
+                        showDiceResult(
+                            diceResults.die1,
+                            diceResults.die2,
+                            diceResults.die1_spider,
+                            diceResults.die2_spider,
+                            diceResults.both_spiders,
+                            diceResults.both_knives
+                        );
+                    }, 2000); // Match the rolling animation duration for dramatic effect
+                }
+
+                // Update local lobby state
+                if (data.lobby_info) {
+                    // Use the full lobby info from the API response
+                    lobbyState = data.lobby_info;
+                } else {
+                    // Fallback: update just the game state if lobby_info not available
+                    if (lobbyState) {
+                        lobbyState.game_state = data.game_state;
+                    } else {
+                        console.warn('lobbyState not initialized, creating minimal structure');
+                        lobbyState = {
+                            game_state: data.game_state,
+                            players: [],
+                            spectators: []
+                        };
+                    }
+                }
+
+                // Update captured pieces display
+                updateCapturedPieces();
+
+                // Update spider dice button state after successful roll
+                updateSpiderDiceButtonState();
+            } else {
+                // Hide the dice overlay on failure
+                const diceResult = document.getElementById('dice-result');
+                diceResult.classList.remove('show');
+
+                // Clear intervals
+                clearInterval(rollInterval);
+                clearInterval(diceMessageInterval);
+
+                document.getElementById('status-text').innerHTML = '<strong>Spider dice roll failed:</strong> ' + (data.error || 'Unknown error');
+
+                // Update spider dice button state after failed roll
+                updateSpiderDiceButtonState();
+            }
+        } catch (error) {
+            console.error('Failed to roll spider dice:', error);
+
+            // Hide the dice overlay on error
+            const diceResult = document.getElementById('dice-result');
+            diceResult.classList.remove('show');
+
+            document.getElementById('status-text').innerHTML = '<strong>Failed to roll spider dice.</strong> Please try again.';
+
+            // Update spider dice button state after error
+            updateSpiderDiceButtonState();
+        } finally {
+            // Re-enable the button and remove rolling animation
+            const diceBtn = document.getElementById('spider-dice-btn');
+            diceBtn.disabled = false;
+            diceBtn.textContent = '🕷️ Roll Spider Dice';
+            diceBtn.classList.remove('rolling');
+
+            // Clear the rolling progress interval if it exists
+            if (typeof rollInterval !== 'undefined') {
+                clearInterval(rollInterval);
+            }
+            if (typeof diceMessageInterval !== 'undefined') {
+                clearInterval(diceMessageInterval);
+            }
+        }
+    }
+
+    enterSacrificeMode() {
+        this.sacrificeMode = true;
+        console.log('🔪 Entering sacrifice mode - player must select a piece to sacrifice');
+
+        // Check if we are the sacrifice player
+        const currentPlayer = lobbyState?.players?.find(p => p.id === playerId);
+        const sacrificePlayer = lobbyState?.game_state?.sacrifice_player;
+
+        if (currentPlayer && currentPlayer.color === sacrificePlayer) {
+            document.getElementById('status-text').textContent = '🔪 Sacrifice a piece... Select one of your own pieces to sacrifice.';
+            // Highlight player's own pieces
+            this.highlightSacrificePieces();
+        } else {
+            document.getElementById('status-text').textContent = `🔪 ${sacrificePlayer} player must sacrifice a piece (you rolled double knives).`;
+        }
+    }
+
+    exitSacrificeMode() {
+        this.sacrificeMode = false;
+        console.log('🔪 Exiting sacrifice mode');
+        this.clearSacrificeHighlights();
+    }
+
+    highlightSacrificePieces() {
+        // Clear any existing highlights
+        this.clearSacrificeHighlights();
+
+        const currentPlayer = lobbyState?.players?.find(p => p.id === playerId);
+        if (!currentPlayer) return;
+
+        // Check if the current local player is the one who should sacrifice
+        const sacrificePlayer = lobbyState?.game_state?.sacrifice_player;
+        if (!sacrificePlayer || currentPlayer.color !== sacrificePlayer) {
+            return;
+        }
+
+        // Highlight all pieces belonging to the sacrifice player
+        Object.entries(lobbyState?.game_state?.board || {}).forEach(([nodeId, pieceName]) => {
+            if (pieceName.startsWith(sacrificePlayer + '_')) {
+                const node = this.nodes.find(n => n.id === nodeId);
+                if (node) {
+                    node.element.classList.add('sacrifice-candidate');
+                }
+            }
+        });
+    }
+
+    clearSacrificeHighlights() {
+        this.nodes.forEach(node => {
+            node.element.classList.remove('sacrifice-candidate');
+        });
+    }
+
+    async sacrificePiece(nodeId) {
+        try {
+            const lobbyId = document.getElementById('lobby-id').textContent;
+
+            // Emit websocket event for sacrifice
+            socket.emit('sacrifice_piece', {
+                lobby_id: lobbyId,
+                node_id: nodeId,
+                player_id: playerId
+            });
+
+            console.log('🔪 Sacrificing piece at node:', nodeId);
+        } catch (error) {
+            console.error('Failed to sacrifice piece:', error);
+            document.getElementById('status-text').textContent = 'Failed to sacrifice piece. Please try again.';
+        }
+    }
+
+    enterSpiderControlMode() {
+        this.spiderControlMode = true;
+        console.log('🕷️ Entering spider control mode - player must select an enemy piece to control');
+        document.getElementById('status-text').textContent = '🕷️ Control an enemy piece... Select an enemy piece to take control of.';
+
+        // Highlight enemy pieces
+        this.highlightEnemyPieces();
+    }
+
+    exitSpiderControlMode() {
+        this.spiderControlMode = false;
+        this.controlledPieceNode = null;
+        this.controlledWeaponmasterMode = false;
+        this.controlledWeaponmasterMoves = [];
+        this.controlledFirstNode = null;
+        console.log('🕷️ Exiting spider control mode');
+        this.clearSpiderControlHighlights();
+    }
+
+    highlightEnemyPieces() {
+        // Clear any existing highlights
+        this.clearSpiderControlHighlights();
+
+        const currentPlayer = lobbyState?.players?.find(p => p.id === playerId);
+        if (!currentPlayer) return;
+
+        const enemyColor = currentPlayer.color === 'red' ? 'blue' : 'red';
+
+        // Highlight all pieces belonging to the enemy (except matron mother)
+        Object.entries(lobbyState?.game_state?.board || {}).forEach(([nodeId, pieceName]) => {
+            if (pieceName.startsWith(enemyColor + '_') && !pieceName.includes('matron mother')) {
+                const node = this.nodes.find(n => n.id === nodeId);
+                if (node) {
+                    node.element.classList.add('spider-control-candidate');
+                }
+            }
+        });
+    }
+
+    clearSpiderControlHighlights() {
+        this.nodes.forEach(node => {
+            node.element.classList.remove('spider-control-candidate');
+            node.element.classList.remove('controlled-piece');
+        });
+    }
+
+    async controlEnemyPiece(nodeId) {
+        try {
+            const lobbyId = document.getElementById('lobby-id').textContent;
+
+            // Emit websocket event for control
+            socket.emit('control_enemy_piece', {
+                lobby_id: lobbyId,
+                node_id: nodeId,
+                player_id: playerId
+            });
+
+            console.log('🕷️ Taking control of enemy piece at node:', nodeId);
+        } catch (error) {
+            console.error('Failed to control enemy piece:', error);
+            document.getElementById('status-text').textContent = 'Failed to control enemy piece. Please try again.';
+        }
+    }
+
+    highlightControlledPiece(nodeId) {
+        // Clear existing highlights
+        this.clearSpiderControlHighlights();
+
+        // Highlight the controlled piece
+        const node = this.nodes.find(n => n.id === nodeId);
+        if (node) {
+            node.element.classList.add('controlled-piece');
+            this.controlledPieceNode = nodeId;
+        }
+
+        console.log('🕷️ Controlled piece highlighted at:', nodeId);
+        document.getElementById('status-text').textContent = '🕷️ Move the controlled piece... Click the controlled piece to select it, then click destination.';
+    }
+
+    async moveControlledPiece(fromNode, toNode) {
+        try {
+            const lobbyId = document.getElementById('lobby-id').textContent;
+
+            // Emit websocket event for controlled move
+            socket.emit('move_controlled_piece', {
+                lobby_id: lobbyId,
+                from_node: fromNode,
+                to_node: toNode,
+                player_id: playerId
+            });
+
+            console.log('🕷️ Moving controlled piece from', fromNode, 'to', toNode);
+        } catch (error) {
+            console.error('Failed to move controlled piece:', error);
+            document.getElementById('status-text').textContent = 'Failed to move controlled piece. Please try again.';
+        }
+    }
+
+    async getLegalMovesForControlledPiece(nodeId) {
+        try {
+            // For controlled pieces, we get legal moves using the original piece logic
+            // but we'll allow moves that would normally be illegal (like capturing allies)
+            const lobbyId = document.getElementById('lobby-id').textContent;
+            const response = await fetch(`/api/lobby/${lobbyId}/legal-moves/${nodeId}`);
+            const data = await response.json();
+
+            if (data.legal_moves && data.legal_moves.length > 0) {
+                console.log('🕷️ Showing legal moves:', data.legal_moves);
+                this.highlightControlledPieceMoves(data.legal_moves);
+                console.log('🕷️ Legal moves for controlled piece displayed:', data.legal_moves);
+            } else {
+                console.log('🕷️ No legal moves returned for controlled piece');
+            }
+        } catch (error) {
+            console.error('Failed to get legal moves for controlled piece:', error);
+        }
+    }
+
+    refreshBoard() {
+        // Force a complete refresh of the board and game state
+
+        // Store current state
+        const currentBoardState = lobbyState?.game_state?.board || {};
+        const currentSelection = this.selectedNode ? this.selectedNode.getAttribute('data-id') : null;
+
+        // Reinitialize board
+        this.initializeBoard();
+
+        // Restore game state
+        if (Object.keys(currentBoardState).length > 0) {
+            this.updateBoardWithPieces(currentBoardState);
+
+            // Restore selection
+            if (currentSelection) {
+                const nodeToSelect = this.nodes.find(n => n.id === currentSelection);
+                if (nodeToSelect) {
+                    nodeToSelect.element.classList.add('selected');
+                    this.selectedNode = nodeToSelect.element;
+                    this.getLegalMoves(currentSelection);
+                }
+            }
+        } else {
+            console.log('No board state to restore after refresh');
+        }
+
+        // Update captured pieces
+        updateCapturedPieces();
+
+        // Update spider dice button state after board refresh
+        updateSpiderDiceButtonState();
+    }
+
+    clearCheckIndicators() {
+        // Remove any existing check indicators
+        const existingIndicators = this.board.querySelectorAll('.check-indicator, .check-line');
+        existingIndicators.forEach(indicator => indicator.remove());
+    }
+
+    async showCheckIndicators() {
+        // Clear any existing indicators first
+        this.clearCheckIndicators();
+
+        if (!lobbyState?.game_state?.game_started) return;
+
+        try {
+            // Check both players for check status
+            const colors = ['red', 'blue'];
+
+            for (const color of colors) {
+                const response = await fetch(`/api/lobby/${document.getElementById('lobby-id').textContent}/check-status?player=${color}`);
+                const data = await response.json();
+
+                if (data.is_in_check) {
+                    await this.drawCheckIndicator(color, data.threatening_pieces);
+                }
+            }
+        } catch (error) {
+            console.error('Failed to check for check status:', error);
+        }
+    }
+
+    async drawCheckIndicator(playerInCheck, threateningPieces) {
+        if (!threateningPieces || threateningPieces.length === 0) return;
+
+        // Find the matron mother position
+        const matronMotherNode = this.findMatronMother(playerInCheck);
+        if (!matronMotherNode) return;
+
+        // Draw indicators for each threatening piece
+        threateningPieces.forEach(threat => {
+            this.drawCheckLine(threat.node_id, matronMotherNode.id);
+            this.drawSwordIcon(threat.node_id, matronMotherNode.id);
+        });
+    }
+
+    findMatronMother(color) {
+        const boardState = lobbyState?.game_state?.board || {};
+        for (const [nodeId, pieceName] of Object.entries(boardState)) {
+            if (pieceName === `${color}_matron mother`) {
+                return this.nodes.find(n => n.id === nodeId);
+            }
+        }
+        return null;
+    }
+
+    drawCheckLine(fromNodeId, toNodeId) {
+        const fromNode = this.nodes.find(n => n.id === fromNodeId);
+        const toNode = this.nodes.find(n => n.id === toNodeId);
+
+        if (!fromNode || !toNode) return;
+
+        // Calculate line position and angle
+        const fromX = fromNode.x;
+        const fromY = fromNode.y;
+        const toX = toNode.x;
+        const toY = toNode.y;
+
+        const deltaX = toX - fromX;
+        const deltaY = toY - fromY;
+        const distance = Math.sqrt(deltaX * deltaX + deltaY * deltaY);
+        const angle = Math.atan2(deltaY, deltaX) * 180 / Math.PI;
+
+        // Create the check line element
+        const checkLine = document.createElement('div');
+        checkLine.className = 'check-line';
+        checkLine.style.left = fromX + 'px';
+        checkLine.style.top = fromY + 'px';
+        checkLine.style.width = distance + 'px';
+        checkLine.style.transformOrigin = '0 50%';
+        checkLine.style.transform = `rotate(${angle}deg)`;
+
+        this.board.appendChild(checkLine);
+    }
+
+    drawSwordIcon(fromNodeId, toNodeId) {
+        const fromNode = this.nodes.find(n => n.id === fromNodeId);
+        const toNode = this.nodes.find(n => n.id === toNodeId);
+
+        if (!fromNode || !toNode) return;
+
+        // Calculate midpoint
+        const midX = (fromNode.x + toNode.x) / 2;
+        const midY = (fromNode.y + toNode.y) / 2;
+
+        // Create sword indicator
+        const swordIndicator = document.createElement('div');
+        swordIndicator.className = 'check-indicator';
+        swordIndicator.textContent = '⚔️';
+        swordIndicator.style.left = midX + 'px';
+        swordIndicator.style.top = midY + 'px';
+
+        this.board.appendChild(swordIndicator);
+    }
+}
+
+// Global function to get piece symbols (used by captured pieces display)
+function getPieceSymbol(pieceName) {
+    if (!GameLogic) {
+        console.error('🎯 GameLogic not available!');
+        return pieceName;
+    }
+    if (!GAME_CONFIG) {
+        console.error('🎯 GAME_CONFIG not available!');
+        return pieceName;
+    }            
+    const symbol = GameLogic.getPieceSymbol(pieceName);
+    return symbol;
+}
+
+async function initializeGameBoard() {
+    gameBoard = new MolecularBoard();
+
+    // Wait for the board to be fully initialized
+    let attempts = 0;
+    const maxAttempts = 100; // Wait up to 10 seconds
+
+    while ((!gameBoard.nodes || gameBoard.nodes.length === 0) && attempts < maxAttempts) {
+        await new Promise(resolve => setTimeout(resolve, 100));
+        attempts++;
+    }
+
+    if (gameBoard.nodes && gameBoard.nodes.length > 0) {
+
+        // If we already have game state, restore it immediately
+        if (lobbyState && lobbyState.game_state && lobbyState.game_state.board) {
+            gameBoard.updateBoardWithPieces(lobbyState.game_state.board);
+
+            // Also update captured pieces if available
+            if (lobbyState.game_state.captured_pieces) {
+                updateCapturedPieces();
+            }
+
+            // Update spider dice button state after board initialization
+            updateSpiderDiceButtonState();
+        } else {
+            console.log('🎯 No game state to restore yet');
+        }
+    } else {
+        console.error('🎯 Board failed to initialize properly');
+    }
+}
+
+// Handle page unload
+window.addEventListener('beforeunload', async () => {
+    // Socket connections are tracked by the server: a seat is kept while the page
+    // reloads and freed if the player does not come back. Spectators on the event
+    // stream have no socket, so they leave explicitly.
+    if (playerId && !socket) {
+        const lobbyId = document.getElementById('lobby-id').textContent;
+        try {
+            await fetch(`/api/lobby/${lobbyId}/leave`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    player_id: playerId
+                })
+            });
+        } catch (error) {
+            console.error('Failed to leave lobby:', error);
+        }
+    }
+});
+
+// Initialize development features based on config
+function initializeDevelopmentFeatures() {
+    const isDevMode = GAME_CONFIG?.development?.enabled;
+
+    if (!isDevMode) {
+        console.log('🏗️ Development mode disabled - hiding dev features');
+        document.body.classList.remove('dev-mode');
+        return;
+    }
+
+    console.log('🔧 Development mode enabled - showing all dev features');
+
+    // Enable development mode class for CSS styling
+    document.body.classList.add('dev-mode');
+
+    // Enable all development features
+    window.DEV_LOGGING = true;
+    window.SHOW_PLAYER_IDS = true;
+    window.SHOW_COORDINATES = true;
+
+    // Setup development shortcuts
+    setupDevelopmentShortcuts();
+
+    console.log('✅ Development features initialized');
+}
+
+// Setup development keyboard shortcuts
+function setupDevelopmentShortcuts() {
+    document.addEventListener('keydown', function(event) {
+        // Only in development mode and if not typing in an input
+        if (event.target.tagName === 'INPUT' || event.target.tagName === 'TEXTAREA') {
+            return;
+        }
+
+        // Ctrl+D: Toggle detailed logging
+        if (event.ctrlKey && event.key === 'd') {
+            event.preventDefault();
+            window.DEV_LOGGING = !window.DEV_LOGGING;
+            console.log('📋 Development logging toggled:', window.DEV_LOGGING);
+        }
+
+        // Ctrl+L: Show lobby state
+        if (event.ctrlKey && event.key === 'l') {
+            event.preventDefault();
+            console.log('🏠 Current lobby state:', lobbyState);
+        }
+
+        // Ctrl+Shift+D: Toggle development mode
+        if (event.ctrlKey && event.shiftKey && event.key === 'D') {
+            event.preventDefault();
+            toggleDevelopmentMode();
+        }
+    });
+
+    console.log('⌨️ Development shortcuts enabled:');
+    console.log('  Ctrl+D: Toggle debug logging');
+    console.log('  Ctrl+L: Show lobby state');
+    console.log('  Ctrl+Shift+D: Toggle development mode');
+}
+
+// Enhanced logging function that respects dev settings
+function devLog(message, ...args) {
+    if (window.DEV_LOGGING) {
+        console.log(message, ...args);
+    }
+}
+
+// Toggle development mode at runtime
+function toggleDevelopmentMode() {
+    const isCurrentlyEnabled = document.body.classList.contains('dev-mode');
+
+    if (isCurrentlyEnabled) {
+        document.body.classList.remove('dev-mode');
+        window.DEV_LOGGING = false;
+        window.SHOW_PLAYER_IDS = false;
+        window.SHOW_COORDINATES = false;
+        console.log('🏗️ Development mode disabled');
+    } else {
+        document.body.classList.add('dev-mode');
+        window.DEV_LOGGING = true;
+        window.SHOW_PLAYER_IDS = true;
+        console.log('🔧 Development mode enabled');
+
+        // Refresh the board to update node labels
+        if (gameBoard) {
+            gameBoard.refreshBoard();
+        }
+
+        // Update player display
+        updateLobbyDisplay();
+    }
+}
+
+// Console helper functions for development (available globally)
+window.devMode = {
+    toggle: toggleDevelopmentMode,
+    enable: () => {
+        document.body.classList.add('dev-mode');
+        window.DEV_LOGGING = true;
+        window.SHOW_PLAYER_IDS = true;
+        console.log('🔧 Development mode enabled via console');
+        if (gameBoard) gameBoard.refreshBoard();
+        updateLobbyDisplay();
+    },
+    disable: () => {
+        document.body.classList.remove('dev-mode');
+        window.DEV_LOGGING = false;
+        window.SHOW_PLAYER_IDS = false;
+        window.SHOW_COORDINATES = false;
+        console.log('🏗️ Development mode disabled via console');
+        if (gameBoard) gameBoard.refreshBoard();
+        updateLobbyDisplay();
+    },
+    refresh: () => {
+        if (gameBoard) gameBoard.refreshBoard();
+        console.log('🔄 Board refreshed via console');
+    },
+    state: () => {
+        console.log('🏠 Current lobby state:', lobbyState);
+    }
+};
+
+// Close sidebar with Escape key
+document.addEventListener('keydown', function(event) {
+    if (event.key === 'Escape') {
+        closeSidebar();
+    }
+});
+
+// Close sidebar when clicking outside on mobile
+document.addEventListener('click', function(event) {
+    const sidebar = document.querySelector('.lobby-sidebar');
+    const hamburger = document.getElementById('hamburger-menu');
+    const isMobile = window.innerWidth <= 768;
+
+    if (isMobile && sidebar.classList.contains('open')) {
+        // If clicking outside sidebar and hamburger button on mobile, close sidebar
+        if (!sidebar.contains(event.target) && !hamburger.contains(event.target)) {
+            closeSidebar();
+        }
+    }
+});
+
+// Initialize when page loads
+document.addEventListener('DOMContentLoaded', () => {
+    initializeDevelopmentFeatures();
+    initializeLobby();
+
+    // Fallback: if board still isn't initialized after a short delay, try to initialize it
+    setTimeout(() => {
+        if (!gameBoard && lobbyState) {
+            console.log('Fallback: Initializing game board after delay...');
+            initializeGameBoard();
+        }
+    }, 1000);
+});
+
+// Listen for window resize  
+window.addEventListener('resize', handleResize);
+
+// Game over handling functions
+function handleGameOver(gameData) {
+    const { winner, game_end_reason } = gameData;
+    const currentPlayer = lobbyState?.players?.find(p => p.id === playerId);
+
+    if (!currentPlayer) {
+        console.log('❌ No current player found, exiting handleGameOver');
+        return;
+    }
+
+    const isWinner = winner === currentPlayer.color;
+    const isLoser = winner && winner !== currentPlayer.color;
+
+    console.log('🎮 Game over analysis:', { 
+        winner, 
+        currentPlayerColor: currentPlayer.color, 
+        isWinner, 
+        isLoser, 
+        game_end_reason 
+    });
+
+    // Update status text
+    let statusText = '';
+    if (game_end_reason === 'checkmate') {
+        if (isWinner) {
+            statusText = `🎉 CHECKMATE! You win!`;
+        } else if (isLoser) {
+            statusText = `💀 CHECKMATE! You lose!`;
+        } else {
+            statusText = `🎉 CHECKMATE! ${winner} player wins!`;
+        }
+    } else if (game_end_reason === 'stalemate') {
+        if (isWinner) {
+            statusText = `🎯 STALEMATE! You win! (Opponent has no legal moves)`;
+        } else if (isLoser) {
+            statusText = `💀 STALEMATE! You lose! (No legal moves available)`;
+        } else {
+            statusText = `🎯 STALEMATE! ${winner} player wins!`;
+        }
+    } else if (game_end_reason === 'timeout') {
+        if (isWinner) {
+            statusText = `⏰ TIMEOUT! You win! (Opponent ran out of time)`;
+        } else if (isLoser) {
+            statusText = `⏰ TIMEOUT! You lose! (Time's up!)`;
+        } else {
+            statusText = `⏰ TIMEOUT! ${winner} player wins!`;
+        }
+    }
+
+    document.getElementById('status-text').innerHTML = statusText;
+
+    // Show game over overlay
+    showGameOverOverlay(gameData);
+
+    // Trigger visual effects
+    if (isWinner) {
+        triggerConfetti();
+    } else if (isLoser) {
+        triggerRain();
+    } else {
+        console.log('👀 No animation triggered - player is spectator or other reason');
+    }
+}
+
+function showGameOverOverlay(gameData) {
+    const { winner, game_end_reason } = gameData;
+    const currentPlayer = lobbyState?.players?.find(p => p.id === playerId);
+
+    let title = 'Game Over';
+    let message = 'The game has ended';
+
+    if (game_end_reason === 'checkmate') {
+        if (winner === currentPlayer?.color) {
+            title = '🎉 VICTORY!';
+            message = 'Congratulations! You won by checkmate!';
+        } else if (winner) {
+            title = '💀 DEFEAT!';
+            message = `You lost by checkmate. ${winner} player wins!`;
+        }
+    } else if (game_end_reason === 'stalemate') {
+        if (winner === currentPlayer?.color) {
+            title = '🎯 VICTORY!';
+            message = 'Congratulations! You won by stalemate! Your opponent had no legal moves.';
+        } else if (winner) {
+            title = '💀 DEFEAT!';
+            message = `You lost by stalemate. You had no legal moves available. ${winner} player wins!`;
+        } else {
+            title = '🎯 STALEMATE!';
+            message = `Game ended by stalemate. ${winner} player wins!`;
+        }
+    } else if (game_end_reason === 'timeout') {
+        if (winner === currentPlayer?.color) {
+            title = '⏰ VICTORY!';
+            message = 'Congratulations! You won because your opponent ran out of time!';
+        } else if (winner) {
+            title = '⏰ DEFEAT!';
+            message = `You lost by timeout. Time\'s up! ${winner} player wins!`;
+        } else {
+            title = '⏰ TIMEOUT!';
+            message = `Game ended by timeout. ${winner} player wins!`;
+        }
+    }
+
+    document.getElementById('game-over-title').textContent = title;
+    document.getElementById('game-over-message').textContent = message;
+    document.getElementById('game-over-overlay').style.display = 'flex';
+}
+
+function closeGameOverOverlay() {
+    document.getElementById('game-over-overlay').style.display = 'none';
+}
+
+function triggerConfetti() {
+
+    // Check if confetti library is available
+    if (typeof confetti === 'undefined') {
+        console.error('❌ Confetti library not loaded!');
+        return;
+    }
+
+    // Create confetti effect
+    const duration = 3000;
+    const animationEnd = Date.now() + duration;
+    const defaults = { startVelocity: 30, spread: 360, ticks: 60, zIndex: 0 };
+
+    function randomInRange(min, max) {
+        return Math.random() * (max - min) + min;
+    }
+
+    const interval = setInterval(function() {
+        const timeLeft = animationEnd - Date.now();
+
+        if (timeLeft <= 0) {
+            return clearInterval(interval);
+        }
+
+        const particleCount = 50 * (timeLeft / duration);
+
+        // Create confetti
+        confetti(Object.assign({}, defaults, {
+            particleCount,
+            origin: { x: randomInRange(0.1, 0.3), y: Math.random() - 0.2 }
+        }));
+        confetti(Object.assign({}, defaults, {
+            particleCount,
+            origin: { x: randomInRange(0.7, 0.9), y: Math.random() - 0.2 }
+        }));
+    }, 250);
+}
+
+function triggerRain() {
+    const rainContainer = document.getElementById('rain-container');
+    const raindropCount = 100;
+
+    // Clear existing raindrops
+    rainContainer.innerHTML = '';
+
+    // Create raindrops
+    for (let i = 0; i < raindropCount; i++) {
+        const raindrop = document.createElement('div');
+        raindrop.className = 'raindrop';
+        raindrop.style.left = Math.random() * 100 + 'vw';
+        raindrop.style.animationDelay = Math.random() * 2 + 's';
+        raindrop.style.animationDuration = (Math.random() * 1 + 1) + 's';
+        rainContainer.appendChild(raindrop);
+    }
+
+    // Stop rain after 5 seconds
+    setTimeout(() => {
+        rainContainer.innerHTML = '';
+    }, 5000);
+}
+
+// Rules sidebar functions
+async function openRulesSidebar() {
+    // Load rules content if not already loaded
+    if (!document.getElementById('rules-content').hasAttribute('data-loaded')) {
+        await loadRulesContent();
+    }
+
+    document.getElementById('rules-sidebar').classList.add('open');
+    document.getElementById('rules-overlay').classList.add('open');
+    document.body.style.overflow = 'hidden'; // Prevent background scrolling
+}
+
+async function loadRulesContent() {
+    try {
+        const response = await fetch('/rules');
+        const html = await response.text();
+
+        // Extract the rules content from the HTML
+        const parser = new DOMParser();
+        const doc = parser.parseFromString(html, 'text/html');
+        const rulesContent = doc.querySelector('.rules-content');
+
+        if (rulesContent) {
+            // Replace the loading content with the actual rules
+            document.getElementById('rules-content').innerHTML = rulesContent.innerHTML;
+            document.getElementById('rules-content').setAttribute('data-loaded', 'true');
+        } else {
+            throw new Error('Rules content not found');
+        }
+    } catch (error) {
+        console.error('Failed to load rules:', error);
+        document.getElementById('rules-content').innerHTML = 
+            '<div class="error">Failed to load rules. Please try again.</div>';
+    }
+}
+
+function closeRulesSidebar() {
+    document.getElementById('rules-sidebar').classList.remove('open');
+    document.getElementById('rules-overlay').classList.remove('open');
+    document.body.style.overflow = ''; // Restore scrolling
+}
+
+// Close sidebar when clicking overlay
+document.getElementById('rules-overlay').addEventListener('click', closeRulesSidebar);
+
+// Close sidebar with Escape key
+document.addEventListener('keydown', function(event) {
+    if (event.key === 'Escape') {
+        closeRulesSidebar();
+    }
+});
+
+// Spider dice helper functions
+let audioContext = null;
+
+function initAudioContext() {
+    if (!audioContext) {
+        try {
+            audioContext = new (window.AudioContext || window.webkitAudioContext)();
+        } catch (error) {
+            console.warn('Audio context not supported:', error);
+        }
+    }
+}
+
+function playDiceRollSound() {
+    if (!audioContext) return;
+
+    try {
+        const oscillator = audioContext.createOscillator();
+        const gainNode = audioContext.createGain();
+
+        oscillator.connect(gainNode);
+        gainNode.connect(audioContext.destination);
+
+        oscillator.frequency.setValueAtTime(800, audioContext.currentTime);
+        oscillator.frequency.exponentialRampToValueAtTime(400, audioContext.currentTime + 0.3);
+
+        gainNode.gain.setValueAtTime(0.3, audioContext.currentTime);
+        gainNode.gain.exponentialRampToValueAtTime(0.01, audioContext.currentTime + 0.3);
+
+        oscillator.start(audioContext.currentTime);
+        oscillator.stop(audioContext.currentTime + 0.3);
+    } catch (error) {
+        console.warn('Failed to play dice roll sound:', error);
+    }
+}
+
+function playDoubleSpiderSound() {
+    if (!audioContext) return;
+
+    try {
+        const oscillator = audioContext.createOscillator();
+        const gainNode = audioContext.createGain();
+
+        oscillator.connect(gainNode);
+        gainNode.connect(audioContext.destination);
+
+        oscillator.frequency.setValueAtTime(1200, audioContext.currentTime);
+        oscillator.frequency.exponentialRampToValueAtTime(600, audioContext.currentTime + 0.5);
+
+        gainNode.gain.setValueAtTime(0.4, audioContext.currentTime);
+        gainNode.gain.exponentialRampToValueAtTime(0.01, audioContext.currentTime + 0.5);
+
+        oscillator.start(audioContext.currentTime);
+        oscillator.stop(audioContext.currentTime + 0.5);
+    } catch (error) {
+        console.warn('Failed to play double spider sound:', error);
+    }
+}
+
+function showDiceResult(die1, die2, die1Spider, die2Spider, bothSpiders, bothKnives) {
+    const diceResult = document.getElementById('dice-result');
+    const die1Element = document.getElementById('die1');
+    const die2Element = document.getElementById('die2');
+    const diceMessage = document.getElementById('dice-message');
+
+    // Stop rolling animation
+    die1Element.className = 'die';
+    die2Element.className = 'die';
+
+    // Show final results
+    die1Element.textContent = die1Spider ? '🕷️' : '🔪';
+    die2Element.textContent = die2Spider ? '🕷️' : '🔪';
+
+    // Add bounce animation
+    die1Element.classList.add('bounce');
+    die2Element.classList.add('bounce');
+
+    // Update message
+    if (bothSpiders) {
+        diceMessage.innerHTML = '<strong>🕷️🕷️ DOUBLE SPIDERS!</strong><br>The spider queen bestows a boon...';
+        playDoubleSpiderSound();
+        triggerConfetti();
+    } else if (bothKnives) {
+        diceMessage.innerHTML = '<strong>🔪🔪 Both knives!</strong><br>The spider queen demands sacrifice!';
+    } else {
+        const spiderCount = (die1Spider ? 1 : 0) + (die2Spider ? 1 : 0);
+        diceMessage.innerHTML = `<strong>${spiderCount} spider${spiderCount !== 1 ? 's' : ''}!</strong><br>${spiderCount === 1 ? 'The spider queen ignores your prayers...' : 'No special effects.'}`;
+    }
+
+    // Remove bounce animation after a delay
+    setTimeout(() => {
+        die1Element.classList.remove('bounce');
+        die2Element.classList.remove('bounce');
+    }, 1000);
+}
+
+function closeDiceResult() {
+    const diceResult = document.getElementById('dice-result');
+    diceResult.classList.remove('show');
+}
+
+function updateSpiderDiceButtonState() {
+    if (!lobbyState || !lobbyState.game_state) {
+        console.log('🎲 No lobby state available for spider dice button update');
+        return;
+    }
+
+    const spiderDiceBtn = document.getElementById('spider-dice-btn');
+    if (!spiderDiceBtn) {
+        console.log('🎲 Spider dice button not found');
+        return;
+    }
+
+    const gameState = lobbyState.game_state;
+    const currentPlayer = lobbyState?.players?.find(p => p.id === playerId);
+
+    if (!currentPlayer) {
+        console.log('🎲 Current player not found');
+        return;
+    }
+
+    // Check if it's the current player's turn
+    const isCurrentTurn = currentPlayer.color === gameState.current_turn;
+
+    // Check if the game has started
+    const gameStarted = gameState.game_started;
+
+    // Check if the button should be enabled based on turn number and cooldown
+    let shouldEnable = false;
+    let reason = '';
+
+    if (!gameStarted) {
+        shouldEnable = false;
+        reason = 'Game not started';
+    } else if (!isCurrentTurn) {
+        shouldEnable = false;
+        reason = 'Not your turn';
+    } else {
+        // Check turn number requirement using game config
+        const spiderDiceMinTurn = GAME_CONFIG?.game_rules?.spider_dice_min_turn || 3;
+        const playerTurnCount = gameState.player_turn_numbers?.[currentPlayer.color] || 0;
+        if (playerTurnCount < spiderDiceMinTurn) {
+            shouldEnable = false;
+            reason = `Must wait ${spiderDiceMinTurn - playerTurnCount} more turn(s)`;
+        } else {
+            shouldEnable = true;
+            reason = 'Ready to roll';
+        }
+    }
+
+    // Update button state
+    spiderDiceBtn.disabled = !shouldEnable;
+
+    // Update button text and styling
+    if (shouldEnable) {
+        spiderDiceBtn.textContent = '🕷️ Roll Spider Dice';
+        spiderDiceBtn.classList.remove('disabled');
+        spiderDiceBtn.title = 'Roll two d8 dice: 5-8 = 🕷️ (spider), 1-4 = 🔪 (knife). Double spiders trigger special effects!';
+    } else {
+        spiderDiceBtn.textContent = `🕷️ ${reason}`;
+        spiderDiceBtn.classList.add('disabled');
+        spiderDiceBtn.title = `Spider dice unavailable: ${reason}`;
+    }
+}
+
+function updateGameStatus() {
+    if (!lobbyState || !lobbyState.game_state) {
+        return;
+    }
+
+    const gameState = lobbyState.game_state;
+    const statusText = document.getElementById('status-text');
+    const statusIndicator = document.getElementById('status-indicator');
+
+    if (!gameState.game_started) {
+        statusText.textContent = 'Waiting for players to join...';
+        statusIndicator.className = 'status-indicator status-waiting';
+        return;
+    }
+
+    const currentPlayer = lobbyState?.players?.find(p => p.id === playerId);
+    if (!currentPlayer) {
+        statusText.textContent = 'Error: Player not found';
+        return;
+    }
+
+    const isCurrentTurn = currentPlayer.color === gameState.current_turn;
+    const currentTurnColor = gameState.current_turn;
+
+    if (isCurrentTurn) {
+        statusText.textContent = `Your turn (${currentTurnColor})`;
+        statusIndicator.className = 'status-indicator status-active';
+    } else {
+        statusText.textContent = `${currentTurnColor.charAt(0).toUpperCase() + currentTurnColor.slice(1)}'s turn`;
+        statusIndicator.className = 'status-indicator status-waiting';
+    }
+
+    // Update spider dice button state
+    updateSpiderDiceButtonState();
+}
+
+// Orc Promotion Functions
+let selectedPromotionPiece = null;
+
+function showPromotionModal(data) {
+    const { promotable_pieces, promotion_node, player } = data;
+
+    // Check if this promotion is for the current player
+    const currentPlayer = lobbyState?.players?.find(p => p.id === playerId);
+    if (!currentPlayer || currentPlayer.color !== player) {
+        console.log('Promotion not for current player, ignoring');
+        return;
+    }
+
+    console.log('🔄 Showing promotion modal for pieces:', promotable_pieces);
+
+    const modal = document.getElementById('promotion-overlay');
+    const piecesContainer = document.getElementById('promotion-pieces');
+    const confirmBtn = document.getElementById('promotion-confirm-btn');
+
+    // Clear previous pieces
+    piecesContainer.innerHTML = '';
+    selectedPromotionPiece = null;
+
+    // Update confirm button
+    confirmBtn.disabled = true;
+    confirmBtn.textContent = 'Select a piece first';
+
+    // Add available pieces
+    promotable_pieces.forEach(piece => {
+        const pieceElement = document.createElement('div');
+        pieceElement.className = 'promotion-piece';
+        pieceElement.setAttribute('data-piece', piece);
+
+        const symbol = getPieceSymbol(piece);
+        const name = piece.split('_')[1].replace(/[0-9]/g, '');
+
+        pieceElement.innerHTML = `
+            <div class="promotion-piece-symbol">${symbol}</div>
+            <div class="promotion-piece-name">${name}</div>
+        `;
+
+        pieceElement.onclick = () => selectPromotionPiece(piece, pieceElement);
+        piecesContainer.appendChild(pieceElement);
+    });
+
+    // Show modal
+    modal.classList.add('show');
+    document.body.style.overflow = 'hidden';
+}
+
+function selectPromotionPiece(piece, element) {
+    // Remove previous selection
+    document.querySelectorAll('.promotion-piece').forEach(p => p.classList.remove('selected'));
+
+    // Select new piece
+    element.classList.add('selected');
+    selectedPromotionPiece = piece;
+
+    // Update confirm button
+    const confirmBtn = document.getElementById('promotion-confirm-btn');
+    confirmBtn.disabled = false;
+    confirmBtn.textContent = `Promote to ${piece.split('_')[1].replace(/[0-9]/g, '')}`;
+}
+
+function confirmPromotion() {
+    if (!selectedPromotionPiece) return;
+
+    const lobbyId = document.getElementById('lobby-id').textContent;
+
+    // Send promotion via WebSocket
+    socket.emit('promote_orc', {
+        lobby_id: lobbyId,
+        selected_piece: selectedPromotionPiece,
+        player_id: playerId
+    });
+
+    console.log('🔄 Promoting orc to:', selectedPromotionPiece);
+}
+
+function closePromotionModal() {
+    const modal = document.getElementById('promotion-overlay');
+    modal.classList.remove('show');
+    document.body.style.overflow = '';
+    selectedPromotionPiece = null;
+}
+
+// Mobile Timer Functions
+function updateMobileTimerDisplay() {
+    const mobileTimerEl = document.getElementById('mobile-turn-timer');
+    if (!mobileTimerEl) return;
+
+    if (!lobbyState?.game_state?.game_started) {
+        mobileTimerEl.style.display = 'none';
+        return;
+    }
+
+    // Show mobile timer on mobile devices
+    const isMobile = window.innerWidth <= 768;
+    mobileTimerEl.style.display = isMobile ? 'block' : 'none';
+
+    const gameState = lobbyState.game_state;
+    const redTime = gameState.player_time_remaining?.red || 0;
+    const blueTime = gameState.player_time_remaining?.blue || 0;
+
+    const mobileRedTimerEl = document.getElementById('mobile-red-timer');
+    const mobileBlueTimerEl = document.getElementById('mobile-blue-timer');
+
+    if (mobileRedTimerEl) mobileRedTimerEl.textContent = formatTime(redTime);
+    if (mobileBlueTimerEl) mobileBlueTimerEl.textContent = formatTime(blueTime);
+
+    // Apply warning/danger styling
+    const warningThreshold = 60; // 1 minute
+    const dangerThreshold = 10; // 10 seconds
+
+    if (mobileRedTimerEl) {
+        mobileRedTimerEl.className = 'mobile-timer-value';
+        if (redTime <= dangerThreshold) mobileRedTimerEl.className += ' danger';
+        else if (redTime <= warningThreshold) mobileRedTimerEl.className += ' warning';
+    }
+
+    if (mobileBlueTimerEl) {
+        mobileBlueTimerEl.className = 'mobile-timer-value';
+        if (blueTime <= dangerThreshold) mobileBlueTimerEl.className += ' danger';
+        else if (blueTime <= warningThreshold) mobileBlueTimerEl.className += ' warning';
+    }
+
+    // Update mobile current turn timer
+    updateMobileCurrentTurnTimer(gameState);
+}
+
+function updateMobileCurrentTurnTimer(gameState) {
+    if (!gameState.turn_start_time) return;
+
+    const currentTime = Date.now() / 1000;
+    const turnStartTime = gameState.turn_start_time;
+    const elapsedThisTurn = currentTime - turnStartTime;
+
+    const mobileCurrentTurnTimerEl = document.getElementById('mobile-current-turn-timer');
+    if (mobileCurrentTurnTimerEl) {
+        mobileCurrentTurnTimerEl.textContent = formatTime(elapsedThisTurn);
+    }
+}
+
+// Override the existing updateTimerDisplay function to include mobile timer
+const originalUpdateTimerDisplay = window.updateTimerDisplay;
+if (originalUpdateTimerDisplay) {
+    window.updateTimerDisplay = function() {
+        originalUpdateTimerDisplay();
+        updateMobileTimerDisplay();
+    };
+} else {
+    // If updateTimerDisplay doesn't exist yet, create it
+    window.updateTimerDisplay = updateMobileTimerDisplay;
+}
+
+// Override the existing updateCurrentTurnTimer function to include mobile timer
+const originalUpdateCurrentTurnTimer = window.updateCurrentTurnTimer;
+if (originalUpdateCurrentTurnTimer) {
+    window.updateCurrentTurnTimer = function(gameState) {
+        originalUpdateCurrentTurnTimer(gameState);
+        updateMobileCurrentTurnTimer(gameState);
+    };
+} else {
+    // If updateCurrentTurnTimer doesn't exist yet, create it
+    window.updateCurrentTurnTimer = updateMobileCurrentTurnTimer;
+}
+
+// Handle window resize to show/hide mobile timer
+window.addEventListener('resize', function() {
+    updateMobileTimerDisplay();
+});
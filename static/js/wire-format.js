@@ -0,0 +1,124 @@
+// Decoder for the compact binary wire format ('lobby_update_bin' frames).
+// Frames are MessagePack-encoded lobby_update notifications where boards are packed
+// as 4-bit cells and node IDs inside moves are indexes into the shared node table.
+const WireFormat = {
+    PIECE_TYPES: ['matron mother', 'wizard', 'priestess', 'weaponmaster', 'orc'],
+    COLORS: ['red', 'blue'],
+    MOVE_NODE_KEYS: ['from', 'to', 'node', 'intermediate_node', 'controlled_node', 'promotion_node'],
+
+    // Same ordering as WIRE_NODE_IDS in app.py: rings R1-R3 (16 nodes each), then center nodes
+    getNodeIds: function() {
+        if (this._nodeIds) return this._nodeIds;
+        const rings = GAME_CONFIG?.board_connections?.rings ? Object.keys(GAME_CONFIG.board_connections.rings).sort() : ['R1', 'R2', 'R3'];
+        const centers = GAME_CONFIG?.center_nodes || ['C0', 'C1', 'C2', 'C3'];
+        const nodeIds = [];
+        rings.forEach(ring => {
+            for (let i = 0; i < 16; i++) nodeIds.push(`${ring}N${i}`);
+        });
+        this._nodeIds = nodeIds.concat(centers);
+        return this._nodeIds;
+    },
+
+    // Minimal MessagePack decoder covering the types the server emits
+    unpack: function(buffer) {
+        const bytes = new Uint8Array(buffer);
+        const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+        const textDecoder = new TextDecoder();
+        let offset = 0;
+
+        function readStr(length) {
+            const value = textDecoder.decode(bytes.subarray(offset, offset + length));
+            offset += length;
+            return value;
+        }
+        function readBin(length) {
+            const value = bytes.slice(offset, offset + length);
+            offset += length;
+            return value;
+        }
+        function readArray(length) {
+            const value = [];
+            for (let i = 0; i < length; i++) value.push(read());
+            return value;
+        }
+        function readMap(length) {
+            const value = {};
+            for (let i = 0; i < length; i++) {
+                const key = read();
+                value[key] = read();
+            }
+            return value;
+        }
+        function read() {
+            const type = bytes[offset++];
+            if (type < 0x80) return type;
+            if (type < 0x90) return readMap(type & 0x0f);
+            if (type < 0xa0) return readArray(type & 0x0f);
+            if (type < 0xc0) return readStr(type & 0x1f);
+            if (type >= 0xe0) return type - 0x100;
+            let value;
+            switch (type) {
+                case 0xc0: return null;
+                case 0xc2: return false;
+                case 0xc3: return true;
+                case 0xc4: return readBin(bytes[offset++]);
+                case 0xc6: value = view.getUint32(offset); offset += 4; return readBin(value);
+                case 0xcb: value = view.getFloat64(offset); offset += 8; return value;
+                case 0xd2: value = view.getInt32(offset); offset += 4; return value;
+                case 0xd3: value = Number(view.getBigInt64(offset)); offset += 8; return value;
+                case 0xd9: return readStr(bytes[offset++]);
+                case 0xdb: value = view.getUint32(offset); offset += 4; return readStr(value);
+                case 0xdd: value = view.getUint32(offset); offset += 4; return readArray(value);
+                case 0xdf: value = view.getUint32(offset); offset += 4; return readMap(value);
+                default: throw new Error(`Unsupported wire type 0x${type.toString(16)}`);
+            }
+        }
+        return read();
+    },
+
+    unpackBoard: function(packed) {
+        const nodeIds = this.getNodeIds();
+        const board = {};
+        let ordinalOffset = nodeIds.length / 2;
+        nodeIds.forEach((nodeId, index) => {
+            const code = (packed[index >> 1] >> (index & 1 ? 0 : 4)) & 0x0f;
+            if (!code) return;
+            const color = this.COLORS[Math.floor((code - 1) / this.PIECE_TYPES.length)];
+            let pieceType = this.PIECE_TYPES[(code - 1) % this.PIECE_TYPES.length];
+            if (pieceType === 'orc') pieceType = `orc_${packed[ordinalOffset++]}`;
+            board[nodeId] = `${color}_${pieceType}`;
+        });
+        return board;
+    },
+
+    expandMove: function(move) {
+        const nodeIds = this.getNodeIds();
+        this.MOVE_NODE_KEYS.forEach(key => {
+            if (typeof move[key] === 'number') move[key] = nodeIds[move[key]];
+        });
+        if (Array.isArray(move.intermediate_nodes)) {
+            move.intermediate_nodes = move.intermediate_nodes.map(n => typeof n === 'number' ? nodeIds[n] : n);
+        }
+        return move;
+    },
+
+    expandGameState: function(state) {
+        if (!state) return state;
+        if (state.board instanceof Uint8Array) state.board = this.unpackBoard(state.board);
+        if (state.final_board instanceof Uint8Array) state.final_board = this.unpackBoard(state.final_board);
+        if (state.last_move) this.expandMove(state.last_move);
+        return state;
+    },
+
+    // Decode a frame into the same shape as a JSON 'lobby_update' notification
+    decodeNotification: function(buffer) {
+        const notification = this.unpack(buffer);
+        if (notification.lobby_info) this.expandGameState(notification.lobby_info.game_state);
+        if (notification.data && typeof notification.data === 'object') this.expandGameState(notification.data);
+        return notification;
+    }
+};
+
+if (typeof module !== 'undefined' && module.exports) {
+    module.exports = { WireFormat };
+}
@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app reads its configuration at import, so point every on-disk path at a scratch directory first
+_scratch = tempfile.mkdtemp(prefix='sava-tests-')
+for name, value in {
+    'LOBBY_STORE': 'memory',
+    'JOURNAL_DIR': os.path.join(_scratch, 'journal'),
+    'ARCHIVE_DIR': os.path.join(_scratch, 'archive'),
+    'LOBBY_SPILL_DIR': os.path.join(_scratch, 'spill'),
+    'LOBBY_HANDOFF_PATH': os.path.join(_scratch, 'lobbies.handoff'),
+    'ANALYSIS_WORKERS': '0',
+}.items():
+    os.environ[name] = value
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app as sava  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    return sava.app.test_client()
+
+
+@pytest.fixture
+def new_lobby():
+    """Factory for a registered, journaled lobby; started=True seats p1 and p2 and starts the game."""
+    created = []
+
+    def make(started=True):
+        lobby = sava.Lobby(sava.new_lobby_id())
+        lobby.start_journal()
+        sava.lobbies[lobby.lobby_id] = lobby
+        created.append(lobby.lobby_id)
+        if started:
+            lobby.submit(lobby.add_player, 'p1', 'Player 1')
+            lobby.submit(lobby.add_player, 'p2', 'Player 2')
+            lobby.submit(lobby.auto_start_if_ready)
+        return lobby
+
+    yield make
+    for lobby_id in created:
+        sava.lobbies.pop(lobby_id, None)
+
+
+def player_to_move(lobby):
+    """Id of the player whose turn it is."""
+    return next(p['id'] for p in lobby.players if p['color'] == lobby.game_state['current_turn'])
+
+
+def first_legal_move(lobby):
+    """(from_node, to_node) of some legal move for the player to move."""
+    color = lobby.game_state['current_turn']
+    for node_id, piece in sorted(lobby.game_state['board'].items()):
+        if piece.startswith(color + '_'):
+            moves = lobby.snapshot.get_legal_moves_for_piece(node_id)
+            if moves:
+                return node_id, moves[0]
+    raise AssertionError('no legal move')
@@ -0,0 +1,87 @@
+"""Batched commands apply every action or none."""
+import pytest
+
+from conftest import first_legal_move, player_to_move, sava
+
+
+@pytest.fixture
+def events(monkeypatch):
+    """Event types of the lobby_update broadcasts sent from now on."""
+    sent = []
+
+    def emit(event, data=None, **kwargs):
+        if event == 'lobby_update':
+            sent.append(data['event_type'])
+
+    monkeypatch.setattr(sava.socketio, 'emit', emit)
+    return sent
+
+
+def replayed_state(lobby):
+    replayed = None
+    for replayed, _, _, _ in sava.iter_replay([bytes(lobby.history)], header=False):
+        pass
+    return replayed.game_state
+
+
+def test_batch_commits_once_and_journals_each_action(new_lobby, client, events):
+    lobby = new_lobby()
+    events.clear()
+    version, history = lobby.version, len(lobby.history)
+    from_node, to_node = first_legal_move(lobby)
+    response = client.post(f'/api/lobby/{lobby.lobby_id}/commands', json={
+        'player_id': player_to_move(lobby), 'actions': [{'action': 'move', 'from_node': from_node, 'to_node': to_node}]})
+    assert response.status_code == 200
+    assert lobby.version == version + 1
+    assert events == ['commands_applied']
+    assert len(lobby.history) > history
+    assert replayed_state(lobby)['board'] == lobby.game_state['board']
+
+
+def test_failing_action_rolls_back_the_whole_batch(new_lobby, client, events):
+    lobby = new_lobby()
+    events.clear()
+    board, history = dict(lobby.game_state['board']), bytes(lobby.history)
+    turn = lobby.game_state['current_turn']
+    from_node, to_node = first_legal_move(lobby)
+    response = client.post(f'/api/lobby/{lobby.lobby_id}/commands', json={
+        'player_id': player_to_move(lobby), 'actions': [
+            {'action': 'move', 'from_node': from_node, 'to_node': to_node},
+            {'action': 'promote_orc', 'selected_piece': 'red_nonsense'}]})
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith('Action 2 (promote_orc)')
+    assert lobby.game_state['board'] == board == lobby.snapshot.game_state['board']
+    assert lobby.game_state['current_turn'] == turn
+    assert bytes(lobby.history) == history
+    assert 'commands_applied' not in events and 'piece_moved' not in events
+
+
+def test_action_that_raises_rolls_back_the_batch(new_lobby, events, monkeypatch):
+    lobby = new_lobby()
+    events.clear()
+    version, board, history = lobby.version, dict(lobby.game_state['board']), bytes(lobby.history)
+    from_node, to_node = first_legal_move(lobby)
+
+    def broken(player_id):
+        raise RuntimeError('dice jammed')
+
+    monkeypatch.setattr(lobby, 'roll_spider_dice', broken)
+    with pytest.raises(RuntimeError):
+        lobby.submit(lobby.execute_batch, [
+            {'action': 'move', 'from_node': from_node, 'to_node': to_node},
+            {'action': 'roll_spider_dice'}], player_to_move(lobby))
+    assert lobby.version == version
+    assert lobby.game_state['board'] == board
+    assert bytes(lobby.history) == history
+    assert events == []
+
+
+@pytest.mark.parametrize('actions, error', [
+    ([{'action': 'teleport'}], 'Action 1 (teleport): Unknown action teleport'),
+    ([{'action': 'roll_spider_dice'}] * (sava.BATCH_MAX_ACTIONS + 1), f'At most {sava.BATCH_MAX_ACTIONS} actions per batch'),
+])
+def test_invalid_batches_change_nothing(new_lobby, actions, error):
+    lobby = new_lobby()
+    board = dict(lobby.game_state['board'])
+    assert lobby.submit(lobby.execute_batch, actions, player_to_move(lobby)) == (False, error)
+    assert lobby.game_state['board'] == board
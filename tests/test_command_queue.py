@@ -0,0 +1,206 @@
+"""Lobby single-writer queue: ordering, failed commands and store failures."""
+import contextlib
+import threading
+
+import pytest
+
+from conftest import first_legal_move, player_to_move, sava
+
+
+def submit_in_background(lobby, command, *args):
+    """Submit from another thread; returns (thread, outcome dict filled with 'result' or 'error')."""
+    outcome = {}
+
+    def run():
+        try:
+            outcome['result'] = lobby.submit(command, *args)
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, outcome
+
+
+def wait_for_queue(lobby, length):
+    for _ in range(1000):
+        if len(lobby._commands) >= length:
+            return
+        threading.Event().wait(0.005)
+    raise AssertionError('commands were not queued')
+
+
+def test_concurrent_commands_apply_in_order(new_lobby):
+    lobby = new_lobby(started=False)
+    lobby.submit(lobby.add_player, 'p', 'Player')
+    version = lobby.version
+    threads = [submit_in_background(lobby, lobby.add_chat_message, 'p', str(i))[0] for i in range(20)]
+    for thread in threads:
+        thread.join(5)
+    messages = lobby.snapshot.game_state['chat_messages']
+    assert [m['id'] for m in messages] == list(range(1, 21))
+    assert lobby.version == lobby.snapshot.version == version + 20
+
+
+def test_command_that_raises_is_rolled_back(new_lobby):
+    lobby = new_lobby()
+    version, board = lobby.version, dict(lobby.game_state['board'])
+    history = bytes(lobby.history)
+
+    def half_applied():
+        lobby.game_state['board'].clear()
+        lobby.notify('board_cleared')
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        lobby.submit(half_applied)
+    assert lobby.version == version
+    assert lobby.game_state['board'] == board
+    assert lobby.snapshot.game_state['board'] == board
+    assert bytes(lobby.history) == history
+    assert lobby.pending_notifications == []
+    # The queue keeps working afterwards
+    from_node, to_node = first_legal_move(lobby)
+    assert lobby.submit(lobby.execute_move, from_node, to_node, player_to_move(lobby))[0]
+    assert lobby.version == version + 1
+
+
+def test_journal_failure_fails_the_command(new_lobby, monkeypatch):
+    lobby = new_lobby()
+    version, history = lobby.version, bytes(lobby.history)
+    board = dict(lobby.game_state['board'])
+    from_node, to_node = first_legal_move(lobby)
+
+    def disk_full(*args):
+        raise OSError('No space left on device')
+
+    monkeypatch.setattr(sava.move_journal, 'append', disk_full)
+    with pytest.raises(OSError):
+        lobby.submit(lobby.execute_move, from_node, to_node, player_to_move(lobby))
+    assert lobby.version == version
+    assert bytes(lobby.history) == history
+    assert lobby.game_state['board'] == board
+
+
+def test_store_failure_resolves_every_queued_command(new_lobby, monkeypatch):
+    lobby = new_lobby(started=False)
+
+    @contextlib.contextmanager
+    def busy(lobby):
+        raise TimeoutError('database is locked')
+        yield
+
+    # Queue two commands behind a held writer slot, then let them run against a failing store
+    lobby._writer.acquire()
+    first = submit_in_background(lobby, lobby.add_player, 'a', 'A')
+    second = submit_in_background(lobby, lobby.add_player, 'b', 'B')
+    wait_for_queue(lobby, 2)
+    monkeypatch.setattr(sava.lobbies, 'command_scope', busy, raising=False)
+    lobby._writer.release()
+    lobby._drain_commands()
+    for thread, outcome in (first, second):
+        thread.join(5)
+        assert not thread.is_alive()
+        assert isinstance(outcome['error'], TimeoutError)
+    assert lobby.players == []
+    monkeypatch.undo()
+    assert lobby.submit(lobby.add_player, 'a', 'A') == 'player'
+
+
+def test_notification_failure_still_resolves_the_command(new_lobby, monkeypatch):
+    lobby = new_lobby(started=False)
+
+    def bus_down(event_type, data=None):
+        raise ConnectionError('bus down')
+
+    monkeypatch.setattr(lobby, 'notify', bus_down)
+    with pytest.raises(ConnectionError):
+        lobby.submit(lambda: lobby.pending_notifications.append(('ping', None)))
+    monkeypatch.undo()
+    assert lobby.submit(lobby.add_player, 'c', 'C') == 'player'
+
+
+def test_update_state_is_applied_to_the_live_state_and_journaled(new_lobby, client):
+    lobby = new_lobby()
+    response = client.post(f'/api/lobby/{lobby.lobby_id}/update-state',
+                           json={'player_id': 'p1', 'game_state': {'current_turn': 'blue'}})
+    assert response.status_code == 200
+    assert lobby.snapshot.game_state['current_turn'] == 'blue'
+    records = [record_type for record_type, _, _ in sava.iter_journal_records(lobby.history, header=False)]
+    assert records[-1] == sava.JOURNAL_STATE
+    response = client.post(f'/api/lobby/{lobby.lobby_id}/update-state', json={'player_id': 'p1', 'game_state': 'x'})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('board', [{'R1N1': 'green_dragon'}, {'R1N1': 'red_orc_300'}, {'nowhere': 'red_wizard'},
+                                   {'R1N1': 7}, ['R1N1']])
+def test_update_state_rejects_boards_the_wire_format_cannot_carry(new_lobby, client, board):
+    lobby = new_lobby()
+    version, current = lobby.version, dict(lobby.game_state['board'])
+    response = client.post(f'/api/lobby/{lobby.lobby_id}/update-state',
+                           json={'player_id': 'p1', 'game_state': {'board': board}})
+    assert response.status_code == 400
+    assert lobby.version == version
+    assert lobby.snapshot.game_state['board'] == current
+    # Valid boards still reach binary clients
+    board = dict(current, R1N1='red_orc_9')
+    assert lobby.submit(lobby.update_game_state, {'board': board})[0]
+    frame = sava.encode_binary_notification({'seq': 1, 'event_type': 'x', 'lobby_info': lobby.get_lobby_info()})
+    assert frame
+
+
+def test_commands_queued_during_eviction_reach_the_paged_in_lobby(new_lobby):
+    lobby = new_lobby()
+    lobby._writer.acquire()
+    thread, outcome = submit_in_background(lobby, lobby.add_chat_message, 'p1', 'still here')
+    wait_for_queue(lobby, 1)
+    lobby._writer.release()
+    assert sava.lobbies.evict(lobby.lobby_id)
+    thread.join(5)
+    assert outcome['result'][0]
+    live = sava.lobbies[lobby.lobby_id]
+    assert live is not lobby
+    assert live.snapshot.game_state['chat_messages'][-1]['message'] == 'still here'
+
+
+def test_only_lobby_methods_are_redirected(new_lobby):
+    lobby = new_lobby(started=False)
+    lobby._writer.acquire()
+    thread, outcome = submit_in_background(lobby, lobby.game_state.update, {'current_turn': 'blue'})
+    wait_for_queue(lobby, 1)
+    lobby._writer.release()
+    assert sava.lobbies.evict(lobby.lobby_id)
+    thread.join(5)
+    assert isinstance(outcome['error'], TypeError)
+
+
+@pytest.mark.parametrize('handoff_fails', [False, True])
+def test_commands_queued_during_a_shard_handoff_are_resolved(new_lobby, monkeypatch, handoff_fails):
+    shards = {'a': 'shard-a:5001', 'b': 'shard-b:5002'}
+    lobby = new_lobby()
+    while sava.HashRing(shards).owner(lobby.lobby_id) != 'b':
+        lobby = new_lobby()
+    # This process becomes shard a
+    monkeypatch.setattr(sava, 'SHARD_NAME', 'a')
+    monkeypatch.setattr(sava, 'shard_ring', sava.shard_ring)
+    queued = []
+
+    def post_json(address, path, body, secret):
+        # A command arrives while the lobby's writer slot is held for the handoff
+        queued.append(submit_in_background(lobby, lobby.add_chat_message, 'p1', 'during handoff'))
+        wait_for_queue(lobby, 1)
+        if handoff_fails:
+            raise OSError('connection refused')
+        return {}
+
+    monkeypatch.setattr(sava, 'post_json', post_json)
+    sava.rebalance_lobbies(shards)
+    thread, outcome = queued[0]
+    thread.join(5)
+    assert not thread.is_alive()
+    if handoff_fails:
+        assert outcome['result'][0]
+        assert lobby.snapshot.game_state['chat_messages'][-1]['message'] == 'during handoff'
+    else:
+        assert isinstance(outcome['error'], KeyError)
+        assert lobby.lobby_id not in sava.lobbies
@@ -0,0 +1,82 @@
+"""Move journal: record encoding, replay round trip and recovery."""
+import pytest
+
+from conftest import first_legal_move, player_to_move, sava
+
+
+def play(lobby, moves):
+    """Make up to moves legal moves, stopping early at anything that needs a player's choice."""
+    for _ in range(moves):
+        state = lobby.game_state
+        if state.get('game_over') or state.get('promotion_mode') or state.get('sacrifice_mode') \
+                or state.get('spider_control_mode'):
+            return
+        from_node, to_node = first_legal_move(lobby)
+        assert lobby.submit(lobby.execute_move, from_node, to_node, player_to_move(lobby))[0]
+
+
+def replay_history(history):
+    replayed = None
+    for replayed, _, _, _ in sava.iter_replay([bytes(history)], header=False):
+        pass
+    return replayed
+
+
+def assert_same_game(recovered, lobby):
+    for key in ('board', 'current_turn', 'captured_pieces', 'player_turn_numbers', 'chat_messages', 'game_over'):
+        assert recovered.game_state.get(key) == lobby.game_state.get(key), key
+    assert [(p['id'], p['color']) for p in recovered.players] == [(p['id'], p['color']) for p in lobby.players]
+
+
+def test_journal_str_truncates_on_a_character_boundary():
+    encoded = sava._journal_str('é' * 40000)
+    text, offset = sava._journal_read_str(encoded)
+    assert offset == len(encoded) <= 0xFFFF + 2
+    assert text == 'é' * (0xFFFF // 2)
+
+
+def test_replay_round_trip(new_lobby, monkeypatch):
+    # Snapshot often so recovery goes through a snapshot and compacted segments
+    monkeypatch.setattr(sava, 'JOURNAL_SNAPSHOT_INTERVAL', 5)
+    lobby = new_lobby()
+    lobby.submit(lobby.add_chat_message, 'p1', 'ça va? ♟')
+    play(lobby, 24)
+    assert lobby.journal_segment > 0
+    sava.move_journal.sync()
+    assert_same_game(sava.move_journal.load(lobby.lobby_id), lobby)
+    # The lobby's history alone replays to the same game too
+    assert_same_game(replay_history(lobby.history), lobby)
+
+
+def test_recover_journaled_lobby_after_restart(new_lobby):
+    lobby = new_lobby()
+    play(lobby, 6)
+    sava.move_journal.sync()
+    # As after a crash: the registry is empty but the journal is on disk
+    sava.lobbies.release(lobby.lobby_id)
+    assert lobby.lobby_id not in sava.lobbies
+    assert sava.recover_journaled_lobbies() >= 1
+    recovered = sava.lobbies[lobby.lobby_id]
+    assert recovered is not lobby
+    assert_same_game(recovered, lobby)
+    # The recovered lobby keeps playing and journaling
+    play(recovered, 1)
+    sava.move_journal.sync()
+    assert_same_game(sava.move_journal.load(lobby.lobby_id), recovered)
+
+
+def test_torn_final_record_is_ignored(new_lobby):
+    lobby = new_lobby()
+    play(lobby, 2)
+    history = bytes(lobby.history)
+    complete = list(sava.iter_journal_records(history, header=False))
+    torn = list(sava.iter_journal_records(history[:-1], header=False))
+    assert len(torn) == len(complete) - 1
+
+
+def test_record_for_a_missing_player_is_reported_as_corruption():
+    history = sava.encode_journal_record(
+        sava.JOURNAL_CREATE, 0, b'\x2c\x01\x00\x00' + b'lobby-x')
+    history += sava.encode_journal_record(sava.JOURNAL_DICE, 1, bytes([0, 3, 4]))
+    with pytest.raises(ValueError, match='Corrupt journal'):
+        replay_history(history)
@@ -0,0 +1,45 @@
+"""/state ETags across commits and journal recovery."""
+import json
+
+from conftest import first_legal_move, player_to_move, sava
+
+
+def test_etag_changes_with_every_commit(new_lobby, client):
+    lobby = new_lobby()
+    response = client.get(f'/api/lobby/{lobby.lobby_id}/state')
+    etag = response.headers['ETag']
+    assert client.get(f'/api/lobby/{lobby.lobby_id}/state', headers={'If-None-Match': etag}).status_code == 304
+    from_node, to_node = first_legal_move(lobby)
+    lobby.submit(lobby.execute_move, from_node, to_node, player_to_move(lobby))
+    response = client.get(f'/api/lobby/{lobby.lobby_id}/state', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_recovered_lobby_never_reuses_an_etag(new_lobby, client, monkeypatch):
+    # Recovery counts versions from the last snapshot, so a lost commit's version comes round again
+    monkeypatch.setattr(sava, 'JOURNAL_SNAPSHOT_INTERVAL', 2)
+    lobby = new_lobby()
+    lobby.submit(lobby.add_chat_message, 'p1', 'one')
+    lobby.submit(lobby.add_chat_message, 'p1', 'two')
+    etag = client.get(f'/api/lobby/{lobby.lobby_id}/state').headers['ETag']
+    sava.move_journal.sync()
+    sava.lobbies.release(lobby.lobby_id)
+    sava.recover_journaled_lobbies()
+    recovered = sava.lobbies[lobby.lobby_id]
+    assert recovered.snapshot.game_state['chat_messages'] == lobby.snapshot.game_state['chat_messages']
+    response = client.get(f'/api/lobby/{lobby.lobby_id}/state', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    # Handing the lobby to another worker keeps its epoch, so clients stay current
+    handed_off = sava.Lobby.from_record(json.loads(json.dumps(recovered.to_record(), default=str)))
+    assert sava.lobby_state_etag(handed_off.snapshot) == response.headers['ETag'].strip('"')
+
+
+def test_rejected_command_keeps_the_version_and_etag(new_lobby, client):
+    lobby = new_lobby()
+    version = lobby.version
+    etag = client.get(f'/api/lobby/{lobby.lobby_id}/state').headers['ETag']
+    assert lobby.submit(lobby.execute_move, 'nobody', 'x', 'y') == (False, 'No piece at source node')
+    assert lobby.version == lobby.snapshot.version == version
+    response = client.get(f'/api/lobby/{lobby.lobby_id}/state', headers={'If-None-Match': etag})
+    assert response.status_code == 304
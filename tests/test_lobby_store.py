@@ -0,0 +1,86 @@
+"""Cold lobbies: worker handoff, journal recovery, the reaper and the turn clock."""
+import json
+import time
+
+import pytest
+
+from conftest import sava
+
+
+@pytest.fixture
+def handoff(tmp_path):
+    """Hand every lobby to a fresh worker: returns a function that does it and gives the file path."""
+    path = str(tmp_path / 'lobbies.handoff')
+
+    def hand_off():
+        sava.save_lobby_handoff(path)
+        for lobby_id in list(sava.lobbies):
+            sava.lobbies.release(lobby_id)
+            # The new worker's turn clock starts out empty
+            sava.turn_clock.schedule(lobby_id, None)
+        assert sava.restore_lobby_handoff(path) >= 1
+        return path
+
+    return hand_off
+
+
+def test_reaper_expires_handed_off_lobbies_without_loading_them(new_lobby, handoff, monkeypatch):
+    lobby = new_lobby()
+    lobby.last_active -= 10 ** 7
+    handoff()
+    monkeypatch.setattr(sava.Lobby, 'from_record', None)
+    deleted, _ = sava.lobby_reaper.reap()
+    assert deleted >= 1
+    assert lobby.lobby_id not in sava.lobbies
+
+
+def test_reaper_expires_journal_recovered_lobbies(new_lobby, monkeypatch):
+    lobby = new_lobby()
+    sava.move_journal.sync()
+    sava.lobbies.release(lobby.lobby_id)
+    sava.recover_journaled_lobbies()
+    # Idle time counts from the last journaled command
+    deleted, _ = sava.lobby_reaper.reap(now=lobby.last_active + sava.LOBBY_TTLS['active'] + 1)
+    assert deleted >= 1
+    assert lobby.lobby_id not in sava.lobbies
+
+
+def test_recently_active_handed_off_lobby_survives_the_reaper(new_lobby, handoff):
+    lobby = new_lobby()
+    handoff()
+    sava.lobby_reaper.reap()
+    assert sava.lobbies[lobby.lobby_id].snapshot.game_state['board'] == lobby.snapshot.game_state['board']
+
+
+def test_handed_off_game_times_out_without_being_accessed(new_lobby, handoff):
+    lobby = new_lobby()
+    lobby.submit(lobby.update_game_state, {'player_time_remaining': {'red': 0.3, 'blue': 600}})
+    fired = sava.turn_clock.fired
+    handoff()
+    deadline = time.monotonic() + 5
+    while sava.turn_clock.fired == fired and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert sava.turn_clock.fired == fired + 1
+    assert dict(sava.lobbies.hot_lobbies())[lobby.lobby_id].snapshot.game_state['winner'] == 'blue'
+
+
+def test_lobby_list_after_a_handoff_does_not_decode_lobbies(new_lobby, handoff, client, monkeypatch):
+    lobby = new_lobby()
+    summary = sava.lobby_summary(lobby.snapshot)
+    handoff()
+    monkeypatch.setattr(sava.lobby_directory, '_synced_at', None)
+    monkeypatch.setattr(sava.Lobby, 'from_record', None)
+    entries = client.get('/api/lobbies?limit=200').get_json()['lobbies']
+    assert summary in entries
+    assert lobby.lobby_id not in dict(sava.lobbies.hot_lobbies())
+
+
+def test_export_reads_spilled_lobbies_without_paging_them_in(new_lobby, client):
+    lobby = new_lobby()
+    lobby.submit(lobby.add_chat_message, 'p1', 'spilled')
+    assert sava.lobbies.evict(lobby.lobby_id)
+    lines = client.get('/api/games/export?status=active').get_data(as_text=True).splitlines()
+    games = {game['game_id']: game for game in map(json.loads, lines)}
+    assert games[lobby.lobby_id]['status'] == 'active'
+    assert games[lobby.lobby_id]['records'][-1]['type'] == 'chat'
+    assert lobby.lobby_id in dict(sava.lobbies.cold_lobbies())
@@ -0,0 +1,71 @@
+"""Matchmaking queues: pairing and one waiting ticket per player."""
+import pytest
+
+from conftest import sava
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def queue(request, tmp_path):
+    if request.param == 'memory':
+        return sava.InProcessMatchmakingQueue()
+    return sava.SQLiteMatchmakingQueue(sava.SQLiteLobbyStore(str(tmp_path / 'lobbies.db')))
+
+
+def test_players_in_band_are_paired(queue):
+    waiting = queue.enqueue('alice', 'Alice', 300, 1500)
+    assert waiting['lobby_id'] is None
+    matched = queue.enqueue('bob', 'Bob', 300, 1550)
+    lobby = sava.lobbies.pop(matched['lobby_id'])
+    assert [p['id'] for p in lobby.players] == ['alice', 'bob']
+    assert queue.view(queue.ticket(waiting['ticket_id']))['status'] == 'matched'
+
+
+def test_queueing_twice_keeps_one_ticket(queue):
+    first = queue.enqueue('alice', 'Alice', 300, 1500)
+    again = queue.enqueue('alice', 'Alice', 300, 1500)
+    assert again['ticket_id'] == first['ticket_id']
+    assert queue.stats()['queued'] == {'300': 1}
+
+
+def test_queueing_for_another_time_control_replaces_the_ticket(queue):
+    first = queue.enqueue('alice', 'Alice', 300, 1500)
+    second = queue.enqueue('alice', 'Alice', 600, 1500)
+    assert second['ticket_id'] != first['ticket_id']
+    assert queue.ticket(first['ticket_id']) is None
+    assert queue.stats()['queued'] == {'600': 1}
+    # The replaced ticket can no longer be matched
+    assert queue.enqueue('bob', 'Bob', 300, 1500)['lobby_id'] is None
+
+
+def test_a_player_is_never_paired_with_themselves(queue):
+    queue.enqueue('alice', 'Alice', 300, 1500)
+    queue.enqueue('carol', 'Carol', 300, 1900)
+    # Carol is the only other player, and out of band; Alice's own ticket must not be taken
+    assert queue.enqueue('alice', 'Alice', 300, 1500)['lobby_id'] is None
+    matched = queue.enqueue('dave', 'Dave', 300, 1490)
+    lobby = sava.lobbies.pop(matched['lobby_id'])
+    assert sorted(p['id'] for p in lobby.players) == ['alice', 'dave']
+
+
+def test_cancelled_ticket_frees_the_player(queue):
+    first = queue.enqueue('alice', 'Alice', 300, 1500)
+    assert queue.cancel(first['ticket_id'])
+    assert not queue.cancel(first['ticket_id'])
+    assert queue.enqueue('alice', 'Alice', 300, 1500)['ticket_id'] != first['ticket_id']
+
+
+def test_failed_lobby_creation_puts_the_opponent_back(queue, monkeypatch):
+    waiting = queue.enqueue('alice', 'Alice', 300, 1500)
+
+    def no_lobby(time_limit, first, second):
+        raise OSError('journal unavailable')
+
+    monkeypatch.setattr(sava, 'create_matched_lobby', no_lobby)
+    with pytest.raises(OSError):
+        queue.enqueue('bob', 'Bob', 300, 1500)
+    assert queue.stats()['queued'] == {'300': 1}
+    monkeypatch.undo()
+    matched = queue.enqueue('carol', 'Carol', 300, 1500)
+    lobby = sava.lobbies.pop(matched['lobby_id'])
+    assert [p['id'] for p in lobby.players] == ['alice', 'carol']
+    assert queue.ticket(waiting['ticket_id'])['lobby_id'] == matched['lobby_id']
@@ -0,0 +1,54 @@
+"""?fields= on game command replies."""
+import pytest
+
+from conftest import first_legal_move, player_to_move
+
+
+def move(client, lobby, query='', **body):
+    from_node, to_node = first_legal_move(lobby)
+    body.update(from_node=from_node, to_node=to_node, player_id=player_to_move(lobby))
+    return client.post(f'/api/lobby/{lobby.lobby_id}/move{query}', json=body)
+
+
+def test_fields_not_yet_in_the_game_state_are_accepted(new_lobby, client):
+    lobby = new_lobby()
+    assert 'game_over' not in lobby.game_state
+    version = lobby.version
+    response = move(client, lobby, '?fields=last_move,version,game_over,winner')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert set(body) == {'success', 'last_move', 'version', 'game_over', 'winner'}
+    assert body['version'] == lobby.version == version + 1
+    assert body['game_over'] is None
+
+
+def test_unknown_field_is_rejected_before_the_move(new_lobby, client):
+    lobby = new_lobby()
+    version = lobby.version
+    response = move(client, lobby, '?fields=last_move,nonsense')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Unknown field nonsense'}
+    assert lobby.version == version
+
+
+def test_fields_list_in_the_body(new_lobby, client):
+    lobby = new_lobby()
+    response = move(client, lobby, fields=['current_turn', 'lobby_info'])
+    assert response.status_code == 200
+    assert set(response.get_json()) == {'success', 'current_turn', 'lobby_info'}
+
+
+@pytest.mark.parametrize('fields', [['last_move', 3], [None], {'last_move': True}, 7])
+def test_malformed_fields_are_a_bad_request(new_lobby, client, fields):
+    lobby = new_lobby()
+    version = lobby.version
+    response = move(client, lobby, fields=fields)
+    assert response.status_code == 400
+    assert lobby.version == version
+
+
+def test_without_fields_the_reply_is_complete(new_lobby, client):
+    lobby = new_lobby()
+    body = move(client, lobby).get_json()
+    assert set(body) == {'success', 'game_state', 'lobby_info'}
+    assert body['lobby_info']['version'] == lobby.version
@@ -0,0 +1,56 @@
+"""Router: which shard a request goes to, and requests gathered from every shard."""
+import asyncio
+from urllib.parse import parse_qs
+
+import sharding
+
+
+def test_lobby_for_request():
+    assert sharding.lobby_for_request('/api/lobby/ab12cd34/state') == 'ab12cd34'
+    assert sharding.lobby_for_request('/api/games/ab12cd34/replay?snapshot_every=5') == 'ab12cd34'
+    assert sharding.lobby_for_request('/api/games/export?status=active') is None
+    assert sharding.lobby_for_request('/api/games?player=ann') is None
+    assert sharding.lobby_for_request('/api/matchmaking/queue') == sharding.MATCHMAKING_KEY
+    assert sharding.lobby_for_request('/socket.io/?lobby_id=ab12cd34&EIO=4&transport=polling') == 'ab12cd34'
+    # Lobby list sessions stay on one shard from the handshake on
+    assert sharding.lobby_for_request('/socket.io/?EIO=4&transport=polling') == sharding.DIRECTORY_KEY
+    assert sharding.lobby_for_request('/socket.io/?EIO=4&transport=polling&sid=x1') == sharding.DIRECTORY_KEY
+
+
+def test_export_is_gathered_from_every_shard(tmp_path):
+    async def run():
+        requests = []
+
+        async def shard(name, reader, writer):
+            request_line = (await reader.readuntil(b'\r\n\r\n')).split(b'\r\n', 1)[0].decode()
+            status = parse_qs(request_line.split(' ')[1].partition('?')[2])['status'][0]
+            requests.append((name, status))
+            exported = {'all': ['archived', 'active'], 'active': ['active'], 'finished': ['archived']}[status]
+            body = ''.join(f'{{"shard": "{name}", "status": "{game}"}}\n' for game in exported)
+            writer.write(b'HTTP/1.0 200 OK\r\nContent-Type: application/x-ndjson\r\n\r\n' + body.encode())
+            await writer.drain()
+            writer.close()
+
+        servers = [await asyncio.start_server(lambda r, w, name=name: shard(name, r, w), '127.0.0.1', 0)
+                   for name in ('a', 'b', 'c')]
+        shards_file = tmp_path / 'shards.txt'
+        shards_file.write_text(''.join(f'{name} 127.0.0.1:{server.sockets[0].getsockname()[1]}\n'
+                                       for name, server in zip('abc', servers)))
+        router = sharding.Router(str(shards_file), '')
+        router_server = await asyncio.start_server(router.handle, '127.0.0.1', 0)
+        reader, writer = await asyncio.open_connection('127.0.0.1', router_server.sockets[0].getsockname()[1])
+        writer.write(b'GET /api/games/export?status=all&since=5 HTTP/1.1\r\nHost: sava\r\n\r\n')
+        response = await reader.read()
+        for server in servers + [router_server]:
+            server.close()
+        return requests, response
+
+    requests, response = asyncio.run(run())
+    head, _, body = response.partition(b'\r\n\r\n')
+    assert head.startswith(b'HTTP/1.0 200')
+    lines = body.decode().splitlines()
+    # The shared archive is exported once, and every shard's active games are included
+    assert sum('archived' in line for line in lines) == 1
+    assert sorted(line for line in lines if 'active' in line) == [
+        f'{{"shard": "{name}", "status": "active"}}' for name in 'abc']
+    assert sorted(status for _, status in requests) == ['active', 'active', 'all']
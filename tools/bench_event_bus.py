@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for the built-in Socket.IO event bus (SOCKETIO_MESSAGE_QUEUE=local).
+
+Starts N subscriber processes on a private broker socket, publishes lobby_update sized
+broadcasts from this process and reports how long each took to reach every subscriber.
+This is the overhead a broadcast pays for going through the bus instead of a direct emit.
+
+    python tools/bench_event_bus.py --subscribers 4 --messages 2000
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+def subscribe(path, messages, results, ready):
+    from app import LocalBusManager
+    manager = LocalBusManager(path)
+    latencies = []
+    listener = manager._listen()
+    ready.release()
+    for message in listener:
+        latencies.append(time.monotonic() - message['data']['sent_at'])
+        if len(latencies) == messages:
+            break
+    results.put(latencies)
+
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))] * 1000
+
+
+def main(args):
+    from app import LocalBusManager
+    path = os.path.join(tempfile.mkdtemp(), 'bus.sock')
+    publisher = LocalBusManager(path)
+    # Host the broker here so subscribers connect to it rather than electing one themselves
+    publisher._publish({'method': 'noop'})
+
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    ready = context.Semaphore(0)
+    workers = [context.Process(target=subscribe, args=(path, args.messages, results, ready))
+               for _ in range(args.subscribers)]
+    for worker in workers:
+        worker.start()
+    for _ in workers:
+        ready.acquire()
+    time.sleep(0.5)
+
+    payload = 'x' * args.size
+    for _ in range(args.messages):
+        publisher._publish({'method': 'emit', 'event': 'lobby_update', 'room': 'bench',
+                            'data': {'payload': payload, 'sent_at': time.monotonic()}})
+        if args.interval:
+            time.sleep(args.interval / 1000)
+
+    samples = sorted(latency for _ in workers for latency in results.get())
+    for worker in workers:
+        worker.join()
+    print(f'{args.messages} broadcasts of {args.size} bytes to {args.subscribers} subscribers: '
+          f'p50 {percentile(samples, 0.5):.3f} ms, p99 {percentile(samples, 0.99):.3f} ms, '
+          f'max {samples[-1] * 1000:.3f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--subscribers', type=int, default=4)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--size', type=int, default=2000, help='payload bytes per broadcast')
+    parser.add_argument('--interval', type=float, default=1, help='milliseconds between broadcasts')
+    main(parser.parse_args())
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Build step for the lobby page's static assets.
+
+Minifies the scripts and stylesheets in SOURCES, writes each one to static/dist under a
+content-hashed name (e.g. js/lobby.3f9c0a1b2d.js) together with precompressed .gz and .br
+variants, and records the names in static/dist/manifest.json. The app serves the built files
+from /assets/ with immutable cache headers and falls back to the plain /static/ files for any
+source that has changed since the last build. Brotli variants need the `brotli` package.
+
+    python tools/build_assets.py          # run by render_build.sh and start_production.sh
+    python tools/build_assets.py --prune  # also delete files from earlier builds
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'static')
+# Paths relative to static/, as used in templates with asset_url()
+SOURCES = [
+    'css/lobby.css',
+    'js/game-config.js',
+    'js/wire-format.js',
+    'js/chat.js',
+    'js/sidebar.js',
+    'js/lobby.js',
+]
+MANIFEST = 'manifest.json'
+
+# A '/' after one of these (or after one of the keywords) starts a regex literal, not a division
+REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^}')
+REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void',
+                  'throw', 'instanceof', 'yield', 'await'}
+
+
+def _skip_quoted(source, i, quote):
+    """Index just past the string (or regex) starting at source[i]."""
+    i += 1
+    in_class = False
+    while i < len(source):
+        char = source[i]
+        if char == '\\':
+            i += 2
+            continue
+        if quote == '/' and char == '[':
+            in_class = True
+        elif quote == '/' and char == ']':
+            in_class = False
+        elif char == quote and not in_class:
+            return i + 1
+        i += 1
+    return i
+
+
+def minify_js(source):
+    """Strip comments, indentation and blank lines from JavaScript.
+
+    Line breaks are kept, so automatic semicolon insertion sees the same statements, and
+    strings, regex literals and template literals are copied unchanged.
+    """
+    out = []
+    # One entry per open template literal: the brace depth its current ${...} started at
+    templates = []
+    depth = 0
+    i, n = 0, len(source)
+
+    def last_token():
+        text = ''.join(out[-24:]).rstrip()
+        if not text:
+            return None, ''
+        word = text.split()[-1] if text[-1].isalnum() or text[-1] in '_$' else ''
+        return text[-1], word
+
+    def emit_newline():
+        while out and out[-1] in ' \t':
+            out.pop()
+        if out and out[-1] != '\n':
+            out.append('\n')
+
+    while i < n:
+        char = source[i]
+        if templates and templates[-1] is None:
+            # Inside template literal text
+            if char == '\\':
+                out.append(source[i:i + 2])
+                i += 2
+            elif char == '`':
+                templates.pop()
+                out.append(char)
+                i += 1
+            elif source.startswith('${', i):
+                templates[-1] = depth
+                depth += 1
+                out.append('${')
+                i += 2
+            else:
+                out.append(char)
+                i += 1
+            continue
+
+        if char == '`':
+            templates.append(None)
+            out.append(char)
+            i += 1
+        elif char in '\'"':
+            end = _skip_quoted(source, i, char)
+            out.append(source[i:end])
+            i = end
+        elif source.startswith('//', i):
+            i = source.find('\n', i)
+            i = n if i < 0 else i
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            end = n if end < 0 else end + 2
+            if '\n' in source[i:end]:
+                emit_newline()
+            elif out and out[-1] not in ' \t\n':
+                out.append(' ')
+            i = end
+        elif char == '/':
+            prev, word = last_token()
+            if prev is None or prev in REGEX_PRECEDERS or word in REGEX_KEYWORDS:
+                end = _skip_quoted(source, i, '/')
+                out.append(source[i:end])
+                i = end
+            else:
+                out.append(char)
+                i += 1
+        elif char == '\n':
+            emit_newline()
+            i += 1
+        elif char in ' \t\r':
+            if out and out[-1] not in ' \t\n':
+                out.append(' ')
+            i += 1
+        else:
+            if char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+                if templates and templates[-1] == depth:
+                    # End of a ${...} substitution: back to the template text
+                    templates[-1] = None
+            out.append(char)
+            i += 1
+    emit_newline()
+    return ''.join(out).lstrip('\n')
+
+
+def minify_css(source):
+    """Strip comments and whitespace from CSS, leaving strings unchanged."""
+    out = []
+    i, n = 0, len(source)
+    while i < n:
+        char = source[i]
+        if char in '\'"':
+            end = _skip_quoted(source, i, char)
+            out.append(source[i:end])
+            i = end
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+        elif char.isspace():
+            while i < n and source[i].isspace():
+                i += 1
+            # A space is only needed between two tokens, e.g. in selectors and shorthand values
+            if out and out[-1][-1] not in '{};,>:' and i < n and source[i] not in '{};,>!':
+                out.append(' ')
+        elif char == '}' and out and out[-1] == ';':
+            out[-1] = '}'
+            i += 1
+        else:
+            out.append(char)
+            i += 1
+    return ''.join(out).strip() + '\n'
+
+
+def build(static_dir, prune=False):
+    """Build every source and write the manifest; returns the manifest."""
+    dist_dir = os.path.join(static_dir, 'dist')
+    manifest = {}
+    for path in SOURCES:
+        with open(os.path.join(static_dir, path), 'rb') as f:
+            source = f.read()
+        text = source.decode('utf-8')
+        minified = (minify_css(text) if path.endswith('.css') else minify_js(text)).encode('utf-8')
+        stem, ext = os.path.splitext(path)
+        built = f'{stem}.{hashlib.sha256(minified).hexdigest()[:10]}{ext}'
+        target = os.path.join(dist_dir, built)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        variants = {'': minified, '.gz': gzip.compress(minified, 9, mtime=0)}
+        if brotli is not None:
+            variants['.br'] = brotli.compress(minified, quality=11)
+        for suffix, data in variants.items():
+            with open(target + suffix, 'wb') as f:
+                f.write(data)
+        manifest[path] = {'file': built, 'source_sha256': hashlib.sha256(source).hexdigest()}
+        sizes = ', '.join(f'{suffix or "min"} {len(data)}' for suffix, data in variants.items())
+        print(f'{path}: {len(source)} bytes -> {built} ({sizes})')
+
+    with open(os.path.join(dist_dir, MANIFEST + '.tmp'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(os.path.join(dist_dir, MANIFEST + '.tmp'), os.path.join(dist_dir, MANIFEST))
+
+    if prune:
+        # Pages rendered before this build may still ask for older files, so this is opt-in
+        keep = {entry['file'] + suffix for entry in manifest.values() for suffix in ('', '.gz', '.br')}
+        keep.add(MANIFEST)
+        for root, _, files in os.walk(dist_dir):
+            for name in files:
+                relative = os.path.relpath(os.path.join(root, name), dist_dir)
+                if relative not in keep:
+                    os.remove(os.path.join(root, name))
+                    print(f'Removed {relative}')
+    if brotli is None:
+        print('brotli is not installed; only gzip variants were written')
+    return manifest
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--static-dir', default=STATIC_DIR)
+    parser.add_argument('--prune', action='store_true', help='delete built files not in the new manifest')
+    args = parser.parse_args()
+    build(os.path.abspath(args.static_dir), args.prune)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Idle connection load test for the Sava realtime server.
+
+Opens N Socket.IO (Engine.IO v4) websocket connections against a running server,
+joins each one to a lobby room, keeps them alive by answering server pings and
+reports how many are still connected after the hold period.
+
+Only the standard library is used so it can run next to the server without extra
+dependencies. Example (server started with ASYNC_MODE=gevent ./start_production.sh):
+
+    python tools/loadtest_idle_connections.py --connections 10000 --hold 60
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import resource
+import struct
+import time
+import urllib.request
+
+
+def ws_frame(text):
+    """Build a masked client text frame."""
+    payload = text.encode('utf-8')
+    mask = os.urandom(4)
+    header = bytearray([0x81])
+    if len(payload) < 126:
+        header.append(0x80 | len(payload))
+    elif len(payload) < 65536:
+        header.append(0x80 | 126)
+        header += struct.pack('>H', len(payload))
+    else:
+        header.append(0x80 | 127)
+        header += struct.pack('>Q', len(payload))
+    masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return bytes(header) + mask + masked
+
+
+async def read_frame(reader):
+    """Read one server frame and return (opcode, text)."""
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack('>H', await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack('>Q', await reader.readexactly(8))[0]
+    payload = await reader.readexactly(length)
+    return first & 0x0F, payload.decode('utf-8', 'replace')
+
+
+class Stats:
+    def __init__(self):
+        self.connected = 0
+        self.failed = 0
+        self.closed = 0
+        self.pings = 0
+
+
+async def hold_connection(host, port, lobby_id, hold_until, stats):
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write((
+            'GET /socket.io/?EIO=4&transport=websocket HTTP/1.1\r\n'
+            f'Host: {host}:{port}\r\n'
+            'Upgrade: websocket\r\n'
+            'Connection: Upgrade\r\n'
+            f'Sec-WebSocket-Key: {key}\r\n'
+            'Sec-WebSocket-Version: 13\r\n\r\n'
+        ).encode())
+        status = await reader.readuntil(b'\r\n\r\n')
+        if b' 101 ' not in status.split(b'\r\n', 1)[0]:
+            raise ConnectionError(status.split(b'\r\n', 1)[0].decode())
+
+        # Engine.IO open packet, then connect to the default namespace and join the lobby room
+        await read_frame(reader)
+        writer.write(ws_frame('40'))
+        await writer.drain()
+        await read_frame(reader)
+        writer.write(ws_frame('42' + json.dumps(['join_lobby', {'lobby_id': lobby_id}])))
+        await writer.drain()
+        stats.connected += 1
+    except Exception:
+        stats.failed += 1
+        return
+
+    try:
+        while True:
+            remaining = hold_until - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                opcode, text = await asyncio.wait_for(read_frame(reader), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            if opcode == 0x8:
+                stats.closed += 1
+                stats.connected -= 1
+                return
+            if text == '2':
+                # Engine.IO ping -> pong
+                stats.pings += 1
+                writer.write(ws_frame('3'))
+                await writer.drain()
+    except Exception:
+        stats.closed += 1
+        stats.connected -= 1
+        return
+    writer.close()
+
+
+async def main(args):
+    # Raise our own descriptor limit so the client side is not the bottleneck
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, args.connections + 256)), hard))
+
+    base_url = f'http://{args.host}:{args.port}'
+    with urllib.request.urlopen(f'{base_url}/create-lobby') as response:
+        lobby_id = response.geturl().rstrip('/').rsplit('/', 1)[1]
+
+    stats = Stats()
+    start = time.monotonic()
+    hold_until = start + args.ramp + args.hold
+    tasks = []
+    for i in range(args.connections):
+        tasks.append(asyncio.create_task(hold_connection(args.host, args.port, lobby_id, hold_until, stats)))
+        if args.ramp and i % 100 == 99:
+            await asyncio.sleep(args.ramp * 100 / args.connections)
+
+    while time.monotonic() < hold_until:
+        await asyncio.sleep(5)
+        print(f'[{time.monotonic() - start:6.1f}s] connected={stats.connected} failed={stats.failed} '
+              f'closed={stats.closed} pings_answered={stats.pings}')
+    await asyncio.gather(*tasks)
+
+    print(f'Lobby {lobby_id}: {stats.connected}/{args.connections} connections held for {args.hold}s '
+          f'({stats.failed} failed to connect, {stats.closed} dropped)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    parser.add_argument('--connections', type=int, default=10000)
+    parser.add_argument('--ramp', type=float, default=20, help='seconds spent opening connections')
+    parser.add_argument('--hold', type=float, default=60, help='seconds to keep connections idle')
+    asyncio.run(main(parser.parse_args()))
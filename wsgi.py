@@ -13,8 +13,8 @@ if not os.environ.get('FLASK_ENV'):
 # Import after setting environment
 from app import app, socketio
 
-# For Flask-SocketIO with eventlet workers, we use the Flask app directly
-# The SocketIO integration is handled automatically when using eventlet
+# For Flask-SocketIO with gevent workers (ASYNC_MODE=gevent), we use the Flask app directly
+# The SocketIO integration is handled automatically when using gevent
 application = app
 
 if __name__ == "__main__":